@@ -0,0 +1,228 @@
+"""
+Typed Column Cache
+Coerced numbers, parsed dates, null masks and sorted values of a dataset's
+columns, computed on first use and shared by every engine reading it
+
+    columns = TypedColumns(df, key=dataset.file_path, date_formats=formats)
+    columns.null_mask('region')      # isna(), once
+    columns.numeric('sales')         # pd.to_numeric (category-aware), once
+    columns.dates('order_date')      # parse_dates with the profiled formats, once
+    columns.truncated_dates('order_date', 'month')
+    columns.numeric_values('sales')  # non-null numbers as float64
+    columns.sorted_values('sales')   # the same, sorted
+
+Derived arrays live in one process-wide LRU (column_cache) capped at
+COLUMN_CACHE_MAX_BYTES, least recently used first out. Results that are
+the frame's own buffers (e.g. pd.to_numeric of a numeric column) are
+returned as they are and never cached or counted, so the cache only
+ever holds what the frame does not.
+"""
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analytics.dates import parse_dates, truncate_dates
+
+# Bytes of derived column arrays kept across engines and requests
+COLUMN_CACHE_MAX_BYTES = int(os.getenv("COLUMN_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def coerce_column(series: pd.Series, convert) -> pd.Series:
+    """
+    convert(series, errors='coerce') that also works on category columns
+    
+    Compacted frames hold repeated strings as categoricals; pd.to_datetime
+    can hand those back still categorical. Converting the categories once
+    and taking them by code is both correct and cheaper.
+    """
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return convert(series, errors='coerce')
+    
+    categories = convert(pd.Series(series.cat.categories), errors='coerce').to_numpy()
+    values = pd.api.extensions.take(categories, series.cat.codes.to_numpy(), allow_fill=True)
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def _nbytes(value) -> int:
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    return int(value.memory_usage(index=False, deep=True))
+
+
+def _owned_bytes(value, source: pd.Series) -> Optional[int]:
+    """Memory a derived value adds to its source column; None if it is the source's own buffer"""
+    if value is source:
+        return None
+    source_dtype = source.dtype
+    if isinstance(source_dtype, np.dtype) and source_dtype != object:
+        array = value.to_numpy() if isinstance(value, pd.Series) and isinstance(value.dtype, np.dtype) else value
+        if isinstance(array, np.ndarray) and np.shares_memory(array, source.to_numpy()):
+            return None
+    return _nbytes(value)
+
+
+class ColumnCache:
+    """
+    Thread-safe LRU of derived column arrays with a byte budget
+    
+    Entries are keyed (dataset key, column, kind). Values larger than the
+    whole budget are computed and returned but not kept.
+    """
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[Tuple, Tuple[Any, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Tuple, compute: Callable[[], Tuple[Any, Optional[int]]]) -> Any:
+        """
+        Cached value for `key`, else compute() -> (value, nbytes)
+        
+        nbytes None means the value costs nothing to rebuild (it aliases
+        the source) and is not stored. compute() runs outside the lock, so
+        two threads may both build a missing entry; the last one is kept.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        
+        value, nbytes = compute()
+        if nbytes is None or nbytes > self.max_bytes:
+            return value
+        
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+        return value
+    
+    def discard(self, dataset_key: Hashable):
+        """Drop every entry of one dataset"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == dataset_key]:
+                self.bytes -= self._entries.pop(key)[1]
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+column_cache = ColumnCache(COLUMN_CACHE_MAX_BYTES)
+
+
+class TypedColumns:
+    """
+    Lazily typed views of one dataset's columns
+    
+    Raw columns come from `df`, or from `loader(column) -> Series` (e.g.
+    reading one column of a stored file), in which case they are cached
+    like any derived array and only the columns used are ever loaded.
+    
+    `key` names the data itself, so that engines and requests reading the
+    same data share arrays: use the stored version's path (a new version
+    is a new path). Without a key the arrays are private to this instance
+    and dropped with it. `date_formats` maps date columns to their profiled
+    format clusters; other text columns have theirs inferred on first parse.
+    """
+    
+    def __init__(
+        self,
+        df: Optional[pd.DataFrame] = None,
+        key: Optional[Hashable] = None,
+        date_formats: Optional[Dict[str, List[str]]] = None,
+        cache: Optional[ColumnCache] = None,
+        loader: Optional[Callable[[str], pd.Series]] = None
+    ):
+        if df is None and loader is None:
+            raise ValueError("TypedColumns needs a frame or a column loader")
+        self.df = df
+        self.loader = loader
+        self.cache = cache if cache is not None else column_cache
+        self.date_formats = dict(date_formats or {})
+        if key is None:
+            key = ('frame', id(self))
+            weakref.finalize(self, self.cache.discard, key)
+        self.key = key
+    
+    def column(self, column: str) -> pd.Series:
+        """Raw values of a column"""
+        if self.df is not None:
+            return self.df[column]
+        
+        def load():
+            series = self.loader(column)
+            return series, _nbytes(series)
+        
+        return self.cache.get((self.key, column, 'values'), load)
+    
+    def _get(self, column: str, kind: str, compute: Callable[[pd.Series], Any]) -> Any:
+        series = self.column(column)
+        
+        def build():
+            value = compute(series)
+            return value, _owned_bytes(value, series)
+        
+        return self.cache.get((self.key, column, kind), build)
+    
+    def null_mask(self, column: str) -> np.ndarray:
+        """Boolean mask of missing values"""
+        return self._get(column, 'null_mask', lambda series: series.isna().to_numpy())
+    
+    def numeric(self, column: str) -> pd.Series:
+        """Values as numbers, NaN where they do not convert"""
+        return self._get(column, 'numeric', partial(coerce_column, convert=pd.to_numeric))
+    
+    def dates(self, column: str, formats: Optional[List[str]] = None) -> pd.Series:
+        """Values parsed as datetimes, NaT where they do not parse"""
+        if formats is not None:
+            self.date_formats.setdefault(column, formats)
+        formats = self.date_formats.get(column)
+        return self._get(column, 'dates', partial(coerce_column, convert=partial(parse_dates, formats=formats)))
+    
+    def truncated_dates(self, column: str, grain: str) -> pd.Series:
+        """dates() truncated to a calendar grain (see analytics.dates.TIME_GRAINS)"""
+        return self._get(column, f'dates/{grain}', lambda series: truncate_dates(self.dates(column), grain))
+    
+    def numeric_values(self, column: str) -> np.ndarray:
+        """Non-null numbers as float64 (booleans as 0/1)"""
+        def compute(series):
+            values = self.numeric(column).to_numpy(dtype='float64', na_value=np.nan)
+            missing = np.isnan(values)
+            return values[~missing] if missing.any() else values
+        return self._get(column, 'numeric_values', compute)
+    
+    def sorted_values(self, column: str) -> np.ndarray:
+        """numeric_values in ascending order"""
+        return self._get(column, 'sorted_values', lambda series: np.sort(self.numeric_values(column)))
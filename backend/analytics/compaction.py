@@ -0,0 +1,115 @@
+"""
+Dtype Compaction
+Shrinks freshly loaded DataFrames before any analysis runs:
+- Integers downcast to the narrowest int/uint width holding min..max
+- Low-cardinality string columns become category (dictionary encoded)
+Floats stay float64: float32 values that round-trip exactly still sum,
+average and subtract in single precision, so aggregates would drift.
+"""
+import pandas as pd
+from typing import Any, Dict, List, Tuple
+
+# String columns with at most this share of distinct values become category
+CATEGORY_MAX_RATIO = 0.5
+
+
+def compact_series(series: pd.Series, category_max_ratio: float = CATEGORY_MAX_RATIO) -> pd.Series:
+    """
+    Return the narrowest lossless representation of a column
+    
+    Returns the input unchanged when no smaller safe dtype exists.
+    """
+    dtype = series.dtype
+    
+    if pd.api.types.is_bool_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+        return series
+    
+    if pd.api.types.is_integer_dtype(dtype):
+        if len(series) == 0:
+            return series
+        downcast = 'unsigned' if series.min() >= 0 else 'integer'
+        return pd.to_numeric(series, downcast=downcast)
+    
+    if dtype == object and pd.api.types.infer_dtype(series, skipna=True) == 'string':
+        non_null = series.count()
+        if non_null > 0 and series.nunique() / non_null <= category_max_ratio:
+            return series.astype('category')
+    
+    return series
+
+
+class CompactionReport:
+    """
+    Memory saved per column, accumulated over one or more frames
+    
+    Streaming uploads compact chunk by chunk; add() sums their bytes.
+    """
+    
+    def __init__(self):
+        self._columns: Dict[str, Dict[str, Any]] = {}
+    
+    def add(self, column: str, from_dtype: str, to_dtype: str, bytes_before: int, bytes_after: int):
+        entry = self._columns.setdefault(column, {
+            'column': column,
+            'from_dtype': from_dtype,
+            'to_dtypes': [],
+            'bytes_before': 0,
+            'bytes_after': 0
+        })
+        if to_dtype not in entry['to_dtypes']:
+            entry['to_dtypes'].append(to_dtype)
+        entry['bytes_before'] += int(bytes_before)
+        entry['bytes_after'] += int(bytes_after)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        columns: List[Dict[str, Any]] = []
+        for entry in self._columns.values():
+            columns.append({
+                'column': entry['column'],
+                'from_dtype': entry['from_dtype'],
+                'to_dtype': '|'.join(entry['to_dtypes']),
+                'bytes_before': entry['bytes_before'],
+                'bytes_after': entry['bytes_after'],
+                'bytes_saved': entry['bytes_before'] - entry['bytes_after']
+            })
+        
+        bytes_before = sum(c['bytes_before'] for c in columns)
+        bytes_after = sum(c['bytes_after'] for c in columns)
+        return {
+            'bytes_before': bytes_before,
+            'bytes_after': bytes_after,
+            'bytes_saved': bytes_before - bytes_after,
+            'columns': columns
+        }
+
+
+def compact_frame(
+    df: pd.DataFrame,
+    report: CompactionReport = None,
+    category_max_ratio: float = CATEGORY_MAX_RATIO
+) -> Tuple[pd.DataFrame, CompactionReport]:
+    """
+    Compact every column of a DataFrame
+    
+    Returns (compacted frame, report). Pass an existing report to
+    accumulate savings across the chunks of one upload.
+    """
+    report = report if report is not None else CompactionReport()
+    compacted = df.copy(deep=False)
+    
+    for col in df.columns:
+        series = df[col]
+        narrow = compact_series(series, category_max_ratio)
+        bytes_before = series.memory_usage(index=False, deep=True)
+        bytes_after = narrow.memory_usage(index=False, deep=True)
+        
+        # Dictionary overhead can outweigh the savings on tiny frames
+        if bytes_after >= bytes_before:
+            narrow, bytes_after = series, bytes_before
+        
+        report.add(str(col), str(series.dtype), str(narrow.dtype), bytes_before, bytes_after)
+        
+        if narrow is not series:
+            compacted[col] = narrow
+    
+    return compacted, report
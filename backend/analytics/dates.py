@@ -0,0 +1,232 @@
+"""
+Date Format Inference
+Work out strftime formats from a sample, then parse with them vectorized
+
+pd.to_datetime without format= guesses a format from the first value
+(wrong for day-first data, NaT for every other format in mixed columns)
+or falls back to per-element dateutil parsing. Here a column is split
+into format clusters once, and every later parse reuses those formats.
+"""
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+
+from analytics.sampling import sample_values
+
+# Values sampled when inferring formats; every candidate format is only
+# tried on the first DATE_PROBE_SIZE of them
+DATE_SAMPLE_SIZE = 1_024
+DATE_PROBE_SIZE = 128
+
+# Candidates in tie-break order: month-first before day-first (as pandas),
+# explicit formats before the ISO8601 catch-all
+DATE_FORMATS = (
+    '%Y-%m-%d',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%dT%H:%M',
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%Y-%m-%dT%H:%M:%S.%f',
+    '%Y/%m/%d',
+    '%Y/%m/%d %H:%M:%S',
+    '%Y-%m',
+    '%m/%d/%Y',
+    '%d/%m/%Y',
+    '%m/%d/%Y %H:%M',
+    '%d/%m/%Y %H:%M',
+    '%m/%d/%Y %H:%M:%S',
+    '%d/%m/%Y %H:%M:%S',
+    '%m/%d/%y',
+    '%d/%m/%y',
+    '%m-%d-%Y',
+    '%d-%m-%Y',
+    '%d.%m.%Y',
+    '%d.%m.%Y %H:%M',
+    '%d %b %Y',
+    '%d %B %Y',
+    '%b %d, %Y',
+    '%B %d, %Y',
+    '%b %d %Y',
+    '%d-%b-%Y',
+    '%d-%b-%y',
+    '%b %Y',
+    '%B %Y',
+    'ISO8601'
+)
+
+# Calendar grains dates can be truncated to (see truncate_dates)
+TIME_GRAINS = ('day', 'week', 'month', 'quarter', 'year')
+
+# Fewest buckets a default grain should split a date range into
+MIN_GRAIN_POINTS = 12
+
+# Average bucket length in days of the grains default_time_grain picks from
+GRAIN_DAYS = {'month': 30.44, 'week': 7.0, 'day': 1.0}
+
+
+def _parse_format(values: pd.Series, fmt: str) -> pd.Series:
+    """Parse with one format; offsets are normalised to naive UTC"""
+    utc = fmt == 'ISO8601' or '%z' in fmt
+    parsed = pd.to_datetime(values, format=fmt, errors='coerce', utc=utc)
+    if utc:
+        parsed = parsed.dt.tz_convert(None)
+    return parsed
+
+
+def _is_text(values: pd.Series) -> bool:
+    return values.dtype == object or pd.api.types.is_string_dtype(values)
+
+
+def _greedy_cover(sample: pd.Series, candidates) -> List[str]:
+    """Formats in the order that each parses the most values still unparsed"""
+    rows = []
+    for fmt in candidates:
+        rows.append(_parse_format(sample, fmt).notna().to_numpy())
+        if rows[-1].all():
+            # Nothing can beat full coverage, and ties keep candidate order
+            return [fmt]
+    matches = np.array(rows)
+    
+    formats = []
+    pending = np.ones(len(sample), dtype=bool)
+    while pending.any():
+        gains = (matches & pending).sum(axis=1)
+        best = int(np.argmax(gains))
+        if gains[best] == 0:
+            break
+        formats.append(candidates[best])
+        pending &= ~matches[best]
+    
+    return formats
+
+
+def infer_date_formats(
+    values: pd.Series,
+    candidates=DATE_FORMATS,
+    sample_size: int = DATE_SAMPLE_SIZE,
+    probe_size: int = DATE_PROBE_SIZE
+) -> List[str]:
+    """
+    Format clusters of a text column, largest first
+    
+    Candidates are picked greedily on a stratified sample: each next format
+    is the one parsing the most values not yet parsed (ties keep candidate
+    order). Every candidate is only tried on a small probe; the rest of the
+    sample is searched just for the values the probe's formats miss, and a
+    probe with no date-like value at all ends the search. An empty list
+    means the column does not look like dates.
+    """
+    non_null = values.dropna()
+    if len(non_null) == 0 or not (_is_text(non_null) or isinstance(non_null.dtype, pd.CategoricalDtype)):
+        return []
+    
+    # The sample is shuffled, so its prefix is a uniform probe
+    sample = sample_values(non_null, sample_size, np.random.default_rng(0)).astype(str)
+    probe = sample.iloc[:probe_size]
+    if not probe.str.contains(r'\d', regex=True).any():
+        return []  # every candidate format has digits
+    
+    formats = _greedy_cover(probe, candidates)
+    if not formats:
+        return []
+    
+    leftover = sample[parse_dates(sample, formats).isna().to_numpy()]
+    if len(leftover) > 0:
+        remaining = [fmt for fmt in candidates if fmt not in formats]
+        formats += _greedy_cover(leftover, remaining)
+    
+    return formats
+
+
+def parse_dates(values: pd.Series, formats: Optional[List[str]] = None, errors: str = 'coerce') -> pd.Series:
+    """
+    Vectorized pd.to_datetime over known format clusters
+    
+    Each format parses only the values earlier formats left unparsed.
+    `formats` defaults to infer_date_formats(values). Numbers and
+    datetimes convert as pd.to_datetime does.
+    
+    errors='coerce' turns unparsed values into NaT; 'raise' raises
+    ValueError if any non-null value matches none of the formats.
+    """
+    if not _is_text(values):
+        return pd.to_datetime(values, errors=errors)
+    
+    if formats is None:
+        formats = infer_date_formats(values)
+    if not formats:
+        result = pd.Series(pd.NaT, index=values.index, name=values.name, dtype='datetime64[ns]')
+        if errors == 'raise' and values.notna().any():
+            raise ValueError("Values do not look like dates")
+        return result
+    
+    # The largest cluster parses the whole column; later ones only the leftovers
+    parsed = _parse_format(values, formats[0])
+    pending = np.flatnonzero(parsed.isna().to_numpy() & values.notna().to_numpy())
+    if len(pending) == 0:
+        return parsed.rename(values.name)
+    
+    strings = values.to_numpy(dtype=object)
+    result = parsed.to_numpy(dtype='datetime64[ns]').copy()
+    
+    for fmt in formats[1:]:
+        if len(pending) == 0:
+            break
+        parsed = _parse_format(pd.Series(strings[pending], copy=False), fmt).to_numpy()
+        hit = ~np.isnat(parsed)
+        result[pending[hit]] = parsed[hit]
+        pending = pending[~hit]
+    
+    if errors == 'raise' and len(pending) > 0:
+        raise ValueError(f"{len(pending)} values match none of the date formats {formats}")
+    
+    return pd.Series(result, index=values.index, name=values.name)
+
+
+def truncate_dates(values: pd.Series, grain: str) -> pd.Series:
+    """
+    Start of each date's day, week (Monday), month, quarter or year
+    
+    Truncates datetime64 units directly, with no per-value Python;
+    NaT stays NaT. Raises ValueError for a grain not in TIME_GRAINS.
+    """
+    stamps = values.to_numpy(dtype='datetime64[ns]')
+    
+    if grain == 'day':
+        truncated = stamps.astype('datetime64[D]')
+    elif grain == 'week':
+        days = stamps.astype('datetime64[D]')
+        # Day 0 (1970-01-01) was a Thursday
+        truncated = days - ((days.astype('int64') + 3) % 7).astype('timedelta64[D]')
+    elif grain == 'month':
+        truncated = stamps.astype('datetime64[M]')
+    elif grain == 'quarter':
+        months = stamps.astype('datetime64[M]')
+        truncated = months - (months.astype('int64') % 3).astype('timedelta64[M]')
+    elif grain == 'year':
+        truncated = stamps.astype('datetime64[Y]')
+    else:
+        raise ValueError(f"Unknown time grain '{grain}' (expected one of {', '.join(TIME_GRAINS)})")
+    
+    return pd.Series(truncated.astype('datetime64[ns]'), index=values.index, name=values.name)
+
+
+def default_time_grain(earliest, latest, min_points: int = MIN_GRAIN_POINTS) -> str:
+    """
+    Granularity for charting a date range
+    
+    'month', or 'week' / 'day' when the range holds fewer than
+    `min_points` months / weeks. Unknown ranges get 'month'.
+    """
+    try:
+        span_days = (pd.Timestamp(latest) - pd.Timestamp(earliest)) / pd.Timedelta(days=1)
+    except (TypeError, ValueError):
+        return 'month'
+    if np.isnan(span_days):
+        return 'month'
+    
+    for grain, days in GRAIN_DAYS.items():
+        if span_days / days >= min_points:
+            return grain
+    return 'day'
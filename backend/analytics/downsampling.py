@@ -0,0 +1,53 @@
+"""
+Series Downsampling
+Cap a chart series to a point budget while keeping its visual shape
+
+Largest-Triangle-Three-Buckets (Steinarsson, 2013): the first and last
+points are always kept; the points between are split into equal buckets
+and each bucket keeps the point spanning the largest triangle with the
+point kept from the previous bucket and the average of the next one.
+Peaks and dips survive, where taking every k-th point would skip them.
+"""
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Positions of the points LTTB keeps, ascending
+    
+    `x` must be ascending and `y` free of NaN. Series of at most
+    `threshold` points are kept whole; a threshold below 3 keeps only
+    the endpoints.
+    """
+    n = len(x)
+    if n <= threshold:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1][:max(threshold, 0)], dtype=np.int64)
+    
+    # Offsets from the first x keep datetime nanoseconds well inside float precision
+    x = (np.asarray(x) - x[0]).astype('float64')
+    y = np.asarray(y, dtype='float64')
+    
+    # threshold - 2 buckets over the points between the endpoints
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    
+    kept = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # The next bucket's average; the last bucket looks at the final point
+        next_start, next_end = (end, edges[bucket + 2]) if bucket + 2 < len(edges) else (n - 1, n)
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+        
+        # Twice the triangle areas (the factor does not change the argmax)
+        areas = np.abs(
+            (x[kept] - next_x) * (y[start:end] - y[kept])
+            - (x[kept] - x[start:end]) * (next_y - y[kept])
+        )
+        kept = start + int(np.argmax(areas))
+        selected[bucket + 1] = kept
+    
+    return selected
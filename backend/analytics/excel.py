@@ -0,0 +1,145 @@
+"""
+Streaming Excel Reader
+Reads .xlsx sheets row by row in openpyxl read-only mode
+"""
+import io
+import os
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+# Rows buffered as Python tuples before being turned into typed columns
+BLOCK_ROWS = 10_000
+
+_SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+ExcelSource = Union[bytes, str]
+
+
+def _open(source: ExcelSource):
+    """Accept raw bytes or a file path"""
+    return io.BytesIO(source) if isinstance(source, bytes) else source
+
+
+def list_sheets(source: ExcelSource) -> List[Dict[str, Any]]:
+    """
+    List the sheets of a workbook without loading any cells
+    
+    Reads only xl/workbook.xml from the zip container, so the cost
+    does not depend on sheet size or shared-string table size.
+    """
+    with zipfile.ZipFile(_open(source)) as archive:
+        root = ET.fromstring(archive.read('xl/workbook.xml'))
+    
+    return [
+        {
+            'index': i,
+            'name': sheet.get('name'),
+            'visible': sheet.get('state', 'visible') == 'visible'
+        }
+        for i, sheet in enumerate(root.iter(f'{_SHEET_NS}sheet'))
+    ]
+
+
+def _header_names(row: tuple) -> List[str]:
+    """Header cells to column names, matching pd.read_excel for blanks/duplicates"""
+    names = []
+    seen: Dict[str, int] = {}
+    for i, value in enumerate(row):
+        name = f'Unnamed: {i}' if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _to_block(rows: List[tuple], columns: List[str]) -> pd.DataFrame:
+    """Turn buffered row tuples into typed columns (empty cells become NaN)"""
+    block = pd.DataFrame.from_records(rows, columns=columns).infer_objects()
+    for col in block.columns[block.dtypes == object]:
+        block[col] = block[col].where(block[col].notna(), np.nan)
+    return block
+
+
+def read_sheet(source: ExcelSource, sheet: Optional[Union[str, int]] = None) -> pd.DataFrame:
+    """
+    Stream one sheet into a DataFrame
+    
+    - Opens the workbook read-only (cells are parsed lazily, never kept as objects)
+    - Takes the first non-empty row as the header
+    - Converts every BLOCK_ROWS rows into typed columns and drops the tuples
+    - Skips fully blank rows, like pd.read_excel
+    
+    `sheet` is a sheet name or index; None means the first sheet.
+    """
+    workbook = load_workbook(_open(source), read_only=True, data_only=True, keep_links=False)
+    try:
+        if sheet is None:
+            worksheet = workbook.worksheets[0]
+        elif isinstance(sheet, int):
+            worksheet = workbook.worksheets[sheet]
+        else:
+            worksheet = workbook[sheet]
+        
+        columns: Optional[List[str]] = None
+        blocks: List[pd.DataFrame] = []
+        buffer: List[tuple] = []
+        
+        for row in worksheet.iter_rows(values_only=True):
+            if all(value is None for value in row):
+                continue
+            
+            if columns is None:
+                # Trailing empty header cells are formatting, not columns
+                width = max(i for i, value in enumerate(row) if value is not None) + 1
+                columns = _header_names(row[:width])
+                continue
+            
+            row = row[:len(columns)]
+            if len(row) < len(columns):
+                row = row + (None,) * (len(columns) - len(row))
+            buffer.append(row)
+            
+            if len(buffer) >= BLOCK_ROWS:
+                blocks.append(_to_block(buffer, columns))
+                buffer = []
+    finally:
+        workbook.close()
+    
+    if columns is None:
+        return pd.DataFrame()
+    
+    if buffer or not blocks:
+        blocks.append(_to_block(buffer, columns))
+    
+    return pd.concat(blocks, ignore_index=True) if len(blocks) > 1 else blocks[0]
+
+
+def read_sheets(
+    source: ExcelSource,
+    sheets: List[Union[str, int]],
+    workers: Optional[int] = None
+) -> Dict[Union[str, int], pd.DataFrame]:
+    """
+    Parse several sheets in parallel, one worker process per sheet
+    
+    Each worker opens its own read-only handle on the workbook,
+    so sheets never share parser state. Workers are spawned, not forked,
+    as in the profiler's pool.
+    """
+    if len(sheets) <= 1:
+        return {sheet: read_sheet(source, sheet) for sheet in sheets}
+    
+    workers = min(workers or os.cpu_count() or 1, len(sheets))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+        frames = pool.map(read_sheet, [source] * len(sheets), sheets)
+        return dict(zip(sheets, frames))
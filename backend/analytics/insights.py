@@ -2,9 +2,17 @@
 Analytics & Insights Engine
 Generates aggregations, trends, comparisons, and distributions
 """
+import os
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+
+from analytics.columns import TypedColumns
+from analytics.downsampling import lttb_indices
+from analytics.sketches import QuantileSketch, TopKSketch
+
+# Most points in one trend series (longer series are downsampled with LTTB)
+TREND_MAX_POINTS = int(os.getenv("TREND_MAX_POINTS", "500"))
 
 class InsightsEngine:
     """
@@ -13,17 +21,48 @@ class InsightsEngine:
     - Trends (over time)
     - Comparisons (by category)
     - Distributions (histograms)
+    
+    Medians and histogram bins come from one quantile sketch per column
+    (see build_sketches), shared by aggregations and distributions.
+    Every method takes an optional TypedColumns of `df`, so numbers are
+    coerced and dates parsed once across all of them.
     """
     
+    @staticmethod
+    def build_sketches(
+        df: pd.DataFrame,
+        numeric_cols: List[str],
+        columns: Optional[TypedColumns] = None
+    ) -> Dict[str, QuantileSketch]:
+        """
+        One quantile sketch per numeric column
+        """
+        columns = columns or TypedColumns(df)
+        return {
+            col: QuantileSketch.from_values(columns.numeric_values(col))
+            for col in numeric_cols
+            if col in df.columns and pd.api.types.is_numeric_dtype(df[col])
+        }
+    
     @staticmethod
     def generate_aggregations(
         df: pd.DataFrame,
         numeric_cols: List[str],
-        group_by: str = None
+        group_by: str = None,
+        sketches: Optional[Dict[str, QuantileSketch]] = None,
+        columns: Optional[TypedColumns] = None
     ) -> Dict[str, Any]:
         """
         Generate summary statistics and aggregations
+        
+        The summary reads each column's cached non-null values (shared with
+        the sketches), averaging from the sum instead of a second pass.
+        Group statistics of every numeric column come from one group-by
+        over the numeric block, so the group key is factorized once.
         """
+        sketches = sketches or {}
+        columns = columns or TypedColumns(df)
+        numeric_cols = [col for col in dict.fromkeys(numeric_cols) if col in df.columns]
         aggregations = {
             'summary': {},
             'by_group': {}
@@ -31,25 +70,26 @@ class InsightsEngine:
         
         # Overall summary
         for col in numeric_cols:
-            if col in df.columns:
-                non_null = df[col].dropna()
-                if len(non_null) > 0:
-                    aggregations['summary'][col] = {
-                        'sum': float(non_null.sum()),
-                        'count': int(len(non_null)),
-                        'average': float(non_null.mean()),
-                        'min': float(non_null.min()),
-                        'max': float(non_null.max()),
-                        'median': float(non_null.median())
-                    }
+            non_null = columns.numeric_values(col)
+            if len(non_null) > 0:
+                sketch = sketches.get(col) or QuantileSketch.from_values(non_null)
+                total = float(non_null.sum())
+                aggregations['summary'][col] = {
+                    'sum': total,
+                    'count': int(len(non_null)),
+                    'average': total / len(non_null),
+                    'min': float(non_null.min()),
+                    'max': float(non_null.max()),
+                    'median': sketch.median()
+                }
         
         # Group by analysis
-        if group_by and group_by in df.columns:
+        if group_by and group_by in df.columns and numeric_cols:
             try:
+                block = pd.DataFrame({col: columns.numeric(col) for col in numeric_cols})
+                grouped = block.groupby(columns.column(group_by), observed=True).agg(['sum', 'count', 'mean'])
                 for col in numeric_cols:
-                    if col in df.columns:
-                        grouped = df.groupby(group_by)[col].agg(['sum', 'count', 'mean']).reset_index()
-                        aggregations['by_group'][col] = grouped.to_dict('records')
+                    aggregations['by_group'][col] = grouped[col].reset_index().to_dict('records')
             except Exception as e:
                 pass
         
@@ -59,10 +99,21 @@ class InsightsEngine:
     def detect_trends(
         df: pd.DataFrame,
         date_col: str,
-        numeric_cols: List[str]
+        numeric_cols: List[str],
+        date_formats: Optional[List[str]] = None,
+        columns: Optional[TypedColumns] = None,
+        grain: Optional[str] = 'month',
+        max_points: int = TREND_MAX_POINTS
     ) -> Dict[str, List[Dict]]:
         """
         Detect trends over time
+        
+        Metrics are summed per `grain` (day/week/month/quarter/year, usually
+        the time dimension's time_granularity; None keeps every distinct
+        timestamp), all in one group-by. Series longer than `max_points`
+        are downsampled with LTTB, so payloads stay bounded however
+        fine-grained the events. Pass the column's profiled `date_formats`
+        to skip format inference.
         """
         trends = {}
         
@@ -70,15 +121,25 @@ class InsightsEngine:
             return trends
         
         try:
-            df_sorted = df.copy()
-            df_sorted[date_col] = pd.to_datetime(df_sorted[date_col])
-            df_sorted = df_sorted.sort_values(date_col)
+            columns = columns or TypedColumns(df)
+            dates = columns.dates(date_col, date_formats)
+            if grain is not None:
+                dates = columns.truncated_dates(date_col, grain)
+            
+            numeric_cols = [col for col in dict.fromkeys(numeric_cols) if col in df.columns]
+            if not numeric_cols:
+                return trends
+            
+            # Group by date and aggregate
+            block = pd.DataFrame({col: columns.numeric(col) for col in numeric_cols})
+            totals = block.groupby(dates).sum()
+            stamps = totals.index.to_numpy(dtype='datetime64[ns]').astype('int64')
             
             for col in numeric_cols:
-                if col in df.columns:
-                    # Group by date and aggregate
-                    trend_data = df_sorted.groupby(date_col)[col].sum().reset_index()
-                    trends[col] = trend_data.to_dict('records')
+                series = totals[[col]]
+                if len(series) > max_points:
+                    series = series.iloc[lttb_indices(stamps, series[col].to_numpy(dtype='float64'), max_points)]
+                trends[col] = series.reset_index().to_dict('records')
         except Exception as e:
             pass
         
@@ -88,7 +149,9 @@ class InsightsEngine:
     def generate_distribution(
         df: pd.DataFrame,
         column: str,
-        bins: int = 10
+        bins: int = 10,
+        sketch: Optional[QuantileSketch] = None,
+        columns: Optional[TypedColumns] = None
     ) -> Dict[str, Any]:
         """
         Generate histogram/distribution data
@@ -100,23 +163,19 @@ class InsightsEngine:
         }
         
         try:
-            data = df[column].dropna()
-            if len(data) > 0:
-                if pd.api.types.is_numeric_dtype(data):
-                    counts, bin_edges = np.histogram(data, bins=bins)
-                    for i in range(len(counts)):
-                        distribution['bins'].append({
-                            'min': float(bin_edges[i]),
-                            'max': float(bin_edges[i + 1]),
-                            'count': int(counts[i])
-                        })
+            columns = columns or TypedColumns(df)
+            if not columns.null_mask(column).all():
+                if pd.api.types.is_numeric_dtype(df[column]):
+                    sketch = sketch or QuantileSketch.from_values(columns.numeric_values(column))
+                    distribution['bins'] = sketch.histogram(bins)
                 else:
-                    # For categorical
-                    value_counts = data.value_counts().head(10)
-                    distribution['values'] = [
-                        {'category': str(cat), 'count': int(count)}
-                        for cat, count in value_counts.items()
-                    ]
+                    # For categorical (counts carry an error bound once approximate)
+                    top = TopKSketch.from_values(df[column])
+                    for entry in top.top(10):
+                        value = {'category': str(entry['value']), 'count': entry['count']}
+                        if not top.exact:
+                            value['count_error'] = entry['error']
+                        distribution['values'].append(value)
         except Exception as e:
             pass
         
@@ -125,27 +184,39 @@ class InsightsEngine:
     @staticmethod
     def generate_all_insights(
         df: pd.DataFrame,
-        profile: Dict
+        profile: Dict,
+        columns: Optional[TypedColumns] = None,
+        time_granularity: str = 'month'
     ) -> Dict[str, Any]:
         """
         Generate comprehensive insights
+        
+        Trends are resampled to `time_granularity` (the semantic time
+        dimension's default drill level).
         """
         numeric_cols = profile.get('numeric_columns', [])
         date_cols = profile.get('date_columns', [])
+        columns = columns or TypedColumns(df)
+        
+        sketches = InsightsEngine.build_sketches(df, numeric_cols, columns)
         
         insights = {
-            'aggregations': InsightsEngine.generate_aggregations(df, numeric_cols),
+            'aggregations': InsightsEngine.generate_aggregations(df, numeric_cols, sketches=sketches, columns=columns),
             'distributions': {},
             'trends': {}
         }
         
         # Distributions for numeric columns
         for col in numeric_cols[:5]:  # Limit to first 5
-            insights['distributions'][col] = InsightsEngine.generate_distribution(df, col)
+            insights['distributions'][col] = InsightsEngine.generate_distribution(
+                df, col, sketch=sketches.get(col), columns=columns
+            )
         
         # Trends if we have date column
         if date_cols:
             date_col = date_cols[0]
-            insights['trends'] = InsightsEngine.detect_trends(df, date_col, numeric_cols)
+            insights['trends'] = InsightsEngine.detect_trends(
+                df, date_col, numeric_cols, columns=columns, grain=time_granularity
+            )
         
         return insights
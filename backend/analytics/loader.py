@@ -4,46 +4,212 @@ Handles CSV and Excel file loading
 """
 import pandas as pd
 import io
-from typing import Tuple
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from analytics import excel
+from analytics.compaction import compact_frame
+
+# .xlsx workbooks are zip containers
+XLSX_MAGIC = b'PK'
+
+# Below this size a single pd.read_csv call beats pool start-up and pickling
+MIN_PARALLEL_BYTES = 8 * 1024 * 1024
+
+
+def split_csv_ranges(content: bytes, parts: int) -> Tuple[int, List[Tuple[int, int]]]:
+    """
+    Split CSV bytes into row-aligned byte ranges
+    
+    A newline is a record boundary only when an even number of quote
+    characters precede it; otherwise it sits inside a quoted field.
+    Escaped quotes ("") count twice, so the parity rule still holds.
+    
+    Returns (header_end, [(start, end), ...]) where content[:header_end]
+    is the header line and the ranges cover the rest of the file.
+    """
+    def next_boundary(pos: int, quotes_before: int) -> Tuple[int, int]:
+        # Advance to the next newline outside quotes, carrying the quote count
+        while True:
+            newline = content.find(b'\n', pos)
+            if newline == -1:
+                return len(content), quotes_before + content.count(b'"', pos)
+            quotes_before += content.count(b'"', pos, newline)
+            if quotes_before % 2 == 0:
+                return newline + 1, quotes_before
+            pos = newline + 1
+    
+    header_end, quotes = next_boundary(0, 0)
+    body_size = len(content) - header_end
+    target = max(body_size // max(parts, 1), 1)
+    
+    ranges = []
+    start = header_end
+    while start < len(content):
+        # Count quotes up to the split target, then finish the current record
+        probe = min(start + target, len(content))
+        quotes += content.count(b'"', start, probe)
+        end, quotes = next_boundary(probe, quotes)
+        ranges.append((start, end))
+        start = end
+    
+    return header_end, ranges
+
+
+def _parse_csv_range(header: bytes, body: bytes, dtype: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """Parse one row-aligned byte range (runs in a worker process)"""
+    return pd.read_csv(io.BytesIO(header + body), dtype=dtype)
+
+
+def _is_plain_numeric(dtype) -> bool:
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
 
 class DataLoader:
     """Load and parse CSV and Excel files"""
     
     @staticmethod
-    def load_csv(file_content: bytes) -> pd.DataFrame:
-        """Load CSV file"""
+    def load_csv(file_content: bytes, parallel: bool = False, workers: Optional[int] = None) -> pd.DataFrame:
+        """
+        Load CSV file
+        
+        With parallel=True, files above MIN_PARALLEL_BYTES are parsed
+        across a process pool (see load_csv_parallel).
+        """
         try:
+            if parallel and len(file_content) >= MIN_PARALLEL_BYTES:
+                return DataLoader.load_csv_parallel(file_content, workers)
             df = pd.read_csv(io.BytesIO(file_content))
             return df
         except Exception as e:
             raise ValueError(f"Error loading CSV: {str(e)}")
     
     @staticmethod
-    def load_excel(file_content: bytes) -> pd.DataFrame:
-        """Load Excel file"""
+    def load_csv_parallel(file_content: bytes, workers: Optional[int] = None) -> pd.DataFrame:
+        """
+        Parse a CSV on several cores
+        
+        1. Split the bytes at record boundaries (quote-aware)
+        2. Parse each range in a process pool, prefixed with the header
+        3. Reconcile dtypes so every column has one type, then concatenate
+        
+        Ranges that inferred numbers for a column that is text elsewhere are
+        re-parsed with that column as strings, so values keep their original
+        spelling exactly as a single pd.read_csv call would return them.
+        """
+        workers = workers or os.cpu_count() or 1
+        header_end, ranges = split_csv_ranges(file_content, workers)
+        header = file_content[:header_end]
+        
+        if len(ranges) <= 1:
+            return pd.read_csv(io.BytesIO(file_content))
+        
+        bodies = [file_content[start:end] for start, end in ranges]
+        
+        # Spawned, not forked, like the profiler's pool: forking from a job
+        # thread while another thread holds a lock can deadlock the child
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+            frames = list(pool.map(_parse_csv_range, [header] * len(bodies), bodies))
+            
+            # Columns that are text in some ranges and numbers in others
+            text_cols = [
+                col for col in frames[0].columns
+                if any(f[col].dtype == object for f in frames)
+                and any(_is_plain_numeric(f[col].dtype) for f in frames)
+            ]
+            
+            if text_cols:
+                redo = [i for i, f in enumerate(frames) if any(f[col].dtype != object for col in text_cols)]
+                dtype = {col: str for col in text_cols}
+                reparsed = pool.map(
+                    _parse_csv_range,
+                    [header] * len(redo),
+                    [bodies[i] for i in redo],
+                    [dtype] * len(redo)
+                )
+                for i, frame in zip(redo, reparsed):
+                    frames[i] = frame
+        
+        # Mixed int/float ranges widen to float64, as a single parse would
+        for col in frames[0].columns:
+            dtypes = {f[col].dtype for f in frames}
+            if len(dtypes) > 1 and all(_is_plain_numeric(d) for d in dtypes):
+                for f in frames:
+                    f[col] = f[col].astype('float64')
+        
+        return pd.concat(frames, ignore_index=True)
+    
+    @staticmethod
+    def load_excel(file_content: bytes, sheet: Optional[Union[str, int]] = None) -> pd.DataFrame:
+        """
+        Load Excel file
+        
+        .xlsx sheets are streamed in read-only mode (see analytics.excel);
+        legacy .xls workbooks are not zip files and go through pd.read_excel.
+        """
         try:
-            df = pd.read_excel(io.BytesIO(file_content))
-            return df
+            if not file_content.startswith(XLSX_MAGIC):
+                df = pd.read_excel(io.BytesIO(file_content), sheet_name=sheet or 0)
+                return df
+            return excel.read_sheet(file_content, sheet)
         except Exception as e:
             raise ValueError(f"Error loading Excel: {str(e)}")
     
     @staticmethod
-    def load_file(file_content: bytes, filename: str) -> pd.DataFrame:
+    def list_excel_sheets(file_content: bytes) -> List[Dict[str, Any]]:
+        """Sheet names of a workbook, without reading any cells"""
+        try:
+            if not file_content.startswith(XLSX_MAGIC):
+                names = pd.ExcelFile(io.BytesIO(file_content)).sheet_names
+                return [{'index': i, 'name': name, 'visible': True} for i, name in enumerate(names)]
+            return excel.list_sheets(file_content)
+        except Exception as e:
+            raise ValueError(f"Error reading Excel sheets: {str(e)}")
+    
+    @staticmethod
+    def load_excel_sheets(
+        file_content: bytes,
+        sheets: List[Union[str, int]],
+        workers: Optional[int] = None
+    ) -> Dict[Union[str, int], pd.DataFrame]:
+        """Load several sheets, parsed in parallel worker processes"""
+        try:
+            if not file_content.startswith(XLSX_MAGIC):
+                return pd.read_excel(io.BytesIO(file_content), sheet_name=sheets)
+            return excel.read_sheets(file_content, sheets, workers)
+        except Exception as e:
+            raise ValueError(f"Error loading Excel: {str(e)}")
+    
+    @staticmethod
+    def load_file(
+        file_content: bytes,
+        filename: str,
+        parallel: bool = False,
+        compact: bool = True
+    ) -> pd.DataFrame:
         """
         Auto-detect file type and load
         
         Args:
             file_content: Raw file bytes
             filename: Original filename with extension
-            
+            parallel: Parse large CSVs on multiple cores
+            compact: Downcast integers and dictionary-encode repeated strings
+        
         Returns:
             Loaded DataFrame
         """
         filename_lower = filename.lower()
         
         if filename_lower.endswith('.csv'):
-            return DataLoader.load_csv(file_content)
+            df = DataLoader.load_csv(file_content, parallel=parallel)
         elif filename_lower.endswith(('.xlsx', '.xls')):
-            return DataLoader.load_excel(file_content)
+            df = DataLoader.load_excel(file_content)
         else:
             raise ValueError(f"Unsupported file type: {filename}")
+        
+        if compact:
+            df, _ = compact_frame(df)
+        return df
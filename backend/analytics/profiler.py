@@ -5,7 +5,13 @@ Automatically detects column types and data characteristics
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from typing import Dict, List, Any
+from functools import partial
+from typing import Dict, List, Any, Optional
+
+from analytics.columns import TypedColumns
+from analytics.dates import infer_date_formats, parse_dates
+from analytics.sampling import sample_values
+from analytics.sketches import QuantileSketch, TopKSketch, distinct_count
 
 class DataProfiler:
     """
@@ -26,11 +32,26 @@ class DataProfiler:
         'date', 'time', 'day', 'month', 'year', 'created', 'updated'
     ]
     
+    # Columns longer than this are checked on a sample before a full conversion
+    TYPE_SAMPLE_SIZE = 1_000
+    
+    @staticmethod
+    def _converts(values: pd.Series, convert) -> bool:
+        try:
+            convert(values)
+            return True
+        except (ValueError, TypeError):
+            return False
+    
     @staticmethod
-    def detect_column_type(series: pd.Series) -> str:
+    def detect_column_type(series: pd.Series, sample: bool = True) -> str:
         """
         Detect column type
         
+        Numeric/date require every value to convert, so one failing value
+        in a stratified sample rejects the type without touching the rest
+        of the column; only a clean sample is confirmed by a full conversion.
+        
         Returns: 'numeric', 'date', 'categorical', 'text'
         """
         # Skip null values
@@ -39,32 +60,38 @@ class DataProfiler:
         if len(non_null) == 0:
             return 'text'
         
-        # Try numeric
-        try:
-            pd.to_numeric(non_null)
-            return 'numeric'
-        except (ValueError, TypeError):
-            pass
+        probe = None
+        if sample and len(non_null) > DataProfiler.TYPE_SAMPLE_SIZE:
+            probe = sample_values(non_null, DataProfiler.TYPE_SAMPLE_SIZE, np.random.default_rng(0))
         
-        # Try datetime
-        try:
-            pd.to_datetime(non_null)
-            return 'date'
-        except (ValueError, TypeError):
-            pass
+        # Try numeric, then datetime (formats inferred once, then parsed vectorized)
+        for col_type in ('numeric', 'date'):
+            if col_type == 'numeric':
+                convert = pd.to_numeric
+            else:
+                formats = infer_date_formats(non_null if probe is None else probe)
+                convert = partial(parse_dates, formats=formats, errors='raise')
+            
+            if probe is not None and not DataProfiler._converts(probe, convert):
+                continue
+            if DataProfiler._converts(non_null, convert):
+                return col_type
         
-        # Check cardinality for categorical vs text
-        unique_ratio = len(non_null.unique()) / len(non_null)
+        # Check cardinality for categorical vs text (HyperLogLog on large columns)
+        unique_ratio = distinct_count(non_null)[0] / len(non_null)
         if unique_ratio < 0.05:  # Less than 5% unique values
             return 'categorical'
         
         return 'text'
     
     @staticmethod
-    def profile_dataframe(df: pd.DataFrame) -> Dict[str, Any]:
+    def profile_dataframe(df: pd.DataFrame, columns: Optional[TypedColumns] = None) -> Dict[str, Any]:
         """
         Generate comprehensive data profile
         
+        Null masks and numbers come from `columns` (a TypedColumns of `df`),
+        so engines given the same instance reuse them.
+        
         Returns:
         {
             'shape': (rows, cols),
@@ -96,8 +123,12 @@ class DataProfiler:
             'numeric_columns': []
         }
         
+        columns = columns or TypedColumns(df)
+        
         for col in df.columns:
             col_type = DataProfiler.detect_column_type(df[col])
+            null_count = int(columns.null_mask(col).sum())
+            unique_count, unique_approximate = distinct_count(df[col])
             is_kpi = any(kpi in col.lower() for kpi in DataProfiler.KPI_KEYWORDS)
             is_date = any(date_kw in col.lower() for date_kw in DataProfiler.DATE_KEYWORDS)
             
@@ -106,24 +137,27 @@ class DataProfiler:
                 'type': col_type,
                 'is_kpi': is_kpi,
                 'is_date': is_date,
-                'null_count': int(df[col].isna().sum()),
-                'null_percentage': float(df[col].isna().sum() / len(df) * 100),
-                'unique_count': int(df[col].nunique())
+                'null_count': null_count,
+                'null_percentage': float(null_count / len(df) * 100),
+                'unique_count': unique_count,
+                'unique_count_approximate': unique_approximate
             }
             
             # Add type-specific stats
             if col_type == 'numeric':
-                non_null = df[col].dropna()
+                non_null = columns.numeric_values(col)
                 if len(non_null) > 0:
                     col_info['min'] = float(non_null.min())
                     col_info['max'] = float(non_null.max())
                     col_info['mean'] = float(non_null.mean())
-                    col_info['median'] = float(non_null.median())
-                    col_info['std'] = float(non_null.std())
+                    col_info['median'] = QuantileSketch.from_values(non_null).median()
+                    col_info['std'] = float(non_null.std(ddof=1))
                 profile['numeric_columns'].append(col)
             
             elif col_type == 'categorical':
-                col_info['categories'] = df[col].dropna().unique().tolist()[:10]
+                # Ten most frequent categories, counted in bounded memory
+                top = TopKSketch.from_values(df[col]).top(10)
+                col_info['categories'] = [entry['value'] for entry in top]
                 profile['categorical_columns'].append(col)
             
             elif col_type == 'date':
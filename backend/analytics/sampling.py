@@ -0,0 +1,117 @@
+"""
+Sampling Helpers
+Classify columns from a sample instead of converting every value
+"""
+import math
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, Optional, Tuple
+
+# z-score of the confidence bound used for early stopping (99%)
+CONFIDENCE_Z = 2.576
+
+# Sequential sample sizes: stop at the first size whose bound is decisive
+SAMPLE_STEPS = (256, 1_024, 4_096, 16_384)
+
+
+def stratified_positions(n: int, size: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    One random position from each of `size` equal strata of 0..n-1, shuffled
+    
+    Stratifying keeps sorted or blocked files (e.g. text rows appended
+    after numeric ones) represented; shuffling makes every prefix of the
+    result a uniform sample, so it can be consumed in growing steps.
+    """
+    if size >= n:
+        positions = np.arange(n)
+    else:
+        edges = np.linspace(0, n, size + 1)
+        positions = (edges[:-1] + rng.random(size) * np.diff(edges)).astype('int64')
+        positions = np.minimum(positions, n - 1)
+    rng.shuffle(positions)
+    return positions
+
+
+def wilson_interval(successes: int, trials: int, z: float = CONFIDENCE_Z) -> Tuple[float, float]:
+    """Wilson score interval for a binomial proportion"""
+    if trials == 0:
+        return 0.0, 1.0
+    p = successes / trials
+    denom = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denom
+    half = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denom
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+def sample_ratio(
+    values: pd.Series,
+    matches: Callable[[pd.Series], pd.Series],
+    threshold: float,
+    rng: np.random.Generator,
+    steps: Tuple[int, ...] = SAMPLE_STEPS
+) -> Dict[str, Optional[float]]:
+    """
+    Estimate the share of `values` for which `matches` is true
+    
+    Draws a stratified sample and tests it in growing steps, stopping as
+    soon as the confidence interval lies entirely above or below
+    `threshold`. `values` must already exclude nulls.
+    
+    Returns:
+    - 'above': True / False once decided, None if still ambiguous
+    - 'ratio': estimated share
+    - 'margin': half-width of the confidence interval (0 when exact)
+    - 'sample_size': values tested
+    """
+    n = len(values)
+    positions = stratified_positions(n, min(n, steps[-1]), rng)
+    
+    tested = 0
+    hits = 0
+    for step in steps:
+        end = min(step, len(positions))
+        if end > tested:
+            hits += int(matches(values.iloc[positions[tested:end]]).sum())
+            tested = end
+        
+        ratio = hits / tested
+        if tested == n:
+            # Whole column seen: the ratio is exact
+            return {'above': ratio > threshold, 'ratio': ratio, 'margin': 0.0, 'sample_size': tested}
+        
+        low, high = wilson_interval(hits, tested)
+        if low > threshold or high <= threshold:
+            return {'above': low > threshold, 'ratio': ratio, 'margin': (high - low) / 2, 'sample_size': tested}
+        
+        if end == len(positions):
+            break
+    
+    low, high = wilson_interval(hits, tested)
+    return {'above': None, 'ratio': hits / tested, 'margin': (high - low) / 2, 'sample_size': tested}
+
+
+def sample_values(values: pd.Series, size: int, rng: np.random.Generator) -> pd.Series:
+    """Stratified sample of at most `size` values, in random order"""
+    return values.iloc[stratified_positions(len(values), min(len(values), size), rng)]
+
+
+def estimate_distinct(sample: pd.Series, population: int) -> int:
+    """
+    Distinct values of a population estimated from a uniform sample
+    
+    GEE estimator (Charikar et al. 2000): values seen once in the sample
+    stand for sqrt(N / n) distinct values each, values seen more often
+    for themselves. Its ratio error is bounded by O(sqrt(N / n)) on any
+    data. A sample without any repeat looks like a key column and is
+    scaled up linearly instead. `sample` must already exclude nulls.
+    """
+    n = len(sample)
+    if n == 0 or population <= n:
+        return int(sample.nunique())
+    
+    counts = sample.value_counts()
+    singletons = int((counts == 1).sum())
+    if singletons == n:
+        return population
+    estimate = math.sqrt(population / n) * singletons + (len(counts) - singletons)
+    return int(min(round(estimate), population))
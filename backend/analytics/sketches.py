@@ -0,0 +1,464 @@
+"""
+Probabilistic Sketches
+Fixed-size summaries that replace exact per-column hash tables on large data:
+- HyperLogLog: approximate distinct counts with a configurable error bound
+- QuantileSketch (KLL): mergeable median / quartiles / histograms
+- TopKSketch (space-saving): most frequent values with count error bounds
+
+Every sketch has to_dict() / from_dict() with JSON-safe output, so profile
+state can be persisted and merged with the state of rows added later.
+"""
+import base64
+import math
+import os
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Columns with more rows than this get approximate distinct counts
+DISTINCT_APPROX_MIN_ROWS = int(os.getenv("DISTINCT_APPROX_MIN_ROWS", "1000000"))
+
+# Target relative standard error of approximate distinct counts
+DISTINCT_ERROR = float(os.getenv("DISTINCT_ERROR", "0.01"))
+
+# Values hashed per block, so the hash buffer stays small on huge columns
+HASH_BLOCK_ROWS = 262_144
+
+# KLL accuracy parameter: rank error is roughly 1.7 / k (k=200: ~0.8%)
+QUANTILE_K = int(os.getenv("QUANTILE_SKETCH_K", "200"))
+
+# Quantile sketches keep every value (exact answers) up to this many
+QUANTILE_EXACT_ROWS = 100_000
+
+# Counters kept by top-value sketches; columns with at most this many
+# distinct values get exact counts
+TOP_VALUES_CAPACITY = int(os.getenv("TOP_VALUES_CAPACITY", "1024"))
+
+
+def _encode_array(values: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(values).tobytes()).decode('ascii')
+
+
+def _decode_array(data: str, dtype) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=dtype).copy()
+
+
+def _json_value(value):
+    """A frequency-table key as a JSON-safe value"""
+    if isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def hash_values(series: pd.Series) -> np.ndarray:
+    """
+    64-bit hashes of the non-null values of a column
+    
+    Numbers are hashed as float64 (and -0.0 as 0.0), so 1 and 1.0 from
+    differently inferred chunks hash alike, matching Series.nunique().
+    """
+    values = series.dropna()
+    if pd.api.types.is_numeric_dtype(values) and not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype('float64') + 0.0
+    # categorize=False: hash every value directly instead of factorizing first
+    return pd.util.hash_pandas_object(values, index=False, categorize=False).to_numpy()
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct-count sketch (Flajolet et al. 2007)
+    
+    2^precision one-byte registers; the relative standard error is
+    about 1.04 / sqrt(2^precision) (precision 14: 16KB, ~0.8%).
+    Sketches of the same precision merge by register-wise max, so
+    chunks, files and dataset versions can be combined later.
+    """
+    
+    MIN_PRECISION = 4
+    MAX_PRECISION = 18
+    
+    def __init__(self, precision: Optional[int] = None, error: float = DISTINCT_ERROR):
+        if precision is None:
+            precision = math.ceil(math.log2((1.04 / error) ** 2))
+        self.precision = max(self.MIN_PRECISION, min(self.MAX_PRECISION, precision))
+        self.registers = np.zeros(1 << self.precision, dtype=np.uint8)
+    
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(len(self.registers))
+    
+    def add_hashes(self, hashes: np.ndarray):
+        """Fold 64-bit hashes into the registers"""
+        if len(hashes) == 0:
+            return
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - p)) - 1)
+        
+        # Rank = position of the leftmost 1-bit in the remaining 64-p bits
+        _, exponent = np.frexp(rest.astype(np.float64))
+        rank = np.where(rest == 0, 64 - p + 1, 64 - p - exponent + 1)
+        
+        # Max rank per register: sort (register, rank) keys, keep the last of each run
+        keys = np.sort((index << 6) | rank)
+        index, rank = keys >> 6, (keys & 63).astype(np.uint8)
+        last = np.ones(len(keys), dtype=bool)
+        last[:-1] = index[1:] != index[:-1]
+        index, rank = index[last], rank[last]
+        self.registers[index] = np.maximum(self.registers[index], rank)
+    
+    def update(self, series: pd.Series):
+        """Add the non-null values of a column (hashed block by block)"""
+        for start in range(0, len(series), HASH_BLOCK_ROWS):
+            self.add_hashes(hash_values(series.iloc[start:start + HASH_BLOCK_ROWS]))
+    
+    def merge(self, other: 'HyperLogLog'):
+        """Combine with a sketch of the same precision"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {'precision': self.precision, 'registers': _encode_array(self.registers)}
+    
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'HyperLogLog':
+        sketch = cls(precision=state['precision'])
+        sketch.registers = _decode_array(state['registers'], np.uint8)
+        return sketch
+    
+    def count(self) -> int:
+        """Estimated number of distinct values"""
+        m = len(self.registers)
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        
+        # Small-range correction: linear counting while registers are still empty
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros > 0:
+            estimate = m * math.log(m / zeros)
+        
+        return int(round(estimate))
+
+
+def distinct_count(
+    series: pd.Series,
+    approximate: Optional[bool] = None,
+    error: float = DISTINCT_ERROR
+) -> Tuple[int, bool]:
+    """
+    Number of distinct non-null values
+    
+    Exact (Series.nunique) up to DISTINCT_APPROX_MIN_ROWS rows, HyperLogLog
+    above; pass `approximate` to force either mode.
+    
+    Returns (count, approximate).
+    """
+    if approximate is None:
+        approximate = len(series) > DISTINCT_APPROX_MIN_ROWS
+    
+    if not approximate:
+        return int(series.nunique()), False
+    
+    sketch = HyperLogLog(error=error)
+    sketch.update(series)
+    return sketch.count(), True
+
+
+def duplicate_count(values: int, distinct: int, approximate: bool, error: float = DISTINCT_ERROR) -> int:
+    """
+    Values beyond the first occurrence of each distinct value
+    
+    With an approximate distinct count, a gap within two standard errors
+    is indistinguishable from zero, so all-unique ID columns are not
+    reported as duplicated.
+    """
+    duplicates = max(values - distinct, 0)
+    if approximate and duplicates <= 2 * error * distinct:
+        return 0
+    return duplicates
+
+
+class QuantileSketch:
+    """
+    KLL quantile sketch (Karnin, Lang & Liberty 2016)
+    
+    Values are kept in levels of compactors; an item on level h stands for
+    2^h original values. A level over capacity is sorted and every other
+    item (random offset) moves up one level, so memory stays O(k log n)
+    while rank error stays about 1.7 / k.
+    
+    Up to `exact_limit` values nothing is compacted and every answer
+    (quantiles, counts, histogram) equals the numpy result on the raw data.
+    Sketches merge level by level, so chunk or file sketches combine into
+    the sketch of the whole column.
+    """
+    
+    def __init__(
+        self,
+        k: int = QUANTILE_K,
+        exact_limit: int = QUANTILE_EXACT_ROWS,
+        rng: Optional[np.random.Generator] = None
+    ):
+        self.k = k
+        self.exact_limit = exact_limit
+        self._rng = rng if rng is not None else np.random.default_rng(0)
+        self.levels: List[np.ndarray] = [np.empty(0, dtype='float64')]
+        self.count = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.exact = True
+    
+    @classmethod
+    def from_values(cls, values, **kwargs) -> 'QuantileSketch':
+        sketch = cls(**kwargs)
+        sketch.update(values)
+        return sketch
+    
+    def update(self, values):
+        """Add numeric values (NaN is ignored)"""
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        
+        self._extend(float(values.min()), float(values.max()), len(values), [values])
+    
+    def merge(self, other: 'QuantileSketch'):
+        """Fold another sketch into this one"""
+        if other.count == 0:
+            return
+        self.exact = self.exact and other.exact
+        self._extend(other.min, other.max, other.count, other.levels)
+    
+    def compacted(self) -> 'QuantileSketch':
+        """Copy reduced to its k-bounded size (no longer exact)"""
+        sketch = QuantileSketch(self.k, self.exact_limit, self._rng)
+        sketch.merge(self)
+        if sketch.exact:
+            sketch.exact = False
+            sketch._compress()
+        return sketch
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'k': self.k,
+            'exact_limit': self.exact_limit,
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'exact': self.exact,
+            'levels': [_encode_array(level) for level in self.levels]
+        }
+    
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any], rng: Optional[np.random.Generator] = None) -> 'QuantileSketch':
+        sketch = cls(k=state['k'], exact_limit=state['exact_limit'], rng=rng)
+        sketch.count = state['count']
+        sketch.min = state['min']
+        sketch.max = state['max']
+        sketch.exact = state['exact']
+        sketch.levels = [_decode_array(level, 'float64') for level in state['levels']]
+        return sketch
+    
+    def _extend(self, low: float, high: float, count: int, levels: List[np.ndarray]):
+        self.count += count
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        
+        while len(self.levels) < len(levels):
+            self.levels.append(np.empty(0, dtype='float64'))
+        for h, items in enumerate(levels):
+            if len(items):
+                self.levels[h] = np.concatenate([self.levels[h], items])
+        
+        if self.exact and self.count <= self.exact_limit:
+            return
+        self.exact = False
+        self._compress()
+    
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+    
+    def _compress(self):
+        compacted = True
+        while compacted:
+            compacted = False
+            for h in range(len(self.levels)):
+                if len(self.levels[h]) <= self._capacity(h):
+                    continue
+                
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype='float64'))
+                
+                items = np.sort(self.levels[h])
+                odd = len(items) % 2  # an odd item out stays on this level
+                offset = int(self._rng.integers(2))
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], items[odd + offset::2]])
+                self.levels[h] = items[:odd]
+                compacted = True
+    
+    def _weighted(self) -> Tuple[np.ndarray, np.ndarray]:
+        """All retained items with their weights"""
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        return items, weights
+    
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        """Values at the given quantiles (linear interpolation when exact)"""
+        if self.count == 0:
+            return [None] * len(qs)
+        if self.exact:
+            return [float(v) for v in np.quantile(self.levels[0], qs)]
+        
+        items, weights = self._weighted()
+        order = np.argsort(items, kind='stable')
+        items, cumulative = items[order], np.cumsum(weights[order])
+        
+        result = []
+        for q in qs:
+            if q <= 0:
+                result.append(self.min)
+            elif q >= 1:
+                result.append(self.max)
+            else:
+                index = min(int(np.searchsorted(cumulative, q * self.count)), len(items) - 1)
+                result.append(float(items[index]))
+        return result
+    
+    def median(self) -> Optional[float]:
+        if self.exact and self.count:
+            return float(np.median(self.levels[0]))
+        return self.quantiles([0.5])[0]
+    
+    def count_below(self, value: float) -> int:
+        """Values strictly below `value`"""
+        items, weights = self._weighted()
+        return int(round(weights[items < value].sum()))
+    
+    def count_above(self, value: float) -> int:
+        """Values strictly above `value`"""
+        items, weights = self._weighted()
+        return int(round(weights[items > value].sum()))
+    
+    def histogram(self, bins: int = 10) -> List[Dict[str, Any]]:
+        """Equal-width bins over [min, max], like np.histogram on the raw values"""
+        if self.count == 0:
+            return []
+        items, weights = self._weighted()
+        counts, edges = np.histogram(items, bins=bins, range=(self.min, self.max), weights=weights)
+        return [
+            {'min': float(edges[i]), 'max': float(edges[i + 1]), 'count': int(round(counts[i]))}
+            for i in range(len(counts))
+        ]
+
+
+class TopKSketch:
+    """
+    Space-saving heavy hitters (Metwally et al. 2005), batched and mergeable
+    
+    At most `capacity` counters (None: unbounded, i.e. an exact frequency
+    table). Values arrive in blocks of HASH_BLOCK_ROWS whose exact counts
+    are merged in the way parallel space saving (Cafaro et al.) combines
+    summaries: a value missing from one side is credited with that side's
+    `floor`, then only the `capacity` largest counters are kept.
+    
+    Guarantees, for every tracked value: true count in [count - error, count].
+    Any value not tracked occurred at most `floor` times (floor is bounded
+    by total / capacity), so no value more frequent than that is ever lost.
+    While floor is 0 every count is exact.
+    """
+    
+    def __init__(self, capacity: Optional[int] = TOP_VALUES_CAPACITY):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype='int64')
+        self.errors = pd.Series(dtype='int64')
+        self.floor = 0
+        self.total = 0
+    
+    @classmethod
+    def from_values(cls, values: pd.Series, **kwargs) -> 'TopKSketch':
+        sketch = cls(**kwargs)
+        sketch.update(values)
+        return sketch
+    
+    def __len__(self) -> int:
+        return len(self.counts)
+    
+    @property
+    def exact(self) -> bool:
+        return self.floor == 0
+    
+    def update(self, values: pd.Series):
+        """Count the non-null values of a column"""
+        for start in range(0, len(values), HASH_BLOCK_ROWS):
+            counts = values.iloc[start:start + HASH_BLOCK_ROWS].value_counts()
+            counts = counts[counts > 0]  # categoricals list unused categories
+            if isinstance(counts.index, pd.CategoricalIndex):
+                counts.index = counts.index.astype(object)
+            self.total += int(counts.sum())
+            self._combine(counts.astype('int64'), pd.Series(0, index=counts.index, dtype='int64'), 0)
+    
+    def merge(self, other: 'TopKSketch'):
+        """Fold another sketch into this one"""
+        self.total += other.total
+        self._combine(other.counts, other.errors, other.floor)
+    
+    def resize(self, capacity: Optional[int]):
+        """Change the number of counters, dropping the least frequent"""
+        self.capacity = capacity
+        self._combine(pd.Series(dtype='int64'), pd.Series(dtype='int64'), 0)
+    
+    def _combine(self, counts: pd.Series, errors: pd.Series, floor: int):
+        index = self.counts.index.union(counts.index, sort=False)
+        merged = self.counts.reindex(index, fill_value=self.floor) + counts.reindex(index, fill_value=floor)
+        merged_errors = self.errors.reindex(index, fill_value=self.floor) + errors.reindex(index, fill_value=floor)
+        
+        # A value tracked on neither side occurred at most floor + floor times
+        self.floor += floor
+        if self.capacity is not None and len(merged) > self.capacity:
+            order = np.argsort(-merged.to_numpy(), kind='stable')
+            dropped = merged.iloc[order[self.capacity:]]
+            self.floor = max(self.floor, int(dropped.max()))
+            merged = merged.iloc[np.sort(order[:self.capacity])]
+            merged_errors = merged_errors.reindex(merged.index)
+        
+        self.counts = merged.astype('int64')
+        self.errors = merged_errors.astype('int64')
+    
+    def top(self, n: int) -> List[Dict[str, Any]]:
+        """
+        The n most frequent values, largest first (ties in first-seen order)
+        
+        Each entry has 'value', 'count' (never below the true count) and
+        'error' (the count may exceed the true count by at most this).
+        """
+        order = np.argsort(-self.counts.to_numpy(), kind='stable')[:n]
+        values = self.counts.index[order].tolist()
+        return [
+            {'value': value, 'count': int(self.counts.iloc[i]), 'error': int(self.errors.iloc[i])}
+            for value, i in zip(values, order)
+        ]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'capacity': self.capacity,
+            'floor': self.floor,
+            'total': self.total,
+            'values': [_json_value(v) for v in self.counts.index],
+            'counts': _encode_array(self.counts.to_numpy(dtype='int64')),
+            'errors': _encode_array(self.errors.to_numpy(dtype='int64'))
+        }
+    
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'TopKSketch':
+        sketch = cls(capacity=state['capacity'])
+        index = pd.Index(state['values'], dtype=object)
+        sketch.counts = pd.Series(_decode_array(state['counts'], 'int64'), index=index)
+        sketch.errors = pd.Series(_decode_array(state['errors'], 'int64'), index=index)
+        sketch.floor = state['floor']
+        sketch.total = state['total']
+        return sketch
@@ -1,26 +1,70 @@
 """
 Dataset and file upload routes
 
-POST /api/projects/{id}/upload - Upload CSV/Excel file
+POST /api/projects/{id}/upload - Upload CSV/Excel file (processed as a background job)
 GET /api/projects/{id}/dataset - Get dataset with profiling results
+POST /api/datasets/sheets - List sheets of an Excel workbook
+POST /api/datasets/uploads/{project_id} - Start resumable upload
+PUT /api/datasets/uploads/{upload_id}/chunks/{n} - Upload chunk n
+POST /api/datasets/uploads/{upload_id}/finalize - Assemble and queue processing
+GET /api/datasets/jobs/{job_id} - Poll upload job status and result
+GET /api/datasets/jobs/{job_id}/events - Subscribe to job progress (server-sent events)
+POST /api/datasets/{id}/append - Append rows with the same columns (processed as a background job)
+POST /api/datasets/{id}/duplicates - Queue a duplicate / near-duplicate row scan
+POST /api/datasets/{id}/query - Aggregate a metric by dimensions / time grain
 
 This is where raw data becomes semantic understanding.
 """
 
 import os
 import io
-from fastapi import APIRouter, Depends, HTTPException, status, Header, UploadFile, File
+import time
+from fastapi import APIRouter, Depends, HTTPException, status, Header, UploadFile, File, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import json
 import pandas as pd
 
-from app.core.database import get_db
+from analytics import excel
+from analytics.columns import TypedColumns
+from analytics.compaction import CompactionReport, compact_frame
+from app.core.database import get_db, SessionLocal
 from app.core.security import decode_token
-from app.models.models import User, Project, Dataset, DatasetProfile
-from app.engines.profiler import DataProfiler
+from app.core.dataset_store import dataset_store, content_index, DatasetWriter
+from app.core.upload_sessions import upload_sessions, ChunkTooLargeError, SessionFinalizedError, MAX_RESUMABLE_MB
+from app.core.jobs import (
+    job_queue,
+    FINISHED_STATUSES,
+    JOB_EVENT_INTERVAL_SECONDS,
+    JOB_RETRY_AFTER_SECONDS,
+    JobQueueFullError
+)
+from app.models.models import User, Project, Dataset, DatasetProfile, DataIssue
+from app.engines.profiler import DataProfiler, ChunkedProfiler, PRELIMINARY_HEAD_ROWS, PROFILE_PREVIEW_SECONDS
+from app.engines.duplicates import DuplicateRowDetector
+from app.engines.ingest import (
+    CSV_SUFFIXES,
+    DEFAULT_CHUNK_ROWS,
+    DecompressedTooLargeError,
+    MAX_DECOMPRESSION_FACTOR,
+    UploadTooLargeError,
+    hash_stream,
+    is_csv_upload,
+    open_csv_stream,
+    iter_csv_chunks
+)
 from app.engines.semantic_engine import SemanticLayerEngine
-from app.schemas.projects import ProjectResponse, DatasetResponse, DatasetProfileResponse
-from app.schemas.projects import SemanticLayerResponse, ColumnProfile
+from app.engines.query_engine import SemanticQueryEngine, QueryError
+from app.engines.backends import create_backend
+from app.engines.rollups import RollupCube, ROLLUP_MIN_ROWS
+from app.schemas.projects import ProjectResponse, DatasetResponse, DatasetProfileResponse, DatasetStatus
+from app.schemas.projects import SemanticLayerResponse, ColumnProfile, UploadSessionCreateRequest
+from app.schemas.projects import DuplicateScanRequest, SemanticQueryRequest
 
 router = APIRouter(prefix="/api/datasets", tags=["datasets"])
 
@@ -46,21 +90,23 @@ def get_current_user(authorization: str = Header(None), db: Session = Depends(ge
     return user
 
 
-def parse_upload_file(file: UploadFile, max_size_mb: int = 50) -> pd.DataFrame:
+def parse_upload_file(file: UploadFile, max_size_mb: int = 50, sheet: Optional[str] = None) -> pd.DataFrame:
     """
     Parse uploaded CSV/Excel file
     
     Constraints:
     - Max 50MB
-    - CSV or Excel format only
+    - CSV (optionally .csv.gz, .csv.zst or single-file .zip) or Excel only
     - UTF-8 encoding
     
+    For Excel, `sheet` picks the sheet by name (default: first sheet).
+    .xlsx is streamed row by row in read-only mode.
+    
     Raises HTTPException on invalid format
     """
     
-    # Check file size
-    file_size = len(file.file.read())
-    file.file.seek(0)
+    # Check file size (seek to the end instead of reading the whole upload)
+    file_size = get_upload_size(file)
     
     if file_size > max_size_mb * 1024 * 1024:
         raise HTTPException(
@@ -72,15 +118,25 @@ def parse_upload_file(file: UploadFile, max_size_mb: int = 50) -> pd.DataFrame:
     filename = file.filename.lower()
     
     try:
-        if filename.endswith('.csv'):
-            df = pd.read_csv(file.file, encoding='utf-8', on_bad_lines='warn')
-        elif filename.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(file.file)
+        if is_csv_upload(filename):
+            stream = open_csv_stream(file.file, filename, max_bytes=max_size_mb * 1024 * 1024)
+            df = pd.read_csv(stream, encoding='utf-8', on_bad_lines='warn')
+        elif filename.endswith('.xlsx'):
+            df = excel.read_sheet(file.file, sheet)
+        elif filename.endswith('.xls'):
+            df = pd.read_excel(file.file, sheet_name=sheet or 0)
         else:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Unsupported file format. Please use CSV or Excel."
+                detail="Unsupported file format. Please use CSV (.csv, .csv.gz, .csv.zst, .zip) or Excel."
             )
+    except HTTPException as e:
+        raise e
+    except DecompressedTooLargeError:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Decompressed file exceeds {max_size_mb * MAX_DECOMPRESSION_FACTOR}MB limit"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -103,69 +159,312 @@ def parse_upload_file(file: UploadFile, max_size_mb: int = 50) -> pd.DataFrame:
     return df
 
 
-@router.post("/upload/{project_id}")
-async def upload_dataset(
-    project_id: int,
-    file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+def get_upload_size(file: UploadFile) -> int:
+    """Size of the spooled upload in bytes, without reading it"""
+    file.file.seek(0, os.SEEK_END)
+    file_size = file.file.tell()
+    file.file.seek(0)
+    return file_size
+
+
+def fingerprint_upload(file: UploadFile, max_size_mb: int = 50) -> str:
     """
-    Upload CSV or Excel file to a project
+    SHA-256 of the upload, read in bounded chunks
     
-    Steps:
-    1. Validate file (format, size, encoding)
-    2. Parse into DataFrame
-    3. Store in database
-    4. Profile columns (auto-detection)
-    5. Generate semantic layer (auto-generate metrics/dimensions)
-    6. Return results to user
+    Also enforces the size limit before any parsing starts.
+    """
+    try:
+        content_hash, _ = hash_stream(file.file, max_bytes=max_size_mb * 1024 * 1024)
+    except UploadTooLargeError:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds {max_size_mb}MB limit"
+        )
+    finally:
+        file.file.seek(0)
     
-    Non-technical user just uploads file. System handles everything.
+    return content_hash
+
+
+def stream_profile_upload(
+    file: UploadFile,
+    max_size_mb: int = 50,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    writer: Optional[DatasetWriter] = None,
+    profiler: Optional[ChunkedProfiler] = None,
+    progress: Optional[Callable[[int], None]] = None,
+    head_rows: Optional[int] = None
+) -> Tuple[Dict[str, Any], int, CompactionReport]:
     """
+    Stream a CSV upload through the profiler in bounded chunks
     
-    # 1. Verify project ownership
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.user_id == current_user.id
-    ).first()
+    The size limit is enforced while bytes are read, and each parsed
+    chunk goes straight to the profiler (and to the columnar store
+    when a writer is given), so the full DataFrame never exists.
+    Chunks are dtype-compacted before profiling. Compressed CSV is
+    decompressed as it is parsed. Pass `profiler` to keep its mergeable
+    state afterwards; `progress` is called with the rows seen after
+    every chunk. With `head_rows`, the first chunk is
+    only that many rows (see iter_csv_chunks), for an early preview.
     
-    if not project:
+    Returns (profile, decompressed bytes read, compaction report).
+    Raises HTTPException on invalid input.
+    """
+    if profiler is None:
+        profiler = ChunkedProfiler()
+    compaction = CompactionReport()
+    
+    try:
+        reader = open_csv_stream(file.file, file.filename, max_bytes=max_size_mb * 1024 * 1024)
+        for chunk in iter_csv_chunks(reader, chunk_rows, head_rows):
+            if writer is not None:
+                writer.write(chunk)
+            chunk, compaction = compact_frame(chunk, compaction)
+            profiler.update(chunk)
+            if progress is not None:
+                progress(profiler.row_count)
+    except DecompressedTooLargeError:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Project not found or access denied"
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Decompressed file exceeds {max_size_mb * MAX_DECOMPRESSION_FACTOR}MB limit"
+        )
+    except UploadTooLargeError:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds {max_size_mb}MB limit"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to parse file: {str(e)}"
         )
     
-    # 2. Parse file
+    if profiler.row_count == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File is empty"
+        )
+    
+    return profiler.finalize(), reader.raw.bytes_read, compaction
+
+
+@router.post("/sheets")
+async def list_workbook_sheets(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    List the sheets of an Excel workbook so the user can pick one
+    
+    Only the workbook index is read, not the cells, so this is cheap
+    even for large multi-sheet workbooks. Pass the chosen name as
+    `?sheet=` to the upload endpoint.
+    """
+    filename = file.filename.lower()
+    
     try:
-        df = parse_upload_file(file)
+        if filename.endswith('.xlsx'):
+            sheets = excel.list_sheets(file.file)
+        elif filename.endswith('.xls'):
+            names = pd.ExcelFile(file.file).sheet_names
+            sheets = [{'index': i, 'name': name, 'visible': True} for i, name in enumerate(names)]
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Sheet listing is only available for Excel files"
+            )
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File processing error: {str(e)}"
+            detail=f"Failed to read workbook: {str(e)}"
         )
     
-    # 3. Create dataset record
-    dataset = Dataset(
-        project_id=project_id,
-        filename=file.filename,
-        file_size=len(file.file.read() or b''),
-        row_count=len(df),
-        column_count=len(df.columns),
-        status="uploaded",
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow()
-    )
+    return {"filename": file.filename, "sheets": sheets}
+
+
+def profile_date_formats(profiles: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Profiled format clusters of the date columns"""
+    return {
+        p['column_name']: p['statistics']['date_formats']
+        for p in profiles
+        if p['detected_type'] == 'date' and p['statistics'].get('date_formats')
+    }
+
+
+def materialize_rollups(
+    path: str,
+    columns: TypedColumns,
+    semantic: Optional[Dict[str, Any]] = None,
+    base: Optional[RollupCube] = None
+) -> int:
+    """
+    Build and store the rollup cube of a dataset version
     
-    db.add(dataset)
-    db.flush()  # Get dataset.id without committing yet
+    The cube covers the semantic layer's metrics and dimensions, or, when
+    `base` (the previous version's cube) is given, `columns` are appended
+    rows and their cube is merged into it. Rollups only make queries
+    faster, so a failure leaves the version without a cube (queries scan)
+    instead of failing the upload. Returns the number of rollups stored.
+    """
+    try:
+        if base is not None:
+            specs = [{'dimensions': r['dimensions'], 'time_dimension': r['time_dimension']} for r in base.rollups]
+            cube = base.merge(RollupCube.build(columns, base.metrics, specs))
+        else:
+            cube = RollupCube.build(columns, *RollupCube.plan(semantic))
+        cube.save(dataset_store.rollup_dir(path))
+    except Exception:
+        return 0
+    return len(cube.rollups)
+
+
+def process_upload(
+    db: Session,
+    dataset: Dataset,
+    file: UploadFile,
+    sheet: Optional[str] = None,
+    max_size_mb: int = 50,
+    progress: Optional[Callable[..., None]] = None
+) -> Dict[str, Any]:
+    """
+    Run an uploaded file through the full pipeline
+    
+    Shared by the single-request upload and finalized resumable sessions,
+    both of which run it as a background job (see run_upload_job) on a
+    dataset record created up front. `file` only needs a readable `.file`
+    stream and a `.filename`. `progress(stage, rows_processed=None, **fields)`
+    is called as the pipeline advances.
+    
+    Progressive profiling: if profiling is expected to run past
+    PROFILE_PREVIEW_SECONDS, a preliminary profile (flagged 'approximate')
+    is published as progress field `profile`, so the review screen can
+    open early; the exact profile replaces it once computed. CSV previews
+    come from the first PRELIMINARY_HEAD_ROWS rows, parsed ahead of the
+    first full chunk.
+    
+    Steps:
+    1. Validate file (format, size, encoding) and fingerprint its bytes
+    2. Parse into DataFrame (CSV is streamed in chunks straight into the profiler)
+       and compact dtypes (narrow integers, dictionary-encoded strings)
+       - byte-identical re-uploads reuse the stored version and results,
+         skipping parsing and profiling entirely
+    3. Store in database
+    4. Profile columns (auto-detection)
+    5. Generate semantic layer (auto-generate metrics/dimensions)
+    6. Pre-aggregate metrics by dimension and day (rollup cube) for
+       datasets of ROLLUP_MIN_ROWS or more
+    7. Return results to user
+    
+    Non-technical user just uploads file. System handles everything.
+    """
+    if progress is None:
+        progress = lambda stage, rows_processed=None, **fields: None
+    started = time.monotonic()
+    
+    # 2. The upload is already on disk, so one sequential read fingerprints it;
+    #    identical uploads then skip parsing and profiling entirely
+    progress('parsing')
+    content_hash = fingerprint_upload(file, max_size_mb)
+    cache_key = content_index.key(content_hash, sheet)
+    cached = content_index.lookup(cache_key)
+    
+    df = None
+    profile = None
+    profile_state = None
+    semantic = None
+    staged_path = None
     
-    # 4. Profile dataset
+    if cached is None:
+        # Parse file (CSV streams straight into the profiler and columnar store)
+        writer = dataset_store.open_writer()
+        
+        try:
+            if is_csv_upload(file.filename):
+                profiler = ChunkedProfiler()
+                upload_size = max(get_upload_size(file), 1)
+                previewed = False
+                
+                def on_chunk(rows: int):
+                    nonlocal previewed
+                    # Project the total time from the share of the upload read so
+                    # far; if it overruns the budget, the rows read so far (from
+                    # the head chunk on) stand in until the stream ends
+                    elapsed = time.monotonic() - started
+                    projected = elapsed * upload_size / max(file.file.tell(), 1)
+                    if not previewed and projected >= PROFILE_PREVIEW_SECONDS:
+                        progress('profiling', rows, profile=profiler.preliminary())
+                        previewed = True
+                    else:
+                        progress('profiling', rows)
+                
+                profile, _, compaction = stream_profile_upload(
+                    file, max_size_mb, writer=writer, profiler=profiler, progress=on_chunk,
+                    head_rows=PRELIMINARY_HEAD_ROWS
+                )
+                profile_state = profiler.column_states()
+                file_size = get_upload_size(file)  # bytes uploaded, compressed or not
+                row_count = profile['row_count']
+                column_count = profile['column_count']
+            else:
+                try:
+                    df = parse_upload_file(file, max_size_mb, sheet=sheet)
+                except HTTPException as e:
+                    raise e
+                except Exception as e:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"File processing error: {str(e)}"
+                    )
+                writer.write(df)
+                df, compaction = compact_frame(df)
+                file_size = get_upload_size(file)
+                row_count = len(df)
+                column_count = len(df.columns)
+            
+            staged_path = writer.close()
+        except Exception:
+            writer.abort()
+            raise
+        
+        memory = compaction.to_dict()
+    else:
+        profile = cached['profile']
+        profile_state = cached.get('profile_state')
+        semantic = cached['semantic_layer']
+        memory = cached['memory']
+        file_size = cached['file_size']
+        row_count = profile['row_count']
+        column_count = profile['column_count']
+    
+    # 3. Fill in the dataset record
+    dataset.file_size = file_size
+    dataset.row_count = row_count
+    dataset.column_count = column_count
+    dataset.status = DatasetStatus.UPLOADED.value
+    dataset.updated_at = datetime.utcnow()
+    
+    # Move the columnar copy into place so later queries never re-parse the upload
+    # (stored versions are immutable, so identical uploads share one file)
+    if cached is not None:
+        dataset.file_path = cached['file_path']
+    else:
+        dataset.file_path = dataset_store.commit(staged_path, dataset.id)
+    
+    # 4. Profile dataset (already done while streaming for CSV, which also
+    #    keeps mergeable state for appends; batch uploads build it on first append)
     try:
-        profiler = DataProfiler()
-        profile = profiler.profile_dataset(df)
+        if profile is None:
+            progress('profiling', row_count)
+            profiler = DataProfiler()
+            # Conversions stay cached under the stored version for later queries
+            profile = profiler.profile_dataset(
+                df,
+                budget=max(PROFILE_PREVIEW_SECONDS - (time.monotonic() - started), 0.0),
+                on_preliminary=lambda preliminary: progress('profiling', row_count, profile=preliminary),
+                columns=TypedColumns(df, key=dataset.file_path)
+            )
         
         # Store column profiles
         for col_profile in profile['columns']:
@@ -174,14 +473,21 @@ async def upload_dataset(
                 column_name=col_profile['column_name'],
                 detected_type=col_profile['detected_type'],
                 type_confidence=col_profile['type_confidence'],
+                date_format=(col_profile['statistics'].get('date_formats') or [None])[0],
                 statistics=col_profile['statistics'],
-                issues=col_profile['issues']
+                issues=col_profile['issues'],
+                profiling_metadata=(
+                    {'profile_state': profile_state[col_profile['column_name']]} if profile_state else None
+                )
             )
             db.add(profile_record)
         
-        dataset.status = "profiled"
+        # Dataset-level issues (duplicate records) as DataIssue records
+        record_row_issues(db, dataset.id, [issue for issue in profile['issues'] if issue['column'] is None])
+        
+        dataset.status = DatasetStatus.PROFILED.value
     except Exception as e:
-        dataset.status = "error"
+        dataset.status = DatasetStatus.ERROR.value
         dataset.error_message = f"Profiling failed: {str(e)}"
         db.commit()
         
@@ -191,34 +497,883 @@ async def upload_dataset(
         )
     
     # 5. Generate semantic layer
-    try:
-        profiles = profile['columns']
-        semantic = SemanticLayerEngine.generate_semantics(
-            df, profiles, len(df)
+    if semantic is None:
+        progress('semantic', row_count, profile=profile)
+        try:
+            profiles = profile['columns']
+            semantic = SemanticLayerEngine.generate_semantics(
+                df, profiles, row_count
+            )
+        except Exception as e:
+            semantic = {
+                'metrics': [],
+                'dimensions': [],
+                'time_dimensions': [],
+                'metadata': {'error': str(e)}
+            }
+    
+    # 6. Materialize rollups (identical uploads share the stored version and its cube)
+    if cached is None and row_count >= ROLLUP_MIN_ROWS and semantic.get('metrics'):
+        progress('rollups', row_count)
+        if df is not None:
+            columns = TypedColumns(df, key=dataset.file_path, date_formats=profile_date_formats(profile['columns']))
+        else:
+            columns = TypedColumns(
+                key=dataset.file_path,
+                date_formats=profile_date_formats(profile['columns']),
+                loader=partial(dataset_store.read_column, dataset.file_path)
+            )
+        materialize_rollups(dataset.file_path, columns, semantic=semantic)
+    
+    db.commit()
+    db.refresh(dataset)
+    
+    # Remember complete results so the next identical upload skips all work
+    if cached is None:
+        content_index.record(cache_key, {
+            'content_hash': content_hash,
+            'file_path': dataset.file_path,
+            'file_size': file_size,
+            'profile': profile,
+            'profile_state': profile_state,
+            'semantic_layer': semantic,
+            'memory': memory
+        })
+    
+    # 7. Return comprehensive response
+    return {
+        "dataset_id": dataset.id,
+        "filename": dataset.filename,
+        "row_count": dataset.row_count,
+        "column_count": dataset.column_count,
+        "status": dataset.status,
+        "profile": profile,
+        "semantic_layer": semantic,
+        "memory": memory,
+        "content_hash": content_hash,
+        "deduplicated": cached is not None
+    }
+
+
+def record_row_issues(db: Session, dataset_id: int, issues: List[Dict[str, Any]], replace: Tuple[str, ...] = ()):
+    """
+    Store dataset-level issues as DataIssue records
+    
+    Unresolved records of the `replace` issue types are removed first, so
+    re-running a scan does not pile up stale results. Key columns of a
+    subset scan go into column_name.
+    """
+    if replace:
+        db.query(DataIssue).filter(
+            DataIssue.dataset_id == dataset_id,
+            DataIssue.issue_type.in_(replace),
+            DataIssue.is_resolved == False  # noqa: E712
+        ).delete(synchronize_session=False)
+    
+    for issue in issues:
+        db.add(DataIssue(
+            dataset_id=dataset_id,
+            column_name=', '.join(issue['columns']) if issue.get('columns') else None,
+            issue_type=issue['type'],
+            severity=issue['severity'],
+            count=issue['count'],
+            percentage=issue['percentage'],
+            description=issue['message']
+        ))
+
+
+def verify_project(db: Session, project_id: int, user: User) -> Project:
+    """Project owned by the user, or 404"""
+    project = db.query(Project).filter(
+        Project.id == project_id,
+        Project.user_id == user.id
+    ).first()
+    
+    if not project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found or access denied"
         )
+    
+    return project
+
+
+def verify_dataset(db: Session, dataset_id: int, user: User) -> Dataset:
+    """Dataset in a project owned by the user, or 404"""
+    dataset = db.query(Dataset).join(Project).filter(
+        Dataset.id == dataset_id,
+        Project.user_id == user.id
+    ).first()
+    
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found or access denied"
+        )
+    
+    return dataset
+
+
+def load_profile_state(dataset: Dataset, profiles: List[DatasetProfile]) -> ChunkedProfiler:
+    """
+    Mergeable profile state of a stored dataset
+    
+    Restored from the column profiles when the upload kept it; otherwise
+    (batch uploads, older datasets) rebuilt once from the stored rows.
+    """
+    states = {p.column_name: (p.profiling_metadata or {}).get('profile_state') for p in profiles}
+    if states and all(states.values()):
+        return ChunkedProfiler.from_column_states(states, dataset.row_count)
+    
+    profiler = ChunkedProfiler()
+    table = dataset_store.read_table(dataset.file_path)
+    for batch in table.to_batches(max_chunksize=DEFAULT_CHUNK_ROWS):
+        profiler.update(batch.to_pandas())
+    return profiler
+
+
+def run_upload_job(report: Callable[..., None], dataset_id: int, upload_id: str, max_size_mb: int) -> Dict[str, Any]:
+    """
+    Background body of an upload: stored session chunks -> process_upload
+    
+    Runs on a job worker with its own database session. A failure marks
+    the dataset as errored; the upload session is removed either way.
+    """
+    db = SessionLocal()
+    dataset = None
+    try:
+        dataset = db.query(Dataset).filter(Dataset.id == dataset_id).first()
+        dataset.status = DatasetStatus.PROFILING.value
+        dataset.updated_at = datetime.utcnow()
+        db.commit()
+        
+        session = upload_sessions.get(upload_id)
+        stream = upload_sessions.open_stream(upload_id)
+        try:
+            upload = UploadFile(file=stream, filename=session['filename'])
+            return process_upload(db, dataset, upload, session['sheet'], max_size_mb, progress=report)
+        finally:
+            stream.close()
     except Exception as e:
-        semantic = {
-            'metrics': [],
-            'dimensions': [],
-            'time_dimensions': [],
-            'metadata': {'error': str(e)}
-        }
+        db.rollback()
+        # Profiling failures have already recorded their own message
+        if dataset is not None and dataset.status != DatasetStatus.ERROR.value:
+            dataset.status = DatasetStatus.ERROR.value
+            dataset.error_message = str(getattr(e, 'detail', e))
+            dataset.updated_at = datetime.utcnow()
+            db.commit()
+        raise
+    finally:
+        upload_sessions.delete(upload_id)
+        db.close()
+
+
+def release_cancelled_job(
+    dataset_id: int,
+    upload_id: str,
+    dataset_status: str,
+    error_message: Optional[str] = None
+):
+    """
+    on_cancel hook of upload and append jobs dropped at shutdown
+    
+    Their worker never runs, so nothing else would move the dataset out
+    of its queued status or remove the stored upload.
+    """
+    db = SessionLocal()
+    try:
+        dataset = db.query(Dataset).filter(Dataset.id == dataset_id).first()
+        if dataset is not None:
+            dataset.status = dataset_status
+            if error_message is not None:
+                dataset.error_message = error_message
+            dataset.updated_at = datetime.utcnow()
+            db.commit()
+    finally:
+        upload_sessions.delete(upload_id)
+        db.close()
+
+
+def raise_queue_full():
+    """503 with a Retry-After hint; nothing was queued"""
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many jobs are queued, please retry shortly",
+        headers={"Retry-After": str(JOB_RETRY_AFTER_SECONDS)}
+    )
+
+
+def queue_upload(
+    db: Session,
+    project_id: int,
+    upload_id: str,
+    filename: str,
+    user: User,
+    max_size_mb: int
+) -> Dict[str, Any]:
+    """
+    Create the dataset record and queue its processing
+    
+    Returns the dataset id straight away (status 'uploading' until a
+    worker picks the job up) together with the job id to poll.
+    Raises 503 when the job queue is full.
+    """
+    dataset = Dataset(
+        project_id=project_id,
+        filename=filename,
+        status=DatasetStatus.UPLOADING.value,
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow()
+    )
+    db.add(dataset)
+    db.commit()
+    db.refresh(dataset)
+    
+    try:
+        job = job_queue.submit(
+            run_upload_job, dataset.id, upload_id, max_size_mb,
+            on_cancel=partial(
+                release_cancelled_job, dataset.id, upload_id, DatasetStatus.ERROR.value,
+                "Processing was cancelled by a server restart, please upload the file again"
+            ),
+            user_id=user.id, dataset_id=dataset.id
+        )
+    except JobQueueFullError:
+        db.delete(dataset)
+        db.commit()
+        raise_queue_full()
+    
+    return {
+        "dataset_id": dataset.id,
+        "job_id": job['job_id'],
+        "filename": filename,
+        "status": dataset.status
+    }
+
+
+@router.post("/upload/{project_id}", status_code=status.HTTP_202_ACCEPTED)
+async def upload_dataset(
+    project_id: int,
+    file: UploadFile = File(...),
+    sheet: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload CSV or Excel file to a project (single request, up to 50MB)
+    
+    The file is stored and processed in the background: the response
+    carries the new dataset_id and a job_id to poll at /jobs/{job_id}
+    (or subscribe to at /jobs/{job_id}/events) for progress and the
+    full profile. For larger files or flaky connections use the
+    resumable /uploads endpoints below.
+    """
+    
+    # 1. Verify project ownership
+    verify_project(db, project_id, current_user)
+    
+    if get_upload_size(file) > 50 * 1024 * 1024:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="File exceeds 50MB limit"
+        )
+    if job_queue.full():
+        raise_queue_full()
+    
+    # The spooled upload is closed with the request, so the job reads a stored copy
+    session = upload_sessions.create(current_user.id, project_id, file.filename, sheet=sheet)
+    try:
+        await run_in_threadpool(upload_sessions.write_file, session['upload_id'], file.file)
+        upload_sessions.finalize(session['upload_id'])
+        return queue_upload(db, project_id, session['upload_id'], file.filename, current_user, 50)
+    except Exception:
+        upload_sessions.delete(session['upload_id'])
+        raise
+
+
+def get_upload_session(upload_id: str, user: User) -> Dict[str, Any]:
+    """Session owned by the user, or 404"""
+    try:
+        session = upload_sessions.get(upload_id)
+    except KeyError:
+        session = None
+    
+    if not session or session['user_id'] != user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload session not found or access denied"
+        )
+    
+    return session
+
+
+@router.post("/uploads/{project_id}", status_code=status.HTTP_201_CREATED)
+async def start_upload_session(
+    project_id: int,
+    req: UploadSessionCreateRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Start a resumable upload
+    
+    Client flow:
+    1. POST /uploads/{project_id}           -> upload_id
+    2. PUT  /uploads/{upload_id}/chunks/{n} -> raw bytes of chunk n (0-based)
+       (GET /uploads/{upload_id} lists received chunks to resume after a drop)
+    3. POST /uploads/{upload_id}/finalize   -> same response as /upload (dataset_id, job_id)
+    """
+    verify_project(db, project_id, current_user)
+    
+    if not req.filename.lower().endswith(CSV_SUFFIXES + ('.xlsx', '.xls')):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported file format. Please use CSV (.csv, .csv.gz, .csv.zst, .zip) or Excel."
+        )
+    
+    if req.total_size is not None and req.total_size > MAX_RESUMABLE_MB * 1024 * 1024:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds {MAX_RESUMABLE_MB}MB limit"
+        )
+    
+    session = upload_sessions.create(
+        current_user.id, project_id, req.filename, req.total_size, req.sheet
+    )
+    return {**session, 'received_chunks': {}}
+
+
+@router.get("/uploads/{upload_id}")
+async def get_upload_session_status(
+    upload_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Received chunks (index -> bytes) so a client can resume where it stopped"""
+    session = get_upload_session(upload_id, current_user)
+    received = upload_sessions.received_chunks(upload_id)
+    
+    return {
+        **session,
+        'received_chunks': received,
+        'received_bytes': sum(received.values()),
+        'finalized': upload_sessions.is_finalized(upload_id)
+    }
+
+
+@router.put("/uploads/{upload_id}/chunks/{index}")
+async def put_upload_chunk(
+    upload_id: str,
+    index: int,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Store one chunk (raw request body), streamed straight to disk
+    
+    Idempotent: re-sending a chunk index replaces it. Once the session
+    is finalized chunks are refused (409).
+    """
+    session = get_upload_session(upload_id, current_user)
+    
+    if index < 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Chunk index must be >= 0"
+        )
+    
+    try:
+        size = await upload_sessions.write_chunk(upload_id, index, request.stream())
+    except ChunkTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except SessionFinalizedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    
+    received = upload_sessions.received_chunks(upload_id)
+    received_bytes = sum(received.values())
+    
+    if received_bytes > MAX_RESUMABLE_MB * 1024 * 1024:
+        upload_sessions.delete(upload_id)
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds {MAX_RESUMABLE_MB}MB limit"
+        )
+    
+    return {
+        'upload_id': session['upload_id'],
+        'index': index,
+        'size': size,
+        'received_bytes': received_bytes
+    }
+
+
+@router.post("/uploads/{upload_id}/finalize", status_code=status.HTTP_202_ACCEPTED)
+async def finalize_upload_session(
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Assemble the chunks and queue the normal upload pipeline
+    
+    Chunks are read back in order as one stream, so CSV parsing and
+    profiling proceed chunk by chunk without building the whole file.
+    Responds like /upload. A session is finalized once: a second call
+    gets 409 and no more chunks are accepted. Missing chunks (409) or a
+    full queue (503) leave the session open, so finalize can be retried.
+    """
+    session = get_upload_session(upload_id, current_user)
+    verify_project(db, session['project_id'], current_user)
+    
+    # Claimed before the chunks are checked, so none can change after the check
+    try:
+        upload_sessions.finalize(upload_id)
+    except SessionFinalizedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    
+    try:
+        missing = upload_sessions.missing_chunks(upload_id)
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Missing chunks: {missing[:20]}"
+            )
+        
+        received_bytes = sum(upload_sessions.received_chunks(upload_id).values())
+        if session['total_size'] is not None and received_bytes != session['total_size']:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Received {received_bytes} bytes, expected {session['total_size']}"
+            )
+        
+        if job_queue.full():
+            raise_queue_full()
+        return queue_upload(
+            db, session['project_id'], upload_id, session['filename'], current_user, MAX_RESUMABLE_MB
+        )
+    except Exception:
+        # No job owns the chunks: reopen the session for more chunks or a retry
+        upload_sessions.reopen(upload_id)
+        raise
+
+
+def get_job(job_id: str, user: User) -> Dict[str, Any]:
+    """Job started by the user, or 404"""
+    try:
+        job = job_queue.get(job_id)
+    except KeyError:
+        job = None
+    
+    if not job or job['user_id'] != user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found or access denied"
+        )
+    
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Poll a background upload job
+    
+    status: queued -> running -> done | error, with the current stage
+    (parsing, profiling, semantic) and rows processed so far. Slow uploads
+    publish `profile` early: first a preliminary one (profile_status
+    'approximate'), then the exact one. Once done, `result` holds the
+    same body the upload used to return inline; on error, `error` and
+    `error_status` say what went wrong.
+    """
+    return get_job(job_id, current_user)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Server-sent events: the job state on every change, until it finishes"""
+    get_job(job_id, current_user)
+    
+    async def events():
+        version = None
+        while True:
+            try:
+                job = job_queue.get(job_id)
+            except KeyError:
+                return
+            if job['version'] != version:
+                version = job['version']
+                yield f"data: {json.dumps(job, default=str)}\n\n"
+            if job['status'] in FINISHED_STATUSES:
+                return
+            await asyncio.sleep(JOB_EVENT_INTERVAL_SECONDS)
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def append_upload(
+    db: Session,
+    dataset: Dataset,
+    file: UploadFile,
+    sheet: Optional[str] = None,
+    max_size_mb: int = 50,
+    progress: Optional[Callable[..., None]] = None
+) -> Dict[str, Any]:
+    """
+    Append the rows of an uploaded file to a profiled dataset
+    
+    Only the new rows are parsed and profiled. Their profile state is
+    merged into the stored state, so column profiles and the quality
+    score update in time proportional to the appended rows, and the
+    stored rows are never rewritten (see DatasetStore.append). A rollup
+    cube is extended the same way, from the appended rows alone.
+    `progress(stage, rows_processed=None)` is called as the append advances.
+    """
+    if progress is None:
+        progress = lambda stage, rows_processed=None, **fields: None
+    profiles = db.query(DatasetProfile).filter(
+        DatasetProfile.dataset_id == dataset.id
+    ).all()
+    
+    # Profile the new rows on their own while staging them as a segment
+    progress('parsing')
+    appended = ChunkedProfiler()
+    writer = dataset_store.open_writer()
+    
+    try:
+        if is_csv_upload(file.filename):
+            stream_profile_upload(
+                file, max_size_mb, writer=writer, profiler=appended,
+                progress=lambda rows: progress('profiling', rows)
+            )
+        else:
+            df = parse_upload_file(file, max_size_mb, sheet=sheet).rename(columns=str)
+            writer.write(df)
+            df, _ = compact_frame(df)
+            appended.update(df)
+        
+        if set(appended.column_names) != set(dataset_store.column_names(dataset.file_path)):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Appended file must have the same columns as the dataset"
+            )
+        
+        staged_path = writer.close()
+    except Exception:
+        writer.abort()
+        raise
+    
+    progress('profiling', appended.row_count)
+    profiler = load_profile_state(dataset, profiles)
+    profiler.merge(appended)
+    profile = profiler.finalize()
+    states = profiler.column_states()
     
+    base_cube = RollupCube.load(dataset_store.rollup_dir(dataset.file_path))
+    dataset.file_path = dataset_store.append(dataset.file_path, staged_path, dataset.id)
+    dataset.row_count = profile['row_count']
+    
+    # Aggregate just the new segment and merge it into the previous version's cube
+    if base_cube is not None:
+        progress('rollups', appended.row_count)
+        segment = dataset_store.segments(dataset.file_path)[-1]
+        materialize_rollups(
+            dataset.file_path,
+            TypedColumns(
+                key=segment,
+                date_formats=profile_date_formats(profile['columns']),
+                loader=partial(dataset_store.read_column, segment)
+            ),
+            base=base_cube
+        )
+    dataset.file_size = (dataset.file_size or 0) + get_upload_size(file)
+    dataset.updated_at = datetime.utcnow()
+    
+    # Update column profiles in place
+    records = {p.column_name: p for p in profiles}
+    for col_profile in profile['columns']:
+        col_name = col_profile['column_name']
+        if col_name not in records:
+            records[col_name] = DatasetProfile(dataset_id=dataset.id, column_name=col_name)
+            db.add(records[col_name])
+        
+        record = records[col_name]
+        record.detected_type = col_profile['detected_type']
+        record.type_confidence = col_profile['type_confidence']
+        record.date_format = (col_profile['statistics'].get('date_formats') or [None])[0]
+        record.statistics = col_profile['statistics']
+        record.issues = col_profile['issues']
+        record.profiling_metadata = {'profile_state': states[col_name]}
+    
+    dataset.status = DatasetStatus.PROFILED.value
     db.commit()
     db.refresh(dataset)
     
-    # 6. Return comprehensive response
     return {
         "dataset_id": dataset.id,
         "filename": dataset.filename,
         "row_count": dataset.row_count,
+        "appended_rows": appended.row_count,
         "column_count": dataset.column_count,
         "status": dataset.status,
-        "profile": profile,
-        "semantic_layer": semantic
+        "profile": profile
+    }
+
+
+def run_append_job(report: Callable[..., None], dataset_id: int, upload_id: str) -> Dict[str, Any]:
+    """
+    Background body of an append: stored session chunks -> append_upload
+    
+    The dataset was claimed (status 'profiling') when the job was queued.
+    A failure leaves the stored version as it was, so the dataset goes
+    back to 'profiled'; the upload session is removed either way.
+    """
+    db = SessionLocal()
+    dataset = None
+    try:
+        dataset = db.query(Dataset).filter(Dataset.id == dataset_id).first()
+        session = upload_sessions.get(upload_id)
+        stream = upload_sessions.open_stream(upload_id)
+        try:
+            upload = UploadFile(file=stream, filename=session['filename'])
+            return append_upload(db, dataset, upload, session['sheet'], progress=report)
+        finally:
+            stream.close()
+    except Exception:
+        db.rollback()
+        if dataset is not None:
+            dataset.status = DatasetStatus.PROFILED.value
+            dataset.updated_at = datetime.utcnow()
+            db.commit()
+        raise
+    finally:
+        upload_sessions.delete(upload_id)
+        db.close()
+
+
+@router.post("/{dataset_id}/append", status_code=status.HTTP_202_ACCEPTED)
+async def append_rows(
+    dataset_id: int,
+    file: UploadFile = File(...),
+    sheet: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Append the rows of a CSV/Excel file with the same columns
+    
+    The file is stored and appended in the background (see append_upload):
+    the response carries a job_id to poll at /jobs/{job_id}, whose result
+    is the updated profile. Only profiled datasets accept rows (409
+    otherwise), and the dataset reads 'profiling' until the append is done,
+    so appends to one dataset never build on the same version.
+    """
+    dataset = verify_dataset(db, dataset_id, current_user)
+    
+    if dataset.status != DatasetStatus.PROFILED.value:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Dataset is {dataset.status}; rows can only be appended to a profiled dataset"
+        )
+    if get_upload_size(file) > 50 * 1024 * 1024:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="File exceeds 50MB limit"
+        )
+    if job_queue.full():
+        raise_queue_full()
+    
+    # The spooled upload is closed with the request, so the job reads a stored copy
+    session = upload_sessions.create(current_user.id, dataset.project_id, file.filename, sheet=sheet)
+    try:
+        await run_in_threadpool(upload_sessions.write_file, session['upload_id'], file.file)
+        upload_sessions.finalize(session['upload_id'])
+        
+        # Claim the dataset atomically; a concurrent append may have won the race
+        claimed = db.query(Dataset).filter(
+            Dataset.id == dataset.id,
+            Dataset.status == DatasetStatus.PROFILED.value
+        ).update(
+            {'status': DatasetStatus.PROFILING.value, 'updated_at': datetime.utcnow()},
+            synchronize_session=False
+        )
+        db.commit()
+        if not claimed:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Another append to this dataset is in progress"
+            )
+        
+        try:
+            job = job_queue.submit(
+                run_append_job, dataset.id, session['upload_id'],
+                on_cancel=partial(
+                    release_cancelled_job, dataset.id, session['upload_id'], DatasetStatus.PROFILED.value
+                ),
+                user_id=current_user.id, dataset_id=dataset.id
+            )
+        except JobQueueFullError:
+            db.query(Dataset).filter(Dataset.id == dataset.id).update(
+                {'status': DatasetStatus.PROFILED.value}, synchronize_session=False
+            )
+            db.commit()
+            raise_queue_full()
+    except Exception:
+        upload_sessions.delete(session['upload_id'])
+        raise
+    
+    return {
+        "dataset_id": dataset.id,
+        "job_id": job['job_id'],
+        "filename": file.filename,
+        "status": DatasetStatus.PROFILING.value
     }
 
 
+def run_duplicate_scan(report: Callable[..., None], dataset_id: int, req: DuplicateScanRequest) -> Dict[str, Any]:
+    """
+    Background body of a duplicate scan over the stored rows
+    
+    Batches are read from the columnar store in order, so memory stays
+    bounded by the batch size plus the detector's state.
+    """
+    db = SessionLocal()
+    try:
+        dataset = db.query(Dataset).filter(Dataset.id == dataset_id).first()
+        detector = DuplicateRowDetector(req.key_columns, req.near_duplicates, threshold=req.threshold)
+        
+        table = dataset_store.read_table(dataset.file_path)
+        for batch in table.to_batches(max_chunksize=DEFAULT_CHUNK_ROWS):
+            detector.update(batch.to_pandas())
+            report('scanning', detector.rows)
+        
+        issues = detector.issues()
+        record_row_issues(db, dataset_id, issues, replace=('duplicate_rows', 'near_duplicate_rows'))
+        db.commit()
+        
+        return {
+            "dataset_id": dataset_id,
+            "rows_scanned": detector.rows,
+            "issues": [{**issue, 'column': None} for issue in issues]
+        }
+    finally:
+        db.close()
+
+
+@router.post("/{dataset_id}/duplicates", status_code=status.HTTP_202_ACCEPTED)
+async def scan_duplicates(
+    dataset_id: int,
+    req: DuplicateScanRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Queue a duplicate-row scan of a stored dataset
+    
+    Uploads already check whole rows; this re-checks on a key subset
+    (e.g. the same customer and date entered twice) and/or searches
+    text-heavy rows for near-duplicates. Results replace the dataset's
+    earlier duplicate-row issues; poll /jobs/{job_id} for them.
+    """
+    dataset = verify_dataset(db, dataset_id, current_user)
+    
+    if req.key_columns:
+        missing = set(req.key_columns) - set(dataset_store.column_names(dataset.file_path))
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown key columns: {sorted(missing)}"
+            )
+    
+    try:
+        job = job_queue.submit(
+            run_duplicate_scan, dataset.id, req,
+            user_id=current_user.id, dataset_id=dataset.id
+        )
+    except JobQueueFullError:
+        raise_queue_full()
+    
+    return {"dataset_id": dataset.id, "job_id": job['job_id'], "status": job['status']}
+
+
+@router.post("/{dataset_id}/query")
+async def query_dataset(
+    dataset_id: int,
+    req: SemanticQueryRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Aggregate a metric by dimensions and/or a time grain
+    
+    The metric is aggregated with its semantic aggregation (sum, avg,
+    count, min, max, std). Queries a rollup covers (see app.engines.rollups)
+    merge its pre-aggregated groups; others scan the stored columns on the
+    QUERY_BACKEND execution backend (see app.engines.backends), reading
+    only the columns the query references.
+    """
+    dataset = verify_dataset(db, dataset_id, current_user)
+    
+    profiles = db.query(DatasetProfile).filter(
+        DatasetProfile.dataset_id == dataset_id
+    ).all()
+    if not dataset.file_path or not profiles:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Dataset has not been profiled yet"
+        )
+    
+    # The semantic layer is rebuilt from profile statistics alone (no data read)
+    column_profiles = [
+        {'column_name': p.column_name, 'detected_type': p.detected_type, 'statistics': p.statistics or {}}
+        for p in profiles
+    ]
+    semantic = SemanticLayerEngine.generate_semantics(None, column_profiles, dataset.row_count or 0)
+    
+    try:
+        plan = SemanticQueryEngine.compile(
+            semantic,
+            column_profiles,
+            req.metric,
+            dimensions=req.dimensions,
+            time_dimension=req.time_dimension,
+            time_grain=req.time_grain,
+            filters=[f.model_dump() for f in req.filters],
+            order=req.order,
+            limit=req.limit
+        )
+    except QueryError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    cube = RollupCube.load(dataset_store.rollup_dir(dataset.file_path))
+    try:
+        backend = create_backend(dataset.file_path, dataset_store)
+    except ImportError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Query backend is not installed: {e}"
+        )
+    result = await run_in_threadpool(SemanticQueryEngine.execute, plan, None, cube, backend)
+    
+    return {"dataset_id": dataset.id, **result}
+
+
 @router.get("/{dataset_id}")
 async def get_dataset(
     dataset_id: int,
@@ -236,40 +1391,51 @@ async def get_dataset(
     """
     
     # Verify access
-    dataset = db.query(Dataset).join(Project).filter(
-        Dataset.id == dataset_id,
-        Project.user_id == current_user.id
-    ).first()
-    
-    if not dataset:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Dataset not found or access denied"
-        )
+    dataset = verify_dataset(db, dataset_id, current_user)
     
     # Get profiles
     profiles = db.query(DatasetProfile).filter(
         DatasetProfile.dataset_id == dataset_id
     ).all()
     
+    columns = [
+        {
+            'column_name': p.column_name,
+            'detected_type': p.detected_type,
+            'type_confidence': p.type_confidence,
+            'statistics': p.statistics,
+            'issues': p.issues
+        }
+        for p in profiles
+    ]
+    issues = [issue for p in profiles for issue in p.issues]
+    
+    # Dataset-level issues (duplicate records)
+    row_issues = db.query(DataIssue).filter(
+        DataIssue.dataset_id == dataset_id,
+        DataIssue.is_resolved == False  # noqa: E712
+    ).all()
+    issues += [
+        {
+            'type': issue.issue_type,
+            'severity': issue.severity,
+            'count': issue.count,
+            'percentage': float(issue.percentage) if issue.percentage is not None else None,
+            'message': issue.description,
+            'column': issue.column_name
+        }
+        for issue in row_issues
+    ]
+    
     profile_data = {
         'profile_timestamp': datetime.utcnow().isoformat(),
         'row_count': dataset.row_count,
         'column_count': dataset.column_count,
-        'columns': [
-            {
-                'column_name': p.column_name,
-                'detected_type': p.detected_type,
-                'type_confidence': p.type_confidence,
-                'statistics': p.statistics,
-                'issues': p.issues
-            }
-            for p in profiles
-        ],
-        'issues': [issue for p in profiles for issue in p.issues],
+        'columns': columns,
+        'issues': issues,
         'summary': {
-            'total_issues': sum(len(p.issues) for p in profiles),
-            'data_quality_score': 85.0  # TODO: calculate from profiles
+            'total_issues': len(issues),
+            'data_quality_score': DataProfiler._calculate_quality_score(columns, issues)
         }
     }
     
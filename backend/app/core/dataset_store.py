@@ -0,0 +1,313 @@
+"""
+Columnar Dataset Store
+
+Parsed uploads are persisted as Arrow IPC files, one file per dataset version:
+
+    {DATASET_STORE_DIR}/{dataset_id}/v{version}.arrow
+
+Appending rows never rewrites stored data: the new rows become a segment
+and the new version is a manifest listing every segment in order:
+
+    {DATASET_STORE_DIR}/{dataset_id}/v{version}.append.arrow
+    {DATASET_STORE_DIR}/{dataset_id}/v{version}.json
+
+Files are memory-mapped on read, so a query only pages in the columns
+it selects and never re-parses the original CSV/Excel.
+
+Rollup cubes of a version (see app.engines.rollups) sit next to it:
+
+    {DATASET_STORE_DIR}/{dataset_id}/v{version}.rollups/
+
+A content index maps upload fingerprints (SHA-256) to the stored file,
+profile and semantic layer, so byte-identical uploads skip all processing:
+
+    {DATASET_STORE_DIR}/_content/{key}.json
+"""
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+DATASET_STORE_DIR = os.getenv("DATASET_STORE_DIR", "uploads/datasets")
+
+
+def _normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Make a DataFrame chunk Arrow-safe
+    
+    - Column names become strings (Excel headers can be numbers)
+    - Object columns become pandas string dtype (mixed Python objects
+      such as ints and strings in one column cannot be stored in Arrow)
+    """
+    df = df.rename(columns=str)
+    object_cols = [col for col in df.columns if df[col].dtype == object]
+    if object_cols:
+        df = df.astype({col: 'string' for col in object_cols})
+    return df
+
+
+def _unify_type(types: List[pa.DataType]) -> pa.DataType:
+    """Pick one Arrow type that every chunk's type can be cast to"""
+    distinct = {t for t in types if not pa.types.is_null(t)}
+    
+    if not distinct:
+        return pa.null()
+    if len(distinct) == 1:
+        return distinct.pop()
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) or pa.types.is_boolean(t) for t in distinct):
+        return pa.float64()
+    if all(pa.types.is_timestamp(t) for t in distinct):
+        return pa.timestamp('ns')
+    return pa.string()
+
+
+class DatasetWriter:
+    """
+    Chunked writer for one dataset version
+    
+    Pandas infers dtypes per chunk, so chunks of the same column can disagree
+    (int64 in one, float64 or string in the next). Each chunk is written to its
+    own part file; close() unifies the schemas and rewrites the parts into a
+    single Arrow file one part at a time, so memory stays bounded by a chunk.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.parts_dir = f"{path}.parts"
+        self.row_count = 0
+        self._parts: List[str] = []
+        os.makedirs(self.parts_dir, exist_ok=True)
+    
+    def write(self, chunk: pd.DataFrame):
+        """Append one DataFrame chunk"""
+        table = pa.Table.from_pandas(_normalize_frame(chunk), preserve_index=False)
+        part_path = os.path.join(self.parts_dir, f"part-{len(self._parts):05d}.arrow")
+        
+        with pa.OSFile(part_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        
+        self._parts.append(part_path)
+        self.row_count += table.num_rows
+    
+    def close(self) -> str:
+        """Merge the parts into the final Arrow file and return its path"""
+        schemas = [pa.ipc.open_file(pa.memory_map(p, 'r')).schema for p in self._parts]
+        if not schemas:
+            raise ValueError("No data written")
+        
+        names = schemas[0].names
+        schema = pa.schema([
+            pa.field(name, _unify_type([s.field(name).type for s in schemas]))
+            for name in names
+        ])
+        
+        with pa.OSFile(self.path, 'wb') as sink:
+            with pa.ipc.new_file(sink, schema) as writer:
+                for part_path in self._parts:
+                    with pa.memory_map(part_path, 'r') as source:
+                        table = pa.ipc.open_file(source).read_all().select(names)
+                        writer.write_table(table.cast(schema))
+        
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        return self.path
+    
+    def abort(self):
+        """Discard everything written so far"""
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class DatasetStore:
+    """Filesystem layout for stored dataset versions"""
+    
+    def __init__(self, root: str):
+        self.root = root
+    
+    def path_for(self, dataset_id: int, version: int = 1) -> str:
+        """Location of one dataset version"""
+        return os.path.join(self.root, str(dataset_id), f"v{version}.arrow")
+    
+    def open_writer(self) -> DatasetWriter:
+        """
+        Start writing a new dataset file in the staging area
+        
+        The dataset id is usually not known until the upload has been parsed,
+        so data is staged first and moved into place with commit().
+        """
+        staging_dir = os.path.join(self.root, "_staging")
+        os.makedirs(staging_dir, exist_ok=True)
+        return DatasetWriter(os.path.join(staging_dir, f"{uuid.uuid4().hex}.arrow"))
+    
+    def commit(self, staged_path: str, dataset_id: int, version: int = 1) -> str:
+        """Move a closed staging file to its final dataset location"""
+        final_path = self.path_for(dataset_id, version)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(staged_path, final_path)
+        return final_path
+    
+    def append(self, base_path: str, staged_path: str, dataset_id: int) -> str:
+        """
+        Stack a closed staging file of new rows on top of a stored version
+        
+        Existing segments are referenced, not copied, so the cost follows
+        the appended rows. The new version takes the first version number
+        after the base whose manifest does not exist yet, claimed by creating
+        the manifest exclusively (O_EXCL): concurrent appends, or files left
+        by one that failed, never overwrite each other. Returns the path of
+        the new version's manifest.
+        """
+        segments = self.segments(base_path)
+        directory = os.path.join(self.root, str(dataset_id))
+        os.makedirs(directory, exist_ok=True)
+        
+        version = len(segments) + 1
+        while True:
+            manifest_path = os.path.join(directory, f"v{version}.json")
+            try:
+                os.close(os.open(manifest_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                version += 1
+        
+        segment_path = os.path.join(directory, f"v{version}.append.arrow")
+        os.replace(staged_path, segment_path)
+        
+        tmp_path = f"{manifest_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': version, 'segments': segments + [segment_path]}, f)
+        os.replace(tmp_path, manifest_path)
+        return manifest_path
+    
+    @staticmethod
+    def segments(path: str) -> List[str]:
+        """Arrow files of a stored version (a manifest lists several)"""
+        if not path.endswith('.json'):
+            return [path]
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)['segments']
+    
+    def write_frame(self, df: pd.DataFrame, dataset_id: int, version: int = 1) -> str:
+        """Persist an in-memory DataFrame as one dataset version"""
+        writer = self.open_writer()
+        try:
+            writer.write(df)
+            staged_path = writer.close()
+        except Exception:
+            writer.abort()
+            raise
+        return self.commit(staged_path, dataset_id, version)
+    
+    @staticmethod
+    def rollup_dir(path: str) -> str:
+        """Directory of a stored version's rollup cube"""
+        return f"{os.path.splitext(path)[0]}.rollups"
+    
+    @classmethod
+    def read_table(cls, path: str, columns: Optional[List[str]] = None) -> pa.Table:
+        """
+        Memory-map a stored dataset and return an Arrow table
+        
+        Buffers point into the mapped file, so unselected columns
+        are never read from disk. Appended segments are cast to one
+        schema (as DatasetWriter does for chunks) and concatenated.
+        """
+        tables = [pa.ipc.open_file(pa.memory_map(p, 'r')).read_all() for p in cls.segments(path)]
+        names = columns if columns is not None else tables[0].schema.names
+        tables = [table.select(names) for table in tables]
+        
+        if len(tables) == 1:
+            return tables[0]
+        
+        schema = pa.schema([
+            pa.field(name, _unify_type([t.schema.field(name).type for t in tables]))
+            for name in names
+        ])
+        return pa.concat_tables([table.cast(schema) for table in tables])
+    
+    @classmethod
+    def read_columns(cls, path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Load selected columns of a stored dataset as a DataFrame"""
+        return cls.read_table(path, columns).to_pandas()
+    
+    @classmethod
+    def read_column(cls, path: str, name: str) -> pd.Series:
+        """
+        Load one stored column as a Series
+        
+        String columns come back as categoricals (dictionary-encoded in
+        Arrow) with sorted categories, so grouping works on integer codes,
+        groups come out in value order, and each distinct value is
+        converted once, not once per row.
+        """
+        column = cls.read_table(path, [name]).column(0)
+        if not (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)):
+            return column.to_pandas().rename(name)
+        
+        series = column.dictionary_encode().to_pandas().rename(name)
+        return series.cat.reorder_categories(sorted(series.cat.categories))
+    
+    @classmethod
+    def column_names(cls, path: str) -> List[str]:
+        """Column names from the file footer, without reading any data"""
+        return pa.ipc.open_file(pa.memory_map(cls.segments(path)[0], 'r')).schema.names
+
+
+
+def _json_default(value):
+    """numpy scalars and timestamps inside profiles"""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+class ContentIndex:
+    """Content-addressed index of fully processed uploads"""
+    
+    def __init__(self, root: str):
+        self.root = os.path.join(root, "_content")
+    
+    @staticmethod
+    def key(content_hash: str, variant: Optional[str] = None) -> str:
+        """
+        Index key for an upload
+        
+        `variant` covers options that change the parsed data for the same
+        bytes (e.g. the Excel sheet), so each gets its own entry.
+        """
+        if variant is None:
+            return content_hash
+        return hashlib.sha256(f"{content_hash}\0{variant}".encode('utf-8')).hexdigest()
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+    
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Stored results for a fingerprint, or None if unseen (or data file gone)"""
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if not os.path.exists(entry.get('file_path', '')):
+            return None
+        return entry
+    
+    def record(self, key: str, entry: Dict[str, Any]):
+        """Store results for a fingerprint (atomic replace, last writer wins)"""
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self._path(key)}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, default=_json_default)
+        os.replace(tmp_path, self._path(key))
+
+
+dataset_store = DatasetStore(DATASET_STORE_DIR)
+content_index = ContentIndex(DATASET_STORE_DIR)
@@ -0,0 +1,186 @@
+"""
+Background Jobs
+
+Upload processing (parsing, profiling, semantic generation, database
+writes) is CPU-heavy and synchronous, so routes hand it to a bounded
+worker pool instead of running it on the event loop:
+
+    route   -> job_queue.submit(fn, ...)  -> job snapshot (status 'queued')
+    worker  -> fn(report, ...)            -> 'running' -> 'done' | 'error'
+    clients -> job_queue.get(job_id)      -> status, stage, rows, result
+
+At most JOB_WORKERS jobs run at once and at most JOB_QUEUE_DEPTH wait;
+beyond that submit() refuses new work. Job state lives in memory and
+finished jobs are forgotten after JOB_RETENTION_SECONDS. Jobs still
+queued at shutdown never run; their on_cancel hooks release whatever
+the route set up for them.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_DEPTH = int(os.getenv("JOB_QUEUE_DEPTH", "16"))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+
+# How often event streams check for changes; the Retry-After sent when full
+JOB_EVENT_INTERVAL_SECONDS = float(os.getenv("JOB_EVENT_INTERVAL_SECONDS", "0.5"))
+JOB_RETRY_AFTER_SECONDS = int(os.getenv("JOB_RETRY_AFTER_SECONDS", "5"))
+
+FINISHED_STATUSES = ('done', 'error')
+
+
+class JobQueueFullError(ValueError):
+    """Raised when JOB_QUEUE_DEPTH jobs are already waiting"""
+
+
+class JobQueue:
+    """Bounded thread pool with pollable per-job state"""
+    
+    def __init__(self, workers: int, max_queued: int):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._queued = 0
+    
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        return self._executor
+    
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        on_cancel: Optional[Callable[[], None]] = None,
+        **meta
+    ) -> Dict[str, Any]:
+        """
+        Queue fn(report, *args) and return the job snapshot
+        
+        `report(stage, rows_processed=None, **fields)` lets the job publish
+        progress; extra fields (e.g. a preliminary result) are set on the job.
+        `on_cancel()` is called instead of fn if the job is dropped by
+        shutdown() before it starts (e.g. to mark its dataset and remove
+        its stored upload). Extra keyword arguments (e.g. user_id,
+        dataset_id) are stored on the job.
+        Raises JobQueueFullError when the queue is at its depth limit.
+        """
+        now = datetime.utcnow().isoformat()
+        with self._lock:
+            self._prune()
+            if self._queued >= self.max_queued:
+                raise JobQueueFullError(f"{self._queued} jobs already queued")
+            
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                **meta,
+                'job_id': job_id,
+                'status': 'queued',
+                'stage': None,
+                'rows_processed': None,
+                'error': None,
+                'error_status': None,
+                'result': None,
+                'version': 0,
+                'created_at': now,
+                'updated_at': now,
+                '_finished': None,
+                '_on_cancel': on_cancel,
+                '_future': None
+            }
+            self._queued += 1
+            snapshot = self._snapshot(job_id)
+        
+        future = self._pool().submit(self._run, job_id, fn, args)
+        with self._lock:
+            self._jobs[job_id]['_future'] = future
+        return snapshot
+    
+    def _run(self, job_id: str, fn: Callable[..., Any], args: tuple):
+        with self._lock:
+            self._queued -= 1
+        self._update(job_id, status='running')
+        
+        def report(stage: str, rows_processed: Optional[int] = None, **fields):
+            self._update(job_id, stage=stage, rows_processed=rows_processed, **fields)
+        
+        try:
+            result = fn(report, *args)
+        except Exception as e:
+            # HTTPException-style errors keep their detail and status code
+            self._update(
+                job_id,
+                status='error',
+                error=str(getattr(e, 'detail', e)),
+                error_status=getattr(e, 'status_code', 500)
+            )
+        else:
+            self._update(job_id, status='done', result=result)
+    
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            job['version'] += 1
+            job['updated_at'] = datetime.utcnow().isoformat()
+            if job['status'] in FINISHED_STATUSES:
+                job['_finished'] = time.monotonic()
+    
+    def _snapshot(self, job_id: str) -> Dict[str, Any]:
+        return {k: v for k, v in self._jobs[job_id].items() if not k.startswith('_')}
+    
+    def _prune(self):
+        cutoff = time.monotonic() - JOB_RETENTION_SECONDS
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['_finished'] is not None and job['_finished'] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+    
+    def get(self, job_id: str) -> Dict[str, Any]:
+        """Current job state; raises KeyError if unknown (or expired)"""
+        with self._lock:
+            return self._snapshot(job_id)
+    
+    def full(self) -> bool:
+        with self._lock:
+            return self._queued >= self.max_queued
+    
+    def shutdown(self):
+        """
+        Stop taking work; running jobs finish, queued ones are cancelled
+        
+        Cancelled jobs end as errors (status 503) and their on_cancel hooks
+        run here, since their workers never will.
+        """
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        
+        with self._lock:
+            cancelled = [
+                job_id for job_id, job in self._jobs.items()
+                if job['_future'] is not None and job['_future'].cancelled()
+            ]
+            self._queued -= len(cancelled)
+        
+        for job_id in cancelled:
+            self._update(job_id, status='error', error="Cancelled by server shutdown", error_status=503)
+            on_cancel = self._jobs[job_id]['_on_cancel']
+            if on_cancel is not None:
+                try:
+                    on_cancel()
+                except Exception:
+                    pass  # one failing hook must not keep the others from running
+
+
+job_queue = JobQueue(JOB_WORKERS, JOB_QUEUE_DEPTH)
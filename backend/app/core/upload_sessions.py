@@ -0,0 +1,329 @@
+"""
+Resumable Upload Sessions
+
+Large files arrive as numbered chunks over several requests:
+
+    {UPLOAD_SESSION_DIR}/{upload_id}/session.json
+    {UPLOAD_SESSION_DIR}/{upload_id}/chunk-000000
+    {UPLOAD_SESSION_DIR}/{upload_id}/chunk-000001
+    ...
+
+Each chunk is written to disk as it arrives, so a dropped connection
+only costs the chunk in flight. On finalize the chunk files are read
+back in order as one seekable stream; they are never concatenated.
+
+Finalizing claims a `finalized` marker file (created exclusively, so only
+one finalize wins). From then on the session belongs to its job: chunks
+are no longer accepted and the job deletes the session when it is done.
+
+Sessions nobody writes to for UPLOAD_SESSION_TTL_SECONDS are abandoned;
+sweep() deletes them at startup and whenever a new session is created.
+Finalized sessions are left to their job, except at startup, when no
+job from before the restart can still be queued.
+"""
+import io
+import json
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, BinaryIO, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+UPLOAD_SESSION_DIR = os.getenv("UPLOAD_SESSION_DIR", "uploads/sessions")
+MAX_CHUNK_BYTES = int(os.getenv("UPLOAD_MAX_CHUNK_MB", "16")) * 1024 * 1024
+MAX_RESUMABLE_MB = int(os.getenv("UPLOAD_MAX_RESUMABLE_MB", "1024"))
+UPLOAD_SESSION_TTL_SECONDS = int(os.getenv("UPLOAD_SESSION_TTL_SECONDS", str(24 * 3600)))
+
+# Request body pieces are gathered up to this size per file write
+WRITE_BUFFER_BYTES = 1024 * 1024
+
+FINALIZED_MARKER = 'finalized'
+
+
+class ChunkTooLargeError(ValueError):
+    """Raised when a single chunk body exceeds MAX_CHUNK_BYTES"""
+
+
+class SessionFinalizedError(ValueError):
+    """Raised when a finalized session is finalized again or sent more chunks"""
+
+
+class ChunkedFile(io.RawIOBase):
+    """
+    Read-only, seekable view over ordered chunk files
+    
+    Behaves like one file, so both the streaming CSV path and
+    zip-based Excel parsing can read a finalized session directly.
+    """
+    
+    def __init__(self, paths: List[str]):
+        self._paths = paths
+        self._sizes = [os.path.getsize(p) for p in paths]
+        self._starts = []
+        offset = 0
+        for size in self._sizes:
+            self._starts.append(offset)
+            offset += size
+        self._length = offset
+        self._pos = 0
+        self._index = None
+        self._handle = None
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def tell(self) -> int:
+        return self._pos
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = self._length + offset
+        self._pos = max(0, self._pos)
+        return self._pos
+    
+    def _chunk_at(self, pos: int) -> int:
+        for index in range(len(self._starts) - 1, -1, -1):
+            if self._starts[index] <= pos:
+                return index
+        return 0
+    
+    def readinto(self, buffer) -> int:
+        if self._pos >= self._length or not self._paths:
+            return 0
+        
+        index = self._chunk_at(self._pos)
+        if index != self._index:
+            if self._handle is not None:
+                self._handle.close()
+            self._handle = open(self._paths[index], 'rb')
+            self._index = index
+        
+        # Read at most up to the end of the current chunk file
+        self._handle.seek(self._pos - self._starts[index])
+        n = min(len(buffer), self._starts[index] + self._sizes[index] - self._pos)
+        data = self._handle.read(n)
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+    
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        super().close()
+
+
+class UploadSessionStore:
+    """Create, fill and finalize resumable upload sessions on local disk"""
+    
+    def __init__(self, root: str):
+        self.root = root
+    
+    def _dir(self, upload_id: str) -> str:
+        # upload_id comes from the URL; only accept ids we could have issued
+        if not upload_id or any(c not in '0123456789abcdef' for c in upload_id):
+            raise KeyError(upload_id)
+        return os.path.join(self.root, upload_id)
+    
+    def _chunk_path(self, upload_id: str, index: int) -> str:
+        return os.path.join(self._dir(upload_id), f"chunk-{index:06d}")
+    
+    def _marker_path(self, upload_id: str) -> str:
+        return os.path.join(self._dir(upload_id), FINALIZED_MARKER)
+    
+    def _touch(self, upload_id: str):
+        """Mark the session as active (the metadata file's mtime is its last touch)"""
+        os.utime(os.path.join(self._dir(upload_id), 'session.json'))
+    
+    def create(
+        self,
+        user_id: int,
+        project_id: int,
+        filename: str,
+        total_size: Optional[int] = None,
+        sheet: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Open a new session and return its metadata"""
+        self.sweep()
+        upload_id = uuid.uuid4().hex
+        session = {
+            'upload_id': upload_id,
+            'user_id': user_id,
+            'project_id': project_id,
+            'filename': filename,
+            'total_size': total_size,
+            'sheet': sheet,
+            'chunk_size_limit': MAX_CHUNK_BYTES,
+            'created_at': datetime.utcnow().isoformat()
+        }
+        os.makedirs(self._dir(upload_id))
+        with open(os.path.join(self._dir(upload_id), 'session.json'), 'w', encoding='utf-8') as f:
+            json.dump(session, f)
+        return session
+    
+    def get(self, upload_id: str) -> Dict[str, Any]:
+        """Session metadata; raises KeyError if unknown"""
+        try:
+            with open(os.path.join(self._dir(upload_id), 'session.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except OSError:
+            raise KeyError(upload_id)
+    
+    def received_chunks(self, upload_id: str) -> Dict[int, int]:
+        """{chunk index: size in bytes} for every chunk stored so far"""
+        chunks = {}
+        for name in os.listdir(self._dir(upload_id)):
+            if name.startswith('chunk-') and not name.endswith('.part'):
+                chunks[int(name[6:])] = os.path.getsize(os.path.join(self._dir(upload_id), name))
+        return dict(sorted(chunks.items()))
+    
+    def is_finalized(self, upload_id: str) -> bool:
+        return os.path.exists(self._marker_path(upload_id))
+    
+    def finalize(self, upload_id: str):
+        """
+        Hand the session over to its job
+        
+        The marker is created exclusively, so of two concurrent finalize
+        calls only one succeeds. Raises SessionFinalizedError for the other.
+        """
+        try:
+            fd = os.open(self._marker_path(upload_id), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            raise SessionFinalizedError(f"Upload {upload_id} was already finalized")
+        os.close(fd)
+    
+    def reopen(self, upload_id: str):
+        """Undo finalize() when no job was queued, so finalize can be retried"""
+        try:
+            os.remove(self._marker_path(upload_id))
+        except FileNotFoundError:
+            pass
+    
+    def _commit_chunk(self, upload_id: str, tmp_path: str, final_path: str):
+        # Checked again at the last moment: finalize may have run while the body arrived
+        if self.is_finalized(upload_id):
+            raise SessionFinalizedError(f"Upload {upload_id} was already finalized")
+        os.replace(tmp_path, final_path)
+        self._touch(upload_id)
+    
+    @staticmethod
+    def _discard(path: str):
+        if os.path.exists(path):
+            os.remove(path)
+    
+    async def write_chunk(self, upload_id: str, index: int, body: AsyncIterator[bytes]) -> int:
+        """
+        Stream one chunk body to disk
+        
+        Written to a temp file and renamed, so a half-received chunk is never
+        mistaken for a complete one. Re-sending an index replaces it. The
+        body is read on the event loop; file writes run in the threadpool.
+        Raises SessionFinalizedError once the session is finalized.
+        Returns the chunk size in bytes.
+        """
+        if self.is_finalized(upload_id):
+            raise SessionFinalizedError(f"Upload {upload_id} was already finalized")
+        
+        final_path = self._chunk_path(upload_id, index)
+        tmp_path = f"{final_path}.{uuid.uuid4().hex}.part"
+        size = 0
+        
+        f = await run_in_threadpool(open, tmp_path, 'wb')
+        try:
+            pending = []
+            pending_bytes = 0
+            async for piece in body:
+                size += len(piece)
+                if size > MAX_CHUNK_BYTES:
+                    raise ChunkTooLargeError(f"Chunk exceeds {MAX_CHUNK_BYTES} bytes")
+                pending.append(piece)
+                pending_bytes += len(piece)
+                if pending_bytes >= WRITE_BUFFER_BYTES:
+                    await run_in_threadpool(f.write, b''.join(pending))
+                    pending, pending_bytes = [], 0
+            if pending:
+                await run_in_threadpool(f.write, b''.join(pending))
+            await run_in_threadpool(f.close)
+            await run_in_threadpool(self._commit_chunk, upload_id, tmp_path, final_path)
+        finally:
+            f.close()
+            await run_in_threadpool(self._discard, tmp_path)
+        
+        return size
+    
+    def write_file(self, upload_id: str, source: BinaryIO) -> int:
+        """
+        Store a whole file as the session's only chunk
+        
+        Lets single-request uploads outlive their request and go through
+        the same background pipeline as finalized sessions. Not subject to
+        MAX_CHUNK_BYTES; the caller enforces its own size limit.
+        """
+        path = self._chunk_path(upload_id, 0)
+        source.seek(0)
+        with open(path, 'wb') as f:
+            shutil.copyfileobj(source, f, 1024 * 1024)
+        self._touch(upload_id)
+        return os.path.getsize(path)
+    
+    def missing_chunks(self, upload_id: str) -> List[int]:
+        """Gaps in the chunk sequence 0..max received index"""
+        received = self.received_chunks(upload_id)
+        if not received:
+            return [0]
+        return [i for i in range(max(received) + 1) if i not in received]
+    
+    def open_stream(self, upload_id: str) -> io.BufferedReader:
+        """All chunks, in order, as one seekable binary stream"""
+        paths = [self._chunk_path(upload_id, i) for i in self.received_chunks(upload_id)]
+        return io.BufferedReader(ChunkedFile(paths))
+    
+    def delete(self, upload_id: str):
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+    
+    def sweep(self, ttl_seconds: int = UPLOAD_SESSION_TTL_SECONDS, include_finalized: bool = False) -> int:
+        """
+        Delete sessions idle for longer than `ttl_seconds`
+        
+        Idle time counts from the session's last chunk (or its creation).
+        Finalized sessions may still wait in the job queue and are only
+        deleted with include_finalized (at startup, before any job runs).
+        Returns the number of sessions deleted.
+        """
+        cutoff = time.time() - ttl_seconds
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return 0
+        
+        deleted = 0
+        for name in names:
+            path = os.path.join(self.root, name)
+            if not include_finalized and os.path.exists(os.path.join(path, FINALIZED_MARKER)):
+                continue
+            try:
+                touched = os.path.getmtime(os.path.join(path, 'session.json'))
+            except OSError:
+                # Half-created session without metadata: age of the directory
+                try:
+                    touched = os.path.getmtime(path)
+                except OSError:
+                    continue
+            if touched < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                deleted += 1
+        return deleted
+
+
+upload_sessions = UploadSessionStore(UPLOAD_SESSION_DIR)
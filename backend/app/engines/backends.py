@@ -0,0 +1,206 @@
+"""
+EXECUTION BACKENDS
+
+Where the raw scan of a compiled query plan runs (plans a rollup covers
+never reach a backend, see app.engines.rollups):
+
+- 'pandas' (reference): TypedColumns over the stored columns and one
+  vectorized group-by (SemanticQueryEngine.scan); loaded and parsed
+  columns stay in the shared column cache
+- 'duckdb': DuckDB, an embedded multi-threaded columnar SQL engine, scans
+  the memory-mapped Arrow file in place, with filters, date parsing,
+  truncation and aggregation pushed into one SQL query; nothing is cached
+  between queries
+
+Both answer with the same result frame (group keys + 'value', ordered by
+key, missing keys last). tests/test_backends.py checks every backend
+against a scan of the in-memory frame on a grid of plans;
+benchmark_backends.py only times them.
+
+QUERY_BACKEND picks the backend the query API uses. DuckDB is an
+optional dependency (requirements-optional.txt), imported only when its
+backend is used.
+"""
+
+import os
+from abc import ABC, abstractmethod
+from functools import partial
+from typing import Any, Dict, List, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+from analytics.columns import TypedColumns
+from app.engines.query_engine import SemanticQueryEngine
+
+QUERY_BACKEND = os.getenv("QUERY_BACKEND", "pandas")
+
+
+class ExecutionBackend(ABC):
+    """
+    Runs plan scans over one stored dataset version
+    
+    `store` reads stored versions (DatasetStore: read_column, read_table).
+    """
+    
+    name = None
+    
+    def __init__(self, path: str, store):
+        self.path = path
+        self.store = store
+    
+    @abstractmethod
+    def scan(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a plan from the raw rows, as SemanticQueryEngine.scan()"""
+
+
+class PandasBackend(ExecutionBackend):
+    """Reference backend: eager pandas over cached typed columns"""
+    
+    name = 'pandas'
+    
+    def scan(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        columns = TypedColumns(
+            key=self.path,
+            date_formats=plan['date_formats'],
+            loader=partial(self.store.read_column, self.path)
+        )
+        return SemanticQueryEngine.scan(plan, columns)
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(text: str) -> str:
+    return "'" + text.replace("'", "''") + "'"
+
+
+class DuckDBBackend(ExecutionBackend):
+    """Plans compiled to one SQL query over the Arrow file"""
+    
+    name = 'duckdb'
+    
+    # Semantic aggregation -> SQL aggregate (NULL for no values, as pandas NaN)
+    AGGREGATES = {
+        'sum': 'COALESCE(SUM({0}), 0)',
+        'avg': 'AVG({0})',
+        'count': 'COUNT({0})',
+        'min': 'MIN({0})',
+        'max': 'MAX({0})',
+        'std': 'STDDEV_SAMP({0})'
+    }
+    
+    COMPARISONS = {'eq': '=', 'ne': '!=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+    
+    def __init__(self, path: str, store):
+        super().__init__(path, store)
+        import duckdb
+        self._duckdb = duckdb
+    
+    @staticmethod
+    def _numeric(name: str, arrow_type: pa.DataType) -> str:
+        """Values as numbers, NULL where they do not convert (pd.to_numeric)"""
+        if pa.types.is_boolean(arrow_type):
+            return f"CAST({_quote(name)} AS BIGINT)"
+        if pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type):
+            return _quote(name)
+        return f"TRY_CAST({_quote(name)} AS DOUBLE)"
+    
+    @staticmethod
+    def _dates(name: str, arrow_type: pa.DataType, formats: List[str]) -> str:
+        """Values as timestamps: each profiled format in turn (as parse_dates)"""
+        if pa.types.is_timestamp(arrow_type) or pa.types.is_date(arrow_type):
+            return f"CAST({_quote(name)} AS TIMESTAMP)"
+        if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type) or pa.types.is_dictionary(arrow_type):
+            column = f"CAST({_quote(name)} AS VARCHAR)"
+            parsed = [
+                f"TRY_CAST({column} AS TIMESTAMP)" if fmt == 'ISO8601'
+                else f"TRY_STRPTIME({column}, {_literal(fmt)})"
+                for fmt in formats
+            ]
+            if not parsed:
+                return f"TRY_CAST({column} AS TIMESTAMP)"
+            return parsed[0] if len(parsed) == 1 else f"COALESCE({', '.join(parsed)})"
+        return "CAST(NULL AS TIMESTAMP)"
+    
+    def _filter(self, f: Dict[str, Any], types: Dict[str, pa.DataType], plan: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        """One compiled filter as a SQL condition and its parameters"""
+        column = f['column']
+        if f['type'] == 'numeric':
+            values = self._numeric(column, types[column])
+        elif f['type'] == 'date':
+            values = self._dates(column, types[column], plan['date_formats'].get(column) or [])
+        else:
+            values = f"CAST({_quote(column)} AS VARCHAR)"
+        
+        op, value = f['op'], f['value']
+        if op in ('in', 'not_in'):
+            params = [v.to_pydatetime() if isinstance(v, pd.Timestamp) else v for v in value]
+            if not params:
+                return ('FALSE' if op == 'in' else f"{values} IS NOT NULL"), []
+            listed = ', '.join('?' for _ in params)
+            if op == 'in':
+                return f"{values} IN ({listed})", params
+            return f"{values} NOT IN ({listed})", params
+        
+        param = value.to_pydatetime() if isinstance(value, pd.Timestamp) else value
+        return f"{values} {self.COMPARISONS[op]} ?", [param]
+    
+    def scan(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        metric = plan['metric']
+        referenced = [metric, *plan['dimensions'], *[f['column'] for f in plan['filters']]]
+        if plan['time_dimension'] is not None:
+            referenced.append(plan['time_dimension'])
+        table = self.store.read_table(self.path, list(dict.fromkeys(referenced)))
+        types = {field.name: field.type for field in table.schema}
+        
+        keys = [f"{_quote(d)} AS {_quote(d)}" for d in plan['dimensions']]
+        if plan['time_dimension'] is not None:
+            time = plan['time_dimension']
+            dates = self._dates(time, types[time], plan['date_formats'].get(time) or [])
+            keys.append(f"CAST(DATE_TRUNC({_literal(plan['time_grain'])}, {dates}) AS TIMESTAMP) AS {_quote(time)}")
+        
+        value = self.AGGREGATES[plan['aggregation']].format(self._numeric(metric, types[metric]))
+        conditions, params = [], []
+        for f in plan['filters']:
+            condition, values = self._filter(f, types, plan)
+            conditions.append(f"({condition})")
+            params.extend(values)
+        
+        sql = f"SELECT {', '.join(keys + [f'{value} AS value', 'COUNT(*) AS _matched'])} FROM data"
+        if conditions:
+            sql += f" WHERE {' AND '.join(conditions)}"
+        if keys:
+            positions = ', '.join(str(i + 1) for i in range(len(keys)))
+            sql += f" GROUP BY {positions} ORDER BY " + ', '.join(f"{i + 1} ASC NULLS LAST" for i in range(len(keys)))
+        
+        connection = self._duckdb.connect()
+        try:
+            connection.register('data', table)
+            result = connection.execute(sql, params).df()
+        finally:
+            connection.close()
+        
+        rows_matched = int(result['_matched'].sum())
+        result = result.drop(columns='_matched')
+        if plan['aggregation'] == 'sum' and pa.types.is_integer(types[metric]):
+            result['value'] = result['value'].astype('int64')
+        
+        return {'result': result, 'rows_scanned': table.num_rows, 'rows_matched': rows_matched, 'source': 'duckdb'}
+
+
+BACKENDS = {backend.name: backend for backend in (PandasBackend, DuckDBBackend)}
+
+
+def create_backend(path: str, store, name: str = None) -> ExecutionBackend:
+    """
+    Backend `name` (default QUERY_BACKEND) over one stored dataset version
+    
+    Raises ValueError for an unknown backend and ImportError when the
+    backend's engine is not installed.
+    """
+    name = name or QUERY_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown execution backend '{name}' (expected one of {', '.join(BACKENDS)})")
+    return BACKENDS[name](path, store)
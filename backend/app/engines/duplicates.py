@@ -0,0 +1,306 @@
+"""
+DUPLICATE ROW DETECTION
+
+Finds duplicate records, not duplicate values:
+- Exact: rows identical on every column (or on a chosen key subset),
+  found from vectorized 64-bit row hashes
+- Near: text-heavy rows whose word sets almost match (MinHash signatures,
+  LSH banding, checked against NEAR_DUPLICATE_THRESHOLD)
+
+Rows are fed chunk by chunk, so the same detector serves streamed uploads,
+in-memory frames and stored Arrow batches. Memory stays bounded:
+- exact hashes are kept for DISTINCT_APPROX_MIN_ROWS rows, then a
+  HyperLogLog sketch of the row hashes takes over (approximate count)
+- near-duplicates are searched in a bottom-k sample of
+  NEAR_DUPLICATE_SAMPLE_ROWS rows, ranked by the first MinHash value, so
+  rows that nearly match tend to be kept or dropped together
+
+Results are issue dicts in the same shape as column issues.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional
+
+from analytics.sketches import DISTINCT_APPROX_MIN_ROWS, HyperLogLog, duplicate_count
+
+# Row numbers reported per issue
+DUPLICATE_EXAMPLES = 10
+
+# Rows kept for the near-duplicate search
+NEAR_DUPLICATE_SAMPLE_ROWS = int(os.getenv("NEAR_DUPLICATE_SAMPLE_ROWS", "50000"))
+
+# Estimated Jaccard similarity of word sets at which rows count as near-duplicates
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+
+# MinHash signature = MINHASH_BANDS bands of MINHASH_BAND_ROWS values; rows
+# sharing any band are compared (candidates from about (1/16)^(1/4) = 0.5)
+MINHASH_BANDS = 16
+MINHASH_BAND_ROWS = 4
+
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: a cheap, well-spread permutation of 64-bit values"""
+    values = (values ^ (values >> np.uint64(30))) * _MIX_1
+    values = (values ^ (values >> np.uint64(27))) * _MIX_2
+    return values ^ (values >> np.uint64(31))
+
+
+def hash_rows(frame: pd.DataFrame) -> np.ndarray:
+    """
+    64-bit hash of every row
+    
+    Numbers are hashed as float64 (and -0.0 as 0.0), so a row parsed as
+    integers in one chunk and floats in another hashes alike; categorical
+    columns hash like their values.
+    """
+    columns = {}
+    for i, name in enumerate(frame.columns):
+        column = frame.iloc[:, i]
+        if pd.api.types.is_numeric_dtype(column) and not isinstance(column.dtype, pd.CategoricalDtype):
+            column = column.astype('float64') + 0.0
+        columns[i] = column
+    return pd.util.hash_pandas_object(pd.DataFrame(columns), index=False).to_numpy()
+
+
+def _row_text(frame: pd.DataFrame) -> Optional[pd.Series]:
+    """The text columns of each row joined by spaces (None without text columns)"""
+    text = None
+    for i in range(len(frame.columns)):
+        column = frame.iloc[:, i]
+        if pd.api.types.is_numeric_dtype(column) or pd.api.types.is_datetime64_any_dtype(column):
+            continue
+        column = column.astype(object).where(column.notna(), '').astype(str)
+        text = column if text is None else text.str.cat(column, sep=' ')
+    return text
+
+
+def minhash_signatures(text: pd.Series, permutations: int) -> Optional[Dict[str, np.ndarray]]:
+    """
+    MinHash signatures of each row's set of lowercase words (`text` must
+    have a default RangeIndex)
+    
+    Words are hashed once; each permutation is a multiply-shift hash
+    (a * h + b) >> 32 of those hashes with random odd a, and the per-row
+    minimum is taken with one reduceat per permutation, so no Python loop
+    runs over rows.
+    
+    Returns {'positions': rows that had words, 'signatures': uint32 matrix},
+    or None if no row had any word.
+    """
+    words = text.str.lower().str.findall(r'\w+').explode().dropna()
+    if len(words) == 0:
+        return None
+    
+    positions = words.index.to_numpy()
+    word_hashes = pd.util.hash_array(words.to_numpy(dtype=object))
+    
+    # explode keeps rows in order: one run of words per row
+    starts = np.flatnonzero(np.r_[True, positions[1:] != positions[:-1]])
+    multipliers = _mix(np.arange(1, permutations + 1, dtype=np.uint64)) | np.uint64(1)
+    offsets = _mix(np.arange(permutations + 1, 2 * permutations + 1, dtype=np.uint64))
+    signatures = np.empty((len(starts), permutations), dtype=np.uint32)
+    for p in range(permutations):
+        permuted = (word_hashes * multipliers[p] + offsets[p]) >> np.uint64(32)
+        signatures[:, p] = np.minimum.reduceat(permuted, starts)
+    
+    return {'positions': positions[starts], 'signatures': signatures}
+
+
+class DuplicateRowDetector:
+    """
+    Chunk-by-chunk duplicate and near-duplicate row detection
+    
+    key_columns: compare only these columns (default: every column)
+    near_duplicates: also search text-heavy rows for near-duplicates
+    """
+    
+    def __init__(
+        self,
+        key_columns: Optional[List[str]] = None,
+        near_duplicates: bool = False,
+        threshold: float = NEAR_DUPLICATE_THRESHOLD,
+        sample_rows: int = NEAR_DUPLICATE_SAMPLE_ROWS
+    ):
+        self.key_columns = list(key_columns) if key_columns else None
+        self.near_duplicates = near_duplicates
+        self.threshold = threshold
+        self.sample_rows = sample_rows
+        self.rows = 0
+        
+        # Exact duplicates
+        self.duplicate_rows = 0
+        self.examples: List[int] = []
+        self._hashes: Optional[np.ndarray] = np.empty(0, dtype=np.uint64)
+        self._sketch: Optional[HyperLogLog] = None
+        
+        # Near-duplicate sample: row numbers, row hashes and signatures
+        self.text_rows = 0
+        self._near_rows = np.empty(0, dtype=np.int64)
+        self._near_hashes = np.empty(0, dtype=np.uint64)
+        self._near_signatures = np.empty((0, MINHASH_BANDS * MINHASH_BAND_ROWS), dtype=np.uint32)
+    
+    def update(self, chunk: pd.DataFrame):
+        """Fold the next rows (in file order) into the running state"""
+        frame = chunk if self.key_columns is None else chunk[self.key_columns]
+        hashes = hash_rows(frame)
+        
+        if self._sketch is None:
+            self._update_exact(hashes)
+            if self.rows + len(hashes) > DISTINCT_APPROX_MIN_ROWS:
+                self._sketch = HyperLogLog()
+                self._sketch.add_hashes(self._hashes)
+                self._hashes = None
+        else:
+            self._sketch.add_hashes(hashes)
+        
+        if self.near_duplicates:
+            self._update_near(frame, hashes)
+        
+        self.rows += len(hashes)
+    
+    def _update_exact(self, hashes: np.ndarray):
+        # A row is a duplicate if its hash appeared earlier in the chunk or before it
+        repeated = pd.Series(hashes).duplicated().to_numpy()
+        if len(self._hashes) > 0:
+            found = np.searchsorted(self._hashes, hashes)
+            found = np.minimum(found, len(self._hashes) - 1)
+            repeated |= self._hashes[found] == hashes
+        
+        self.duplicate_rows += int(repeated.sum())
+        if len(self.examples) < DUPLICATE_EXAMPLES:
+            rows = np.flatnonzero(repeated)[:DUPLICATE_EXAMPLES - len(self.examples)] + self.rows
+            self.examples += rows.tolist()
+        
+        self._hashes = np.union1d(self._hashes, hashes)
+    
+    def _update_near(self, frame: pd.DataFrame, hashes: np.ndarray):
+        text = _row_text(frame)
+        if text is None:
+            return
+        minhash = minhash_signatures(text.reset_index(drop=True), MINHASH_BANDS * MINHASH_BAND_ROWS)
+        if minhash is None:
+            return
+        
+        positions = minhash['positions']
+        self.text_rows += len(positions)
+        rows = np.concatenate([self._near_rows, positions + self.rows])
+        row_hashes = np.concatenate([self._near_hashes, hashes[positions]])
+        signatures = np.concatenate([self._near_signatures, minhash['signatures']])
+        
+        # Bottom-k on the first MinHash value: a uniform sample in which
+        # rows with similarity J share their fate with probability J
+        if len(rows) > self.sample_rows:
+            keep = np.sort(np.argpartition(signatures[:, 0], self.sample_rows - 1)[:self.sample_rows])
+            rows, row_hashes, signatures = rows[keep], row_hashes[keep], signatures[keep]
+        
+        self._near_rows, self._near_hashes, self._near_signatures = rows, row_hashes, signatures
+    
+    @property
+    def approximate(self) -> bool:
+        return self._sketch is not None
+    
+    def _scope(self) -> str:
+        if self.key_columns is None:
+            return 'rows'
+        return f"rows on {', '.join(map(str, self.key_columns))}"
+    
+    def duplicate_issue(self) -> Optional[Dict[str, Any]]:
+        """Rows repeating an earlier row (every copy after the first), or None"""
+        if self._sketch is None:
+            count = self.duplicate_rows
+        else:
+            count = duplicate_count(self.rows, self._sketch.count(), approximate=True)
+        if count == 0:
+            return None
+        
+        pct = (count / self.rows) * 100
+        issue = {
+            'type': 'duplicate_rows',
+            'severity': 'warn' if pct < 10 else 'error',
+            'count': int(count),
+            'percentage': round(pct, 2),
+            'message': f'{pct:.1f}% of {self._scope()} are duplicates of an earlier row',
+            'columns': self.key_columns,
+            'examples': self.examples
+        }
+        if self._sketch is not None:
+            issue['approximate'] = True
+        return issue
+    
+    def near_duplicate_issue(self) -> Optional[Dict[str, Any]]:
+        """
+        Rows with a near-duplicate (similar but not identical), or None
+        
+        Each LSH band groups rows with equal band values; every row in a
+        group is checked against the group's first row, and both count
+        when their signatures agree on at least `threshold` of the values.
+        Counts found in a sample are scaled to all text rows.
+        """
+        if not self.near_duplicates or len(self._near_rows) == 0:
+            return None
+        
+        # Exact copies are reported by duplicate_issue; keep one of each
+        _, first = np.unique(self._near_hashes, return_index=True)
+        first = np.sort(first)
+        rows, signatures = self._near_rows[first], self._near_signatures[first]
+        
+        similar = np.zeros(len(rows), dtype=bool)
+        for band in range(MINHASH_BANDS):
+            values = signatures[:, band * MINHASH_BAND_ROWS:(band + 1) * MINHASH_BAND_ROWS]
+            keys = pd.util.hash_pandas_object(pd.DataFrame(values), index=False).to_numpy()
+            order = np.argsort(keys, kind='stable')
+            sorted_keys = keys[order]
+            
+            group_start = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+            leader = order[np.maximum.accumulate(np.where(group_start, np.arange(len(order)), 0))]
+            members = order[~group_start]
+            leaders = leader[~group_start]
+            if len(members) == 0:
+                continue
+            
+            agreement = (signatures[members] == signatures[leaders]).mean(axis=1)
+            matched = agreement >= self.threshold
+            similar[members[matched]] = True
+            similar[leaders[matched]] = True
+        
+        found = int(similar.sum())
+        if found == 0:
+            return None
+        
+        sampled = self.text_rows > len(self._near_rows)
+        count = int(round(found * self.text_rows / len(self._near_rows))) if sampled else found
+        pct = (count / self.rows) * 100
+        issue = {
+            'type': 'near_duplicate_rows',
+            'severity': 'info' if pct < 10 else 'warn',
+            'count': count,
+            'percentage': round(pct, 2),
+            'message': f'{pct:.1f}% of {self._scope()} nearly match another row',
+            'columns': self.key_columns,
+            'examples': np.sort(rows[similar])[:DUPLICATE_EXAMPLES].tolist(),
+            'threshold': self.threshold,
+            'sample_size': len(self._near_rows)
+        }
+        if sampled:
+            issue['approximate'] = True
+        return issue
+    
+    def issues(self) -> List[Dict[str, Any]]:
+        """Dataset-level issues found so far"""
+        return [
+            issue for issue in (self.duplicate_issue(), self.near_duplicate_issue())
+            if issue is not None
+        ]
+    
+    @classmethod
+    def detect(cls, df: pd.DataFrame, chunk_rows: int = 262_144, **kwargs) -> List[Dict[str, Any]]:
+        """Issues of an in-memory frame, hashed in bounded blocks"""
+        detector = cls(**kwargs)
+        for start in range(0, len(df), chunk_rows):
+            detector.update(df.iloc[start:start + chunk_rows])
+        return detector.issues()
@@ -0,0 +1,222 @@
+"""
+STREAMING INGESTION ENGINE
+
+Reads uploads in bounded chunks instead of loading the whole file:
+- Counts bytes as they arrive and enforces the size limit mid-stream
+- Decompresses .csv.gz / .csv.zst / .zip on the fly, with a second
+  limit on decompressed bytes (zip-bomb guard)
+- Parses CSV into fixed-size row chunks
+- Hands each chunk straight to the profiler
+
+Peak memory follows the chunk size, not the file size.
+"""
+
+import gzip
+import hashlib
+import io
+import os
+import zipfile
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+import pandas as pd
+import zstandard
+
+DEFAULT_READ_BYTES = 1024 * 1024  # 1MB per read from the upload stream
+DEFAULT_CHUNK_ROWS = 50_000  # Rows per parsed DataFrame chunk
+
+# Decompressed CSV may be at most this many times the upload size limit
+MAX_DECOMPRESSION_FACTOR = int(os.getenv("UPLOAD_MAX_DECOMPRESSION_FACTOR", "10"))
+
+COMPRESSED_CSV_SUFFIXES = {
+    '.csv.gz': 'gzip',
+    '.csv.zst': 'zstd',
+    '.zip': 'zip'
+}
+CSV_SUFFIXES = ('.csv',) + tuple(COMPRESSED_CSV_SUFFIXES)
+
+
+class UploadTooLargeError(ValueError):
+    """Raised as soon as an upload crosses its byte limit"""
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        super().__init__(f"Upload exceeds {max_bytes} bytes")
+
+
+class DecompressedTooLargeError(UploadTooLargeError):
+    """Raised when a compressed upload inflates past its decompressed limit"""
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        ValueError.__init__(self, f"Decompressed upload exceeds {max_bytes} bytes")
+
+
+class LimitedStream(io.RawIOBase):
+    """
+    Read-only stream wrapper that counts bytes and enforces a limit
+    
+    Wraps any file-like object (UploadFile.file, open file, socket body).
+    The limit is checked on every read, so an oversized upload is rejected
+    after at most one extra read instead of after buffering everything.
+    """
+    
+    def __init__(self, raw: BinaryIO, max_bytes: Optional[int] = None, error=UploadTooLargeError):
+        self._raw = raw
+        self.max_bytes = max_bytes
+        self.error = error
+        self.bytes_read = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        data = self._raw.read(len(buffer))
+        n = len(data)
+        self.bytes_read += n
+        
+        if self.max_bytes is not None and self.bytes_read > self.max_bytes:
+            raise self.error(self.max_bytes)
+        
+        buffer[:n] = data
+        return n
+
+
+def open_limited(
+    raw: BinaryIO,
+    max_bytes: Optional[int] = None,
+    read_bytes: int = DEFAULT_READ_BYTES
+) -> io.BufferedReader:
+    """
+    Wrap a raw upload stream for bounded, limit-checked reading
+    
+    The returned reader exposes the underlying LimitedStream as `.raw`,
+    so callers can read `reader.raw.bytes_read` once parsing finishes.
+    """
+    return io.BufferedReader(LimitedStream(raw, max_bytes), buffer_size=read_bytes)
+
+
+def is_csv_upload(filename: str) -> bool:
+    """Plain or compressed CSV, judged by extension"""
+    return filename.lower().endswith(CSV_SUFFIXES)
+
+
+def compression_for(filename: str) -> Optional[str]:
+    """'gzip', 'zstd', 'zip' or None for an uncompressed upload"""
+    name = filename.lower()
+    for suffix, compression in COMPRESSED_CSV_SUFFIXES.items():
+        if name.endswith(suffix):
+            return compression
+    return None
+
+
+def _open_zip_member(raw: BinaryIO) -> BinaryIO:
+    """The single CSV inside a zip archive, as a decompressing stream"""
+    archive = zipfile.ZipFile(raw)
+    members = [info for info in archive.infolist() if not info.is_dir()]
+    
+    if len(members) != 1:
+        raise ValueError(f"Zip upload must contain exactly one file, found {len(members)}")
+    if not members[0].filename.lower().endswith('.csv'):
+        raise ValueError("Zip upload must contain a CSV file")
+    
+    return archive.open(members[0])
+
+
+def open_csv_stream(
+    raw: BinaryIO,
+    filename: str,
+    max_bytes: Optional[int] = None,
+    max_decompressed_bytes: Optional[int] = None,
+    read_bytes: int = DEFAULT_READ_BYTES
+) -> io.BufferedReader:
+    """
+    Bounded reader over the CSV bytes of a plain or compressed upload
+    
+    Compressed uploads are decompressed incrementally as the parser reads,
+    so neither the compressed nor the decompressed file is held in memory.
+    `max_bytes` limits the bytes read from `raw`; `max_decompressed_bytes`
+    limits the CSV bytes produced (defaults to MAX_DECOMPRESSION_FACTOR
+    times `max_bytes`).
+    
+    `reader.raw.bytes_read` counts decompressed bytes.
+    """
+    compression = compression_for(filename)
+    if compression is None:
+        return open_limited(raw, max_bytes, read_bytes)
+    
+    if max_decompressed_bytes is None and max_bytes is not None:
+        max_decompressed_bytes = max_bytes * MAX_DECOMPRESSION_FACTOR
+    
+    if compression == 'zip':
+        # The zip directory sits at the end, so the archive must be seekable;
+        # check its size up front instead of counting reads
+        raw.seek(0, io.SEEK_END)
+        if max_bytes is not None and raw.tell() > max_bytes:
+            raise UploadTooLargeError(max_bytes)
+        raw.seek(0)
+        inner = _open_zip_member(raw)
+    else:
+        compressed = open_limited(raw, max_bytes, read_bytes)
+        if compression == 'gzip':
+            inner = gzip.GzipFile(fileobj=compressed, mode='rb')
+        else:
+            inner = zstandard.ZstdDecompressor().stream_reader(compressed, read_across_frames=True)
+    
+    stream = LimitedStream(inner, max_decompressed_bytes, error=DecompressedTooLargeError)
+    return io.BufferedReader(stream, buffer_size=read_bytes)
+
+
+def hash_stream(
+    raw: BinaryIO,
+    max_bytes: Optional[int] = None,
+    read_bytes: int = DEFAULT_READ_BYTES
+) -> Tuple[str, int]:
+    """
+    SHA-256 fingerprint of a stream, read in bounded chunks
+    
+    Enforces the same byte limit as parsing, so an oversized upload
+    is rejected before any parsing work starts.
+    
+    Returns (hex digest, bytes read).
+    """
+    stream = LimitedStream(raw, max_bytes)
+    digest = hashlib.sha256()
+    buffer = bytearray(read_bytes)
+    
+    while True:
+        n = stream.readinto(buffer)
+        if n == 0:
+            break
+        digest.update(memoryview(buffer)[:n])
+    
+    return digest.hexdigest(), stream.bytes_read
+
+
+def iter_csv_chunks(
+    stream: BinaryIO,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    head_rows: Optional[int] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Parse a CSV byte stream into DataFrames of at most `chunk_rows` rows
+    
+    Uses the same parser options as the in-memory upload path
+    (UTF-8, warn on bad lines) so both modes see the same values.
+    With `head_rows`, the first chunk holds only that many rows, so
+    callers see a sample of the file long before a full chunk is parsed.
+    """
+    reader = pd.read_csv(
+        stream,
+        encoding='utf-8',
+        on_bad_lines='warn',
+        chunksize=chunk_rows
+    )
+    
+    with reader:
+        if head_rows:
+            try:
+                yield reader.get_chunk(head_rows)
+            except StopIteration:
+                return
+        for chunk in reader:
+            yield chunk
@@ -3,71 +3,287 @@ DATA PROFILING ENGINE
 
 Analyzes each column:
 - Detects type (numeric, categorical, date, text)
-- Calculates statistics (nulls, unique count, min/max/mean/median/std)
-- Detects issues (duplicates, outliers, mixed types)
+- Calculates statistics (nulls, unique count, min/max/mean/median/std, histogram)
+- Detects issues (duplicates, outliers, mixed types) and duplicate rows
 - Provides confidence scores
 
 This runs automatically after file upload.
 User reviews the results before proceeding.
 """
 
+import os
+import threading
+from functools import partial
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any, Optional, Tuple
+import pyarrow as pa
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, shared_memory
+from typing import Callable, Dict, List, Any, Optional, Tuple, Iterable
 from datetime import datetime
 import warnings
 
+from analytics.columns import TypedColumns, coerce_column
+from analytics.dates import DATE_FORMATS, infer_date_formats, parse_dates
+from analytics.sampling import estimate_distinct, sample_ratio, stratified_positions
+from analytics.sketches import (
+    DISTINCT_APPROX_MIN_ROWS, HyperLogLog, QuantileSketch, TopKSketch, distinct_count, duplicate_count
+)
+from app.engines.duplicates import DuplicateRowDetector
+
 warnings.filterwarnings('ignore')
 
+# Worker processes for profile_dataset (0 = one per CPU), shared by all uploads
+PROFILE_WORKERS = int(os.getenv("PROFILE_WORKERS", "0")) or os.cpu_count() or 1
+
+# Narrower frames are profiled in-process; pool start-up would dominate
+PARALLEL_MIN_COLUMNS = 32
+
+# Rough single-core profiling cost, used to size preliminary samples to a budget
+PROFILE_SECONDS_PER_CELL = float(os.getenv("PROFILE_SECONDS_PER_CELL", "1e-6"))
+
+# Seconds an upload may profile before a preliminary profile is published
+PROFILE_PREVIEW_SECONDS = float(os.getenv("PROFILE_PREVIEW_SECONDS", "1.0"))
+
+# Row sample bounds for preliminary profiles
+PRELIMINARY_MIN_ROWS = 1_000
+PRELIMINARY_MAX_ROWS = 100_000
+
+# Streamed uploads parse this many rows ahead of their first full chunk,
+# so a preliminary profile can be published from them right away
+PRELIMINARY_HEAD_ROWS = 5_000
+
+
+def _top_values(sketch: TopKSketch, n: int = 5) -> List[Dict[str, Any]]:
+    """
+    stats['top_values'] entries from a top-value sketch
+    
+    Counts are exact while the sketch is; otherwise each entry carries
+    'count_error', the most its count can exceed the true count.
+    """
+    top_values = []
+    for entry in sketch.top(n):
+        top_value = {'value': str(entry['value']), 'count': entry['count']}
+        if not sketch.exact:
+            top_value['count_error'] = entry['error']
+        top_values.append(top_value)
+    return top_values
+
+
+def _arrow_shareable(series: pd.Series) -> bool:
+    """Columns that survive an Arrow round trip with identical values and dtype"""
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return pd.api.types.infer_dtype(dtype.categories, skipna=True) == 'string'
+    if dtype == object:
+        return pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty')
+    if isinstance(dtype, np.dtype):
+        return dtype.kind in 'biuf' or dtype == np.dtype('datetime64[ns]')
+    return False
+
+
+def _write_shared_table(table: pa.Table) -> Tuple[shared_memory.SharedMemory, int]:
+    """Serialize a table once into a new shared memory block (Arrow IPC stream)"""
+    def write(sink):
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    
+    counter = pa.MockOutputStream()
+    write(counter)
+    size = counter.size()
+    
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    buffer = pa.py_buffer(shm.buf)
+    write(pa.FixedSizeBufferWriter(buffer))
+    del buffer  # release the export so the block can be closed later
+    return shm, size
+
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def _process_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Long-lived pool of `workers` profiling processes
+    
+    Created once and shared by every caller, so concurrent upload jobs
+    queue their columns on the same processes instead of each starting
+    a pool: the process count stays at `workers` however many jobs run.
+    Workers are spawned, not forked; a fork taken while another job
+    thread holds a lock (logging, the column cache) can deadlock the child.
+    """
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'))
+            _pools[workers] = pool
+        return pool
+
+
+def _discard_pool(workers: int, pool: ProcessPoolExecutor):
+    """Forget a broken pool (a worker died) so the next call starts a fresh one"""
+    with _pools_lock:
+        if _pools.get(workers) is pool:
+            del _pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _profile_shared_columns(
+    shm_name: str,
+    size: int,
+    positions: List[int],
+    sample: bool
+) -> List[Dict[str, Any]]:
+    """
+    Worker: profile some columns of the Arrow table in shared memory
+    
+    The IPC stream is read in place (no copy of the shared block);
+    only the selected columns are turned into pandas Series.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        view = shm.buf[:size]
+        table = pa.ipc.open_stream(pa.py_buffer(view)).read_all()
+        frame = table.select(positions).to_pandas()
+        profiles = [DataProfiler.profile_column(frame.iloc[:, i], sample) for i in range(len(positions))]
+        del frame, table
+        view.release()
+    finally:
+        shm.close()
+    return profiles
+
 
 class DataProfiler:
     """Auto-profile uploaded datasets"""
     
+    # Type detection thresholds (share of non-null values)
+    NUMERIC_THRESHOLD = 0.95
+    DATE_THRESHOLD = 0.90
+    CATEGORICAL_UNIQUE_RATIO = 0.05
+    
+    # Columns with more non-null values than this are typed from a sample
+    TYPE_SAMPLE_MIN_ROWS = 10_000
+    
     @staticmethod
-    def detect_column_type(series: pd.Series, name: str) -> Tuple[str, float]:
+    def _numeric_matches(values: pd.Series) -> pd.Series:
+        try:
+            return coerce_column(values, pd.to_numeric).notna()
+        except:
+            return pd.Series(False, index=values.index)
+    
+    @staticmethod
+    def _date_matches(values: pd.Series, formats: Optional[List[str]] = None) -> pd.Series:
+        try:
+            return coerce_column(values, partial(parse_dates, formats=formats)).notna()
+        except:
+            return pd.Series(False, index=values.index)
+    
+    @classmethod
+    def _test_ratio(cls, non_null: pd.Series, matches, threshold: float, sample: bool) -> Dict[str, Any]:
+        """Share of values passing `matches`, from a sample when that is decisive"""
+        if sample and len(non_null) > cls.TYPE_SAMPLE_MIN_ROWS:
+            result = sample_ratio(non_null, matches, threshold, np.random.default_rng(0))
+            if result['above'] is not None:
+                return {**result, 'method': 'sample'}
+        
+        # Small column or ambiguous sample: convert every value
+        ratio = matches(non_null).sum() / len(non_null)
+        return {
+            'above': ratio > threshold,
+            'ratio': float(ratio),
+            'margin': 0.0,
+            'sample_size': len(non_null),
+            'method': 'full'
+        }
+    
+    @classmethod
+    def classify_column(
+        cls,
+        series: pd.Series,
+        sample: bool = True,
+        unique_count: Optional[int] = None
+    ) -> Dict[str, Any]:
         """
-        Detect column type with confidence score
+        Detect column type with an estimated confidence
         
-        Returns:
-        - 'numeric', 'categorical', 'date', or 'text'
-        - confidence score 0-1
+        Large columns are tested on a stratified sample that grows until a
+        99% confidence bound clears the type threshold; only ambiguous
+        columns (ratio close to the threshold) fall back to a full scan.
+        
+        Confidence is the estimated share of non-null values that fit the type:
+        - numeric / date: share convertible to numbers / dates
+        - categorical / text: share convertible to neither
+        
+        Dates are tested with format clusters inferred once from a sample
+        (see analytics.dates), never with per-value format guessing.
+        
+        Returns {'type', 'confidence', 'margin', 'method', 'sample_size',
+        'date_formats'}; margin is the half-width of the confidence interval
+        (0 when exact), date_formats the clusters of a date column.
         """
-        # Try to infer type, skipping nulls
         non_null = series.dropna()
         
         if len(non_null) == 0:
-            return 'unknown', 0.0
+            return {
+                'type': 'unknown', 'confidence': 0.0, 'margin': 0.0, 'method': 'full', 'sample_size': 0,
+                'date_formats': []
+            }
         
-        # Check if numeric
-        try:
-            pd.to_numeric(series, errors='coerce')
-            numeric_count = pd.to_numeric(series, errors='coerce').notna().sum()
-            numeric_ratio = numeric_count / len(non_null)
-            
-            if numeric_ratio > 0.95:  # 95%+ can be converted to numeric
-                return 'numeric', 0.95
-        except:
-            pass
+        # Already numbers: every value converts, nothing to estimate
+        if pd.api.types.is_numeric_dtype(series):
+            return {
+                'type': 'numeric', 'confidence': 1.0, 'margin': 0.0, 'method': 'dtype', 'sample_size': len(non_null),
+                'date_formats': []
+            }
         
-        # Check if date
-        try:
-            pd.to_datetime(series, errors='coerce')
-            date_count = pd.to_datetime(series, errors='coerce').notna().sum()
-            date_ratio = date_count / len(non_null)
-            
-            if date_ratio > 0.90:  # 90%+ can be converted to date
-                return 'date', 0.90
-        except:
-            pass
+        tests = []
+        date_formats = []
         
-        # Check if categorical (low cardinality)
-        unique_ratio = series.nunique() / len(non_null)
+        # Check if numeric (95%+ can be converted to numeric)
+        numeric = cls._test_ratio(non_null, cls._numeric_matches, cls.NUMERIC_THRESHOLD, sample)
+        tests.append(numeric)
         
-        if unique_ratio < 0.05:  # <5% unique = likely categorical
-            return 'categorical', 0.9
+        if numeric['above']:
+            col_type, confidence, margin = 'numeric', numeric['ratio'], numeric['margin']
+        else:
+            # Check if date (90%+ can be converted to date)
+            date_formats = infer_date_formats(non_null)
+            matches = partial(cls._date_matches, formats=date_formats)
+            date = cls._test_ratio(non_null, matches, cls.DATE_THRESHOLD, sample)
+            tests.append(date)
+            
+            if date['above']:
+                col_type, confidence, margin = 'date', date['ratio'], date['margin']
+            else:
+                # Check if categorical (<5% unique = likely categorical), else text
+                if unique_count is None:
+                    unique_count, _ = distinct_count(series)
+                col_type = 'categorical' if unique_count / len(non_null) < cls.CATEGORICAL_UNIQUE_RATIO else 'text'
+                confidence = 1 - max(numeric['ratio'], date['ratio'])
+                margin = max(numeric['margin'], date['margin'])
         
-        # Default to text
-        return 'text', 0.6
+        return {
+            'type': col_type,
+            'confidence': float(confidence),
+            'margin': float(margin),
+            'method': 'full' if any(t['method'] == 'full' for t in tests) else 'sample',
+            'sample_size': int(max(t['sample_size'] for t in tests)),
+            'date_formats': date_formats if col_type == 'date' else []
+        }
+    
+    @classmethod
+    def detect_column_type(cls, series: pd.Series, name: str, sample: bool = True) -> Tuple[str, float]:
+        """
+        Detect column type with confidence score
+        
+        Returns:
+        - 'numeric', 'categorical', 'date', or 'text'
+        - confidence score 0-1 (see classify_column)
+        """
+        result = cls.classify_column(series, sample)
+        return result['type'], result['confidence']
     
     @staticmethod
     def detect_issues(series: pd.Series, col_type: str) -> List[Dict[str, Any]]:
@@ -87,11 +303,12 @@ class DataProfiler:
                 'message': f'{null_pct:.1f}% of values are missing'
             })
         
-        # 2. Duplicates
+        # 2. Duplicates (repeats are what make a column categorical, so only
+        #    other types are flagged; duplicate records are found row-wise)
         dup_count = series.duplicated().sum()
         dup_pct = (dup_count / len(series)) * 100
         
-        if dup_count > 0:
+        if dup_count > 0 and col_type != 'categorical':
             issues.append({
                 'type': 'duplicates',
                 'severity': 'warn' if dup_pct < 10 else 'error',
@@ -102,11 +319,11 @@ class DataProfiler:
         
         # 3. For numeric columns: outliers
         if col_type == 'numeric':
-            non_null = pd.to_numeric(series, errors='coerce').dropna()
+            numeric = pd.to_numeric(series, errors='coerce')
+            non_null = numeric.dropna()
             
             if len(non_null) > 0:
-                Q1 = non_null.quantile(0.25)
-                Q3 = non_null.quantile(0.75)
+                Q1, Q3 = QuantileSketch.from_values(non_null).quantiles([0.25, 0.75])
                 IQR = Q3 - Q1
                 lower_bound = Q1 - 1.5 * IQR
                 upper_bound = Q3 + 1.5 * IQR
@@ -126,8 +343,7 @@ class DataProfiler:
         # 4. For mixed types: conflicting types
         if col_type == 'numeric':
             try:
-                numeric = pd.to_numeric(series, errors='coerce')
-                numeric_valid = numeric.notna().sum()
+                numeric_valid = len(non_null)
                 non_null_valid = series.notna().sum()
                 
                 if numeric_valid < non_null_valid * 0.99:
@@ -145,84 +361,432 @@ class DataProfiler:
     @staticmethod
     def calculate_statistics(series: pd.Series, col_type: str) -> Dict[str, Any]:
         """Calculate descriptive statistics"""
+        unique_count, approximate = distinct_count(series)
         stats = {
             'count': int(series.notna().sum()),
             'null_count': int(series.isna().sum()),
-            'unique_count': int(series.nunique()),
+            'unique_count': unique_count,
             'data_type': col_type
         }
+        if approximate:
+            stats['unique_count_approximate'] = True
         
         if col_type == 'numeric':
             numeric_series = pd.to_numeric(series, errors='coerce')
+            sketch = QuantileSketch.from_values(numeric_series)
             
             stats.update({
                 'min': float(numeric_series.min()) if not numeric_series.empty else None,
                 'max': float(numeric_series.max()) if not numeric_series.empty else None,
                 'mean': float(numeric_series.mean()) if not numeric_series.empty else None,
-                'median': float(numeric_series.median()) if not numeric_series.empty else None,
-                'std': float(numeric_series.std()) if not numeric_series.empty else None
+                'median': sketch.median(),
+                'std': float(numeric_series.std()) if not numeric_series.empty else None,
+                'histogram': sketch.histogram()
             })
+            if not sketch.exact:
+                stats['quantiles_approximate'] = True
         
         elif col_type == 'categorical':
             # Top 5 categories
-            top_categories = series.value_counts().head(5)
-            stats['top_values'] = [
-                {'value': str(k), 'count': int(v)}
-                for k, v in top_categories.items()
-            ]
+            stats['top_values'] = _top_values(TopKSketch.from_values(series))
         
         elif col_type == 'date':
-            date_series = pd.to_datetime(series, errors='coerce')
+            date_formats = infer_date_formats(series)
+            date_series = parse_dates(series, date_formats)
+            stats['date_formats'] = date_formats
             stats['earliest'] = str(date_series.min())
             stats['latest'] = str(date_series.max())
         
         return stats
     
     @classmethod
-    def profile_dataset(cls, df: pd.DataFrame) -> Dict[str, Any]:
+    def profile_column(
+        cls,
+        series: pd.Series,
+        sample: bool = True,
+        columns: Optional[TypedColumns] = None
+    ) -> Dict[str, Any]:
+        """
+        Fused single-pass profile of one column
+        
+        Same results as detect_column_type + detect_issues + calculate_statistics,
+        but each column is coerced once and every count is computed once:
+        - one isna mask (null count, non-null count)
+        - type chosen by classify_column (sampled for large columns), then
+          one full pd.to_numeric / parse_dates only for numeric / date columns,
+          dates with the format clusters found while classifying
+        - one distinct count (HyperLogLog on large columns); duplicates are
+          derived from it instead of series.duplicated()
+        - one quantile sketch for the median, both IQR bounds and the histogram
+        
+        With `columns` (the TypedColumns of the series' frame) the null mask
+        and conversions come from, and stay in, the shared column cache.
+        
+        Returns the column profile without its name.
+        """
+        # Counts stay numpy scalars so percentages round exactly as before
+        row_count = len(series)
+        null_mask = series.isna() if columns is None else columns.null_mask(series.name)
+        null_count = null_mask.sum()
+        non_null_count = row_count - null_count
+        
+        # Exact up to DISTINCT_APPROX_MIN_ROWS rows, HyperLogLog above
+        unique_count, unique_approximate = distinct_count(series)
+        
+        # duplicated() tells None / NaN / pd.NA apart in object columns
+        if null_count == 0:
+            null_kinds = 0
+        elif series.dtype == object:
+            null_kinds = len(pd.unique(series[null_mask]))
+        else:
+            null_kinds = 1
+        
+        # 1. Detect type (from a sample for large columns)
+        detection = cls.classify_column(series, sample, unique_count)
+        col_type = detection['type']
+        
+        # Convert in full only what the statistics need
+        numeric = None
+        dates = None
+        if columns is not None:
+            if col_type == 'numeric':
+                numeric = columns.numeric(series.name)
+            elif col_type == 'date':
+                dates = columns.dates(series.name, detection['date_formats'])
+        elif col_type == 'numeric':
+            numeric = coerce_column(series, pd.to_numeric)
+        elif col_type == 'date':
+            dates = coerce_column(series, partial(parse_dates, formats=detection['date_formats']))
+        
+        # 2. Detect issues
+        issues = []
+        
+        if null_count > 0:
+            null_pct = (null_count / row_count) * 100
+            issues.append({
+                'type': 'missing_values',
+                'severity': 'warn' if null_pct < 50 else 'error',
+                'count': int(null_count),
+                'percentage': round(null_pct, 2),
+                'message': f'{null_pct:.1f}% of values are missing'
+            })
+        
+        # Every row beyond the first of each distinct value
+        dup_count = np.int64(duplicate_count(row_count - null_kinds, unique_count, unique_approximate))
+        if dup_count > 0 and col_type != 'categorical':
+            dup_pct = (dup_count / row_count) * 100
+            issues.append({
+                'type': 'duplicates',
+                'severity': 'warn' if dup_pct < 10 else 'error',
+                'count': int(dup_count),
+                'percentage': round(dup_pct, 2),
+                'message': f'{dup_pct:.1f}% of values are duplicated'
+            })
+            if unique_approximate:
+                issues[-1]['approximate'] = True
+        
+        if col_type == 'numeric':
+            # Booleans profile as 0/1 (numpy cannot interpolate bool quantiles)
+            if pd.api.types.is_bool_dtype(numeric):
+                numeric = numeric.astype('float64')
+            numeric_valid = numeric.notna().sum()
+            valid = numeric.dropna()
+            sketch = QuantileSketch.from_values(valid)
+            
+            if len(valid) > 0:
+                # Bounds from the sketch; the values are in memory, so the count is exact
+                Q1, Q3 = sketch.quantiles([0.25, 0.75])
+                IQR = Q3 - Q1
+                lower_bound = Q1 - 1.5 * IQR
+                upper_bound = Q3 + 1.5 * IQR
+                
+                outlier_count = ((valid < lower_bound) | (valid > upper_bound)).sum()
+                outlier_pct = (outlier_count / len(valid)) * 100
+                
+                if outlier_count > 0:
+                    issues.append({
+                        'type': 'outliers',
+                        'severity': 'info',
+                        'count': int(outlier_count),
+                        'percentage': round(outlier_pct, 2),
+                        'message': f'{outlier_pct:.1f}% of values are statistical outliers'
+                    })
+            
+            if numeric_valid < non_null_count * 0.99:
+                issues.append({
+                    'type': 'mixed_types',
+                    'severity': 'warn',
+                    'count': int(non_null_count - numeric_valid),
+                    'message': 'Column contains non-numeric values'
+                })
+        
+        # 3. Calculate statistics
+        stats = {
+            'count': int(non_null_count),
+            'null_count': int(null_count),
+            'unique_count': unique_count,
+            'data_type': col_type
+        }
+        if unique_approximate:
+            stats['unique_count_approximate'] = True
+        
+        if col_type == 'numeric':
+            stats.update({
+                'min': float(numeric.min()),
+                'max': float(numeric.max()),
+                'mean': float(numeric.mean()),
+                'median': sketch.median(),
+                'std': float(numeric.std()),
+                'histogram': sketch.histogram()
+            })
+            if not sketch.exact:
+                stats['quantiles_approximate'] = True
+        
+        elif col_type == 'categorical':
+            stats['top_values'] = _top_values(TopKSketch.from_values(series))
+        
+        elif col_type == 'date':
+            stats['date_formats'] = detection['date_formats']
+            stats['earliest'] = str(dates.min())
+            stats['latest'] = str(dates.max())
+        
+        return {
+            'detected_type': col_type,
+            'type_confidence': round(detection['confidence'], 2),
+            'type_detection': {
+                'method': detection['method'],
+                'sample_size': detection['sample_size'],
+                'margin': round(detection['margin'], 4)
+            },
+            'statistics': stats,
+            'issues': issues
+        }
+    
+    @classmethod
+    def profile_dataset(
+        cls,
+        df: pd.DataFrame,
+        workers: Optional[int] = None,
+        budget: Optional[float] = None,
+        on_preliminary: Optional[Callable[[Dict[str, Any]], None]] = None,
+        columns: Optional[TypedColumns] = None
+    ) -> Dict[str, Any]:
         """
         Complete dataset profiling
         
+        Wide frames (PARALLEL_MIN_COLUMNS+) are profiled on `workers`
+        processes (default PROFILE_WORKERS); see _profile_columns_parallel.
+        Columns profiled in this process take their conversions from
+        `columns`, so engines running after the profiler reuse them.
+        
+        Progressive mode: with a `budget` (seconds) and `on_preliminary`,
+        frames not expected to profile within the budget first get a
+        preliminary_profile from a row sample sized to it, passed to
+        on_preliminary, before the exact profile is computed.
+        
         Returns comprehensive profile with column-level analysis
         """
+        workers = workers or PROFILE_WORKERS
+        
+        if budget is not None and on_preliminary is not None:
+            cells = max(len(df.columns), 1) * PROFILE_SECONDS_PER_CELL
+            if len(df) * cells > budget:
+                sample_rows = int(np.clip(budget / 2 / cells, PRELIMINARY_MIN_ROWS, PRELIMINARY_MAX_ROWS))
+                if sample_rows < len(df):
+                    on_preliminary(cls.preliminary_profile(df, sample_rows))
+        
+        # The cache looks columns up by name
+        if not df.columns.is_unique:
+            columns = None
+        
+        if workers > 1 and len(df.columns) >= PARALLEL_MIN_COLUMNS:
+            column_profiles = cls._profile_columns_parallel(df, workers, columns)
+        else:
+            # Type, issues and statistics in one pass over each column
+            column_profiles = [
+                cls.profile_column(df.iloc[:, i], columns=columns) for i in range(len(df.columns))
+            ]
+        
         profiles = []
         all_issues = []
         
-        for col_name in df.columns:
-            series = df[col_name]
-            
-            # 1. Detect type
-            col_type, confidence = cls.detect_column_type(series, col_name)
-            
-            # 2. Detect issues
-            issues = cls.detect_issues(series, col_type)
+        for col_name, column_profile in zip(df.columns, column_profiles):
+            profile = {'column_name': col_name, **column_profile}
             all_issues.extend([
                 {**issue, 'column': col_name}
-                for issue in issues
+                for issue in profile['issues']
             ])
             
-            # 3. Calculate statistics
-            stats = cls.calculate_statistics(series, col_type)
+            profiles.append(profile)
+        
+        # Dataset-level: duplicate records
+        all_issues.extend({**issue, 'column': None} for issue in DuplicateRowDetector.detect(df))
+        
+        return cls._build_profile(profiles, all_issues, len(df), len(df.columns))
+    
+    @classmethod
+    def preliminary_profile(cls, df: pd.DataFrame, sample_rows: int, seed: int = 0) -> Dict[str, Any]:
+        """
+        Quick profile from a stratified row sample, flagged approximate
+        
+        Types (and their confidence) come from the sample. Row and null
+        counts are scaled to the frame and unique counts estimated with
+        estimate_distinct; only missing-value issues are reported, since
+        duplicates and outliers cannot be judged from a sample.
+        """
+        positions = np.sort(stratified_positions(len(df), min(sample_rows, len(df)), np.random.default_rng(seed)))
+        sample = df.iloc[positions]
+        scale = len(df) / max(len(sample), 1)
+        
+        profiles = []
+        all_issues = []
+        
+        for i, col_name in enumerate(df.columns):
+            column = sample.iloc[:, i]
+            non_null = column.dropna()
+            null_count = int(round((len(column) - len(non_null)) * scale))
+            unique_count = estimate_distinct(non_null, len(df) - null_count)
+            
+            # Categorical vs text on the estimated unique ratio of the whole column
+            sample_unique = unique_count * len(non_null) / max(len(df) - null_count, 1)
+            detection = cls.classify_column(column, unique_count=sample_unique)
+            col_type = detection['type']
+            
+            issues = []
+            if null_count > 0:
+                null_pct = (null_count / len(df)) * 100
+                issues.append({
+                    'type': 'missing_values',
+                    'severity': 'warn' if null_pct < 50 else 'error',
+                    'count': null_count,
+                    'percentage': round(null_pct, 2),
+                    'message': f'{null_pct:.1f}% of values are missing',
+                    'approximate': True
+                })
+            all_issues.extend({**issue, 'column': col_name} for issue in issues)
             
-            profile = {
+            profiles.append({
                 'column_name': col_name,
                 'detected_type': col_type,
-                'type_confidence': round(confidence, 2),
-                'statistics': stats,
+                'type_confidence': round(detection['confidence'], 2),
+                'type_detection': {
+                    'method': 'sample',
+                    'sample_size': detection['sample_size'],
+                    'margin': round(detection['margin'], 4)
+                },
+                'statistics': {
+                    'count': len(df) - null_count,
+                    'null_count': null_count,
+                    'unique_count': unique_count,
+                    'unique_count_approximate': True,
+                    'data_type': col_type
+                },
                 'issues': issues
-            }
+            })
+        
+        return cls._build_profile(
+            profiles, all_issues, len(df), len(df.columns), status='approximate', sample_size=len(sample)
+        )
+    
+    @classmethod
+    def _profile_columns_parallel(
+        cls,
+        df: pd.DataFrame,
+        workers: int,
+        columns: Optional[TypedColumns] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Profile columns concurrently on the shared process pool
+        
+        Shareable columns are written once into a shared memory block as an
+        Arrow IPC stream; workers map it and read their columns in place, so
+        the frame is never pickled per worker. Columns Arrow cannot round-trip
+        exactly (mixed Python objects, extension dtypes) are profiled here
+        while the workers run. See _process_pool for how concurrent jobs
+        share the workers.
+        
+        Returns column profiles in frame column order.
+        """
+        shared = [i for i in range(len(df.columns)) if _arrow_shareable(df.iloc[:, i])]
+        table = pa.Table.from_arrays(
+            [pa.array(df.iloc[:, i], from_pandas=True) for i in shared],
+            names=[str(i) for i in shared]
+        )
+        shm, size = _write_shared_table(table)
+        del table
+        
+        # A few tasks per worker so wide and narrow columns balance out
+        task_count = min(len(shared), workers * 4)
+        tasks = [list(range(t, len(shared), task_count)) for t in range(task_count)]
+        
+        results: Dict[int, Dict[str, Any]] = {}
+        pool = _process_pool(workers)
+        futures = []
+        try:
+            futures = [
+                (task, pool.submit(_profile_shared_columns, shm.name, size, task, True))
+                for task in tasks
+            ]
             
-            profiles.append(profile)
+            shared_set = set(shared)
+            for i in range(len(df.columns)):
+                if i not in shared_set:
+                    results[i] = cls.profile_column(df.iloc[:, i], columns=columns)
+            
+            for task, future in futures:
+                for position, profile in zip(task, future.result()):
+                    results[shared[position]] = profile
+        except BrokenProcessPool:
+            _discard_pool(workers, pool)
+            raise
+        finally:
+            # After a failure, drop tasks not started yet (their block is going away)
+            for _, future in futures:
+                future.cancel()
+            shm.close()
+            shm.unlink()
+        
+        return [results[i] for i in range(len(df.columns))]
+    
+    @classmethod
+    def profile_chunks(cls, chunks: Iterable[pd.DataFrame]) -> Dict[str, Any]:
+        """
+        Profile a dataset that arrives as a sequence of DataFrame chunks
         
-        # Summary
+        Only one chunk is held in memory at a time.
+        Returns the same structure as profile_dataset.
+        """
+        profiler = ChunkedProfiler()
+        for chunk in chunks:
+            profiler.update(chunk)
+        return profiler.finalize()
+    
+    @classmethod
+    def _build_profile(
+        cls,
+        profiles: List[Dict[str, Any]],
+        all_issues: List[Dict[str, Any]],
+        row_count: int,
+        column_count: int,
+        status: str = 'exact',
+        sample_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Assemble column profiles and issues into the profile response
+        
+        `status` ('exact' or 'approximate' for preliminary profiles) is set
+        on the profile and each column; sample_size is the rows it saw.
+        """
         issue_count = len(all_issues)
         error_count = len([i for i in all_issues if i['severity'] == 'error'])
         
         return {
             'profile_timestamp': datetime.utcnow().isoformat(),
-            'row_count': len(df),
-            'column_count': len(df.columns),
-            'columns': profiles,
+            'profile_status': status,
+            'sample_size': row_count if sample_size is None else sample_size,
+            'row_count': row_count,
+            'column_count': column_count,
+            'columns': [{**profile, 'profile_status': status} for profile in profiles],
             'issues': all_issues,
             'summary': {
                 'total_issues': issue_count,
@@ -260,3 +824,433 @@ class DataProfiler:
                 score -= 0.5
         
         return max(0, min(100, score))  # Clamp to 0-100
+
+
+class _ColumnAccumulator:
+    """
+    Running per-column state for chunked profiling
+    
+    Everything here is merged chunk by chunk:
+    - counts (rows, nulls, numeric/date convertible values)
+    - numeric moments (Chan's parallel mean/variance), min/max
+    - date range and the date format clusters seen so far
+    - value frequencies (unique count, duplicates, top values)
+    - KLL quantile sketch of numeric values (median, IQR outliers, histogram)
+    
+    Past DISTINCT_APPROX_MIN_ROWS rows the distinct count moves to a
+    HyperLogLog sketch and the frequency table becomes a space-saving
+    sketch of TOP_VALUES_KEEP counters, so high-cardinality columns stop
+    growing it while top-value counts keep guaranteed error bounds.
+    
+    The whole state round-trips through to_dict() / from_dict() and two
+    accumulators merge(), so rows appended later are profiled on their own
+    and folded into the stored state of the dataset.
+    """
+    
+    TOP_VALUES_KEEP = 10_000
+    
+    # Chunks whose unparsed values may be probed for new date formats
+    # before a column is treated as not containing any more
+    DATE_INFERENCE_RETRIES = 3
+    
+    def __init__(self, rng: np.random.Generator):
+        self.rows = 0
+        self.null_count = 0
+        self.numeric_count = 0
+        self.date_count = 0
+        
+        self.num_mean = 0.0
+        self.num_m2 = 0.0
+        self.num_min: Optional[float] = None
+        self.num_max: Optional[float] = None
+        
+        self.date_min: Optional[pd.Timestamp] = None
+        self.date_max: Optional[pd.Timestamp] = None
+        self.date_formats: List[str] = []
+        self._date_misses = 0
+        
+        self.top_values = TopKSketch(capacity=None)  # exact until the distinct sketch takes over
+        self.distinct_sketch: Optional[HyperLogLog] = None
+        self.quantile_sketch = QuantileSketch(rng=rng)
+    
+    def update(self, series: pd.Series):
+        """Fold one chunk of the column into the running state"""
+        self.rows += len(series)
+        self.null_count += int(series.isna().sum())
+        
+        # Numeric moments
+        numeric = coerce_column(series, pd.to_numeric).dropna().to_numpy(dtype='float64')
+        if len(numeric) > 0:
+            self._merge_moments(numeric)
+            self.quantile_sketch.update(numeric)
+        
+        # Date range
+        dates = self._parse_dates(series).dropna()
+        if len(dates) > 0:
+            self.date_count += len(dates)
+            chunk_min, chunk_max = dates.min(), dates.max()
+            self.date_min = chunk_min if self.date_min is None else min(self.date_min, chunk_min)
+            self.date_max = chunk_max if self.date_max is None else max(self.date_max, chunk_max)
+        
+        # Value frequencies (numeric chunks normalised so 1 and 1.0 merge,
+        # timestamps as text so persisted state merges with new chunks)
+        if pd.api.types.is_numeric_dtype(series):
+            values = series.astype('float64')
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            values = series.dropna().astype(str)
+        else:
+            values = series
+        self.top_values.update(values)
+        
+        if self.distinct_sketch is None and self.rows > DISTINCT_APPROX_MIN_ROWS:
+            self.distinct_sketch = self._seeded_sketch()
+            self.top_values.resize(self.TOP_VALUES_KEEP)
+        elif self.distinct_sketch is not None:
+            self.distinct_sketch.update(values)
+    
+    def _parse_dates(self, series: pd.Series) -> pd.Series:
+        """
+        Parse with the format clusters found so far
+        
+        Values they leave unparsed are probed for new clusters, so a
+        format that first shows up in a later chunk is still learned.
+        """
+        dates = coerce_column(series, partial(parse_dates, formats=self.date_formats))
+        if self._date_misses >= self.DATE_INFERENCE_RETRIES:
+            return dates
+        
+        leftover = series[dates.isna() & series.notna()]
+        candidates = [fmt for fmt in DATE_FORMATS if fmt not in self.date_formats]
+        new_formats = infer_date_formats(leftover, candidates) if len(leftover) > 0 else []
+        
+        if new_formats:
+            self.date_formats += new_formats
+            dates = dates.fillna(coerce_column(leftover, partial(parse_dates, formats=new_formats)))
+        elif len(leftover) > 0:
+            self._date_misses += 1
+        return dates
+    
+    def merge(self, other: '_ColumnAccumulator'):
+        """Fold the state of another accumulator (e.g. appended rows) into this one"""
+        self.rows += other.rows
+        self.null_count += other.null_count
+        
+        if other.numeric_count > 0:
+            self._combine_moments(other.numeric_count, other.num_mean, other.num_m2, other.num_min, other.num_max)
+        self.quantile_sketch.merge(other.quantile_sketch)
+        
+        if other.date_count > 0:
+            self.date_count += other.date_count
+            self.date_min = other.date_min if self.date_min is None else min(self.date_min, other.date_min)
+            self.date_max = other.date_max if self.date_max is None else max(self.date_max, other.date_max)
+        self.date_formats += [fmt for fmt in other.date_formats if fmt not in self.date_formats]
+        
+        approximate = self.distinct_sketch is not None or other.distinct_sketch is not None
+        if approximate or self.rows > DISTINCT_APPROX_MIN_ROWS:
+            sketch = self._seeded_sketch()
+            sketch.merge(other._seeded_sketch())
+            self.distinct_sketch = sketch
+        
+        self.top_values.merge(other.top_values)
+        if self.distinct_sketch is not None:
+            self.top_values.resize(self.TOP_VALUES_KEEP)
+    
+    def _seeded_sketch(self) -> HyperLogLog:
+        """The distinct sketch, or a new one seeded with every value counted so far"""
+        if self.distinct_sketch is not None:
+            return self.distinct_sketch
+        sketch = HyperLogLog()
+        sketch.update(pd.Series(self.top_values.counts.index))
+        return sketch
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        JSON-safe state
+        
+        Frequency tables and quantile values are stored exactly only up to
+        TOP_VALUES_KEEP entries; beyond that the stored state continues with
+        HyperLogLog / space-saving / compacted KLL sketches, so it stays
+        bounded per column.
+        """
+        top_values = self.top_values
+        distinct_sketch = self.distinct_sketch
+        if distinct_sketch is None and len(top_values) > self.TOP_VALUES_KEEP:
+            distinct_sketch = self._seeded_sketch()
+        if distinct_sketch is not None and top_values.capacity != self.TOP_VALUES_KEEP:
+            top_values = TopKSketch(capacity=self.TOP_VALUES_KEEP)
+            top_values.merge(self.top_values)
+        
+        quantile_sketch = self.quantile_sketch
+        if quantile_sketch.exact and quantile_sketch.count > self.TOP_VALUES_KEEP:
+            quantile_sketch = quantile_sketch.compacted()
+        
+        return {
+            'rows': self.rows,
+            'null_count': self.null_count,
+            'numeric_count': self.numeric_count,
+            'date_count': self.date_count,
+            'num_mean': self.num_mean,
+            'num_m2': self.num_m2,
+            'num_min': self.num_min,
+            'num_max': self.num_max,
+            'date_min': None if self.date_min is None else self.date_min.isoformat(),
+            'date_max': None if self.date_max is None else self.date_max.isoformat(),
+            'date_formats': self.date_formats,
+            'top_values': top_values.to_dict(),
+            'distinct_sketch': None if distinct_sketch is None else distinct_sketch.to_dict(),
+            'quantile_sketch': quantile_sketch.to_dict()
+        }
+    
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any], rng: np.random.Generator) -> '_ColumnAccumulator':
+        acc = cls(rng)
+        for key in ('rows', 'null_count', 'numeric_count', 'date_count', 'num_mean', 'num_m2', 'num_min', 'num_max'):
+            setattr(acc, key, state[key])
+        acc.date_min = None if state['date_min'] is None else pd.Timestamp(state['date_min'])
+        acc.date_max = None if state['date_max'] is None else pd.Timestamp(state['date_max'])
+        acc.date_formats = list(state.get('date_formats', []))
+        
+        acc.top_values = TopKSketch.from_dict(state['top_values'])
+        if state['distinct_sketch'] is not None:
+            acc.distinct_sketch = HyperLogLog.from_dict(state['distinct_sketch'])
+        acc.quantile_sketch = QuantileSketch.from_dict(state['quantile_sketch'], rng=rng)
+        return acc
+    
+    @property
+    def distinct(self) -> int:
+        """Distinct non-null values (estimated once the sketch has taken over)"""
+        if self.distinct_sketch is None:
+            return len(self.top_values)
+        return self.distinct_sketch.count()
+    
+    def _merge_moments(self, values: np.ndarray):
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        self._combine_moments(len(values), mean, m2, float(values.min()), float(values.max()))
+    
+    def _combine_moments(self, n_b: int, mean_b: float, m2_b: float, min_b: float, max_b: float):
+        """Chan's parallel update of count, mean, M2 and range"""
+        n_a = self.numeric_count
+        n = n_a + n_b
+        delta = mean_b - self.num_mean
+        self.num_mean += delta * n_b / n
+        self.num_m2 += m2_b + delta ** 2 * n_a * n_b / n
+        self.numeric_count = n
+        
+        self.num_min = min_b if self.num_min is None else min(self.num_min, min_b)
+        self.num_max = max_b if self.num_max is None else max(self.num_max, max_b)
+    
+    def detect_type(self) -> Tuple[str, float]:
+        """
+        Same decision rules as DataProfiler.classify_column
+        
+        Every value was converted while streaming, so ratios are exact.
+        """
+        non_null = self.rows - self.null_count
+        if non_null == 0:
+            return 'unknown', 0.0
+        
+        numeric_ratio = self.numeric_count / non_null
+        if numeric_ratio > DataProfiler.NUMERIC_THRESHOLD:
+            return 'numeric', numeric_ratio
+        
+        date_ratio = self.date_count / non_null
+        if date_ratio > DataProfiler.DATE_THRESHOLD:
+            return 'date', date_ratio
+        
+        confidence = 1 - max(numeric_ratio, date_ratio)
+        if self.distinct / non_null < DataProfiler.CATEGORICAL_UNIQUE_RATIO:
+            return 'categorical', confidence
+        
+        return 'text', confidence
+    
+    def detect_issues(self, col_type: str) -> List[Dict[str, Any]]:
+        """Same issue rules as DataProfiler.detect_issues"""
+        issues = []
+        
+        if self.null_count > 0:
+            null_pct = (self.null_count / self.rows) * 100
+            issues.append({
+                'type': 'missing_values',
+                'severity': 'warn' if null_pct < 50 else 'error',
+                'count': int(self.null_count),
+                'percentage': round(null_pct, 2),
+                'message': f'{null_pct:.1f}% of values are missing'
+            })
+        
+        # NaN counts as one distinct value, matching Series.duplicated()
+        nulls = 1 if self.null_count > 0 else 0
+        dup_count = duplicate_count(self.rows - nulls, self.distinct, self.distinct_sketch is not None)
+        if dup_count > 0 and col_type != 'categorical':
+            dup_pct = (dup_count / self.rows) * 100
+            issues.append({
+                'type': 'duplicates',
+                'severity': 'warn' if dup_pct < 10 else 'error',
+                'count': int(dup_count),
+                'percentage': round(dup_pct, 2),
+                'message': f'{dup_pct:.1f}% of values are duplicated'
+            })
+            if self.distinct_sketch is not None:
+                issues[-1]['approximate'] = True
+        
+        sketch = self.quantile_sketch
+        if col_type == 'numeric' and sketch.count > 0:
+            # Bounds and the count outside them both come from the sketch
+            Q1, Q3 = sketch.quantiles([0.25, 0.75])
+            IQR = Q3 - Q1
+            outlier_count = sketch.count_below(Q1 - 1.5 * IQR) + sketch.count_above(Q3 + 1.5 * IQR)
+            outlier_pct = (outlier_count / self.numeric_count) * 100
+            
+            if outlier_count > 0:
+                issues.append({
+                    'type': 'outliers',
+                    'severity': 'info',
+                    'count': outlier_count,
+                    'percentage': round(outlier_pct, 2),
+                    'message': f'{outlier_pct:.1f}% of values are statistical outliers'
+                })
+                if not sketch.exact:
+                    issues[-1]['approximate'] = True
+        
+        if col_type == 'numeric':
+            non_null = self.rows - self.null_count
+            if self.numeric_count < non_null * 0.99:
+                issues.append({
+                    'type': 'mixed_types',
+                    'severity': 'warn',
+                    'count': int(non_null - self.numeric_count),
+                    'message': 'Column contains non-numeric values'
+                })
+        
+        return issues
+    
+    def calculate_statistics(self, col_type: str) -> Dict[str, Any]:
+        """Same statistics as DataProfiler.calculate_statistics"""
+        stats = {
+            'count': int(self.rows - self.null_count),
+            'null_count': int(self.null_count),
+            'unique_count': int(self.distinct),
+            'data_type': col_type
+        }
+        if self.distinct_sketch is not None:
+            stats['unique_count_approximate'] = True
+        
+        if col_type == 'numeric':
+            std = np.sqrt(self.num_m2 / (self.numeric_count - 1)) if self.numeric_count > 1 else np.nan
+            stats.update({
+                'min': self.num_min,
+                'max': self.num_max,
+                'mean': self.num_mean,
+                'median': self.quantile_sketch.median(),
+                'std': float(std),
+                'histogram': self.quantile_sketch.histogram()
+            })
+            if not self.quantile_sketch.exact:
+                stats['quantiles_approximate'] = True
+        
+        elif col_type == 'categorical':
+            stats['top_values'] = _top_values(self.top_values)
+        
+        elif col_type == 'date':
+            stats['date_formats'] = self.date_formats
+            stats['earliest'] = str(self.date_min)
+            stats['latest'] = str(self.date_max)
+        
+        return stats
+
+
+class ChunkedProfiler:
+    """
+    Incremental profiler for streamed uploads
+    
+    Usage:
+        profiler = ChunkedProfiler()
+        for chunk in chunks:
+            profiler.update(chunk)
+        profile = profiler.finalize()
+    
+    Memory is bounded by the chunk size plus per-column state.
+    Median, IQR outliers and histograms come from mergeable KLL sketches,
+    exact up to QUANTILE_EXACT_ROWS numeric values and estimated beyond.
+    Unique counts are exact up to DISTINCT_APPROX_MIN_ROWS rows, HyperLogLog beyond.
+    Duplicate records come from a DuplicateRowDetector fed the same chunks.
+    """
+    
+    def __init__(self, seed: int = 0):
+        self._rng = np.random.default_rng(seed)
+        self._columns: Dict[str, _ColumnAccumulator] = {}
+        self.duplicates = DuplicateRowDetector()
+        self.row_count = 0
+    
+    def update(self, chunk: pd.DataFrame):
+        """Fold one DataFrame chunk into the running profile"""
+        for col_name in chunk.columns:
+            if col_name not in self._columns:
+                self._columns[col_name] = _ColumnAccumulator(self._rng)
+            self._columns[col_name].update(chunk[col_name])
+        
+        self.duplicates.update(chunk)
+        self.row_count += len(chunk)
+    
+    def merge(self, other: 'ChunkedProfiler'):
+        """Fold another profiler's state (e.g. of appended rows) into this one"""
+        for col_name, acc in other._columns.items():
+            if col_name not in self._columns:
+                self._columns[col_name] = _ColumnAccumulator(self._rng)
+            self._columns[col_name].merge(acc)
+        
+        self.row_count += other.row_count
+    
+    @property
+    def column_names(self) -> List[str]:
+        return list(self._columns)
+    
+    def column_states(self) -> Dict[str, Dict[str, Any]]:
+        """Mergeable, JSON-safe state per column (see _ColumnAccumulator.to_dict)"""
+        return {col_name: acc.to_dict() for col_name, acc in self._columns.items()}
+    
+    @classmethod
+    def from_column_states(cls, states: Dict[str, Dict[str, Any]], row_count: int, seed: int = 0) -> 'ChunkedProfiler':
+        """Restore a profiler from column_states() output"""
+        profiler = cls(seed)
+        for col_name, state in states.items():
+            profiler._columns[col_name] = _ColumnAccumulator.from_dict(state, profiler._rng)
+        profiler.row_count = row_count
+        return profiler
+    
+    def preliminary(self) -> Dict[str, Any]:
+        """Profile of the rows seen so far, flagged approximate (shown while the rest streams in)"""
+        return self.finalize(status='approximate')
+    
+    def finalize(self, status: str = 'exact') -> Dict[str, Any]:
+        """Build the profile response from the accumulated state"""
+        profiles = []
+        all_issues = []
+        
+        for col_name, acc in self._columns.items():
+            col_type, confidence = acc.detect_type()
+            issues = acc.detect_issues(col_type)
+            all_issues.extend([
+                {**issue, 'column': col_name}
+                for issue in issues
+            ])
+            
+            profiles.append({
+                'column_name': col_name,
+                'detected_type': col_type,
+                'type_confidence': round(confidence, 2),
+                'type_detection': {
+                    'method': 'full',
+                    'sample_size': acc.rows - acc.null_count,
+                    'margin': 0.0
+                },
+                'statistics': acc.calculate_statistics(col_type),
+                'issues': issues
+            })
+        
+        # Row hashes are not part of the persisted state, so duplicate records
+        # are only reported when this profiler saw every row itself
+        if self.duplicates.rows == self.row_count:
+            all_issues.extend({**issue, 'column': None} for issue in self.duplicates.issues())
+        
+        return DataProfiler._build_profile(profiles, all_issues, self.row_count, len(self._columns), status)
@@ -0,0 +1,311 @@
+"""
+SEMANTIC QUERY ENGINE
+
+Answers "metric by dimensions over time" questions from the semantic layer:
+
+    metric='sales', dimensions=['region'], time_grain='month',
+    filters=[{'column': 'region', 'op': 'in', 'value': ['North', 'East']}]
+
+compile() checks a request against the semantic layer and the column
+profiles and resolves defaults; execute() runs the plan as one vectorized
+group-by:
+- only referenced columns are read (TypedColumns over the stored file)
+- filters are combined into one boolean mask
+- the time dimension is truncated to the grain with datetime64 arithmetic
+- the metric's `aggregation` (sum/avg/count/min/max/std) is applied per group
+
+Plans a materialized rollup covers are answered from it instead (see
+app.engines.rollups); everything else falls back to the raw scan.
+
+Stored string columns load as categoricals, so grouping runs on integer
+codes and dates are parsed once per distinct value. Loaded and parsed
+columns stay in the shared column cache, so follow-up queries on the
+same dataset version only pay for the group-by.
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from analytics.columns import TypedColumns
+from analytics.dates import TIME_GRAINS
+
+# Most result rows returned by one query
+QUERY_MAX_ROWS = int(os.getenv("QUERY_MAX_ROWS", "10000"))
+
+# Semantic aggregation -> pandas reduction
+AGGREGATIONS = {'sum': 'sum', 'avg': 'mean', 'count': 'count', 'min': 'min', 'max': 'max', 'std': 'std'}
+
+FILTER_OPS = ('eq', 'ne', 'in', 'not_in', 'gt', 'gte', 'lt', 'lte')
+RANGE_OPS = ('gt', 'gte', 'lt', 'lte')
+
+# Result orders: by group keys, or by the aggregated value
+QUERY_ORDERS = ('keys', 'value_desc', 'value_asc')
+
+# Grain used when a time dimension is requested without one
+DEFAULT_TIME_GRAIN = 'month'
+
+
+class QueryError(ValueError):
+    """Raised for a query the semantic layer cannot answer"""
+
+
+def _cell(value):
+    """A result value as JSON-safe Python"""
+    if value is None or value is pd.NaT or value is pd.NA or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+        return None if isinstance(value, float) and np.isnan(value) else value
+    return value
+
+
+def filter_mask(columns: TypedColumns, f: Dict[str, Any]) -> np.ndarray:
+    """Rows passing one compiled filter (nulls never pass)"""
+    if f['type'] == 'numeric':
+        values = columns.numeric(f['column'])
+    elif f['type'] == 'date':
+        values = columns.dates(f['column'])
+    else:
+        # Categories are compared once, then taken by code
+        values = columns.column(f['column'])
+        if not isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(str).where(values.notna())
+    
+    op, value = f['op'], f['value']
+    if op == 'eq':
+        mask = values == value
+    elif op == 'ne':
+        mask = (values != value) & values.notna()
+    elif op == 'in':
+        mask = values.isin(value)
+    elif op == 'not_in':
+        mask = ~values.isin(value) & values.notna()
+    elif op == 'gt':
+        mask = values > value
+    elif op == 'gte':
+        mask = values >= value
+    elif op == 'lt':
+        mask = values < value
+    else:
+        mask = values <= value
+    return mask.to_numpy(dtype=bool)
+
+
+def matching_rows(plan: Dict[str, Any], columns: TypedColumns) -> Optional[np.ndarray]:
+    """Positions of the rows passing every filter of a plan (None when unfiltered)"""
+    mask = None
+    for f in plan['filters']:
+        passed = filter_mask(columns, f)
+        mask = passed if mask is None else mask & passed
+    return None if mask is None else np.flatnonzero(mask)
+
+
+def take(series: pd.Series, positions: Optional[np.ndarray]) -> pd.Series:
+    """
+    Rows of a column by position, on a fresh RangeIndex
+    
+    Takes the bare array; masking the Series would also subset its index.
+    """
+    array = series.array if positions is None else series.array.take(positions)
+    return pd.Series(array, name=series.name, copy=False)
+
+
+def group_keys(plan: Dict[str, Any], columns: TypedColumns, positions: Optional[np.ndarray]) -> List[pd.Series]:
+    """The plan's dimension columns, then its time dimension truncated to the grain"""
+    keys = [columns.column(d) for d in plan['dimensions']]
+    if plan['time_dimension'] is not None:
+        keys.append(columns.truncated_dates(plan['time_dimension'], plan['time_grain']))
+    return [take(key, positions) for key in keys]
+
+
+class SemanticQueryEngine:
+    """Compile semantic queries and run them over stored columns"""
+    
+    @staticmethod
+    def _filter_value(value: Any, col_type: str, column: str):
+        """One filter operand in the column's type"""
+        try:
+            if col_type == 'numeric':
+                return float(value)
+            if col_type == 'date':
+                return pd.Timestamp(value)
+        except (TypeError, ValueError):
+            raise QueryError(f"Filter value {value!r} is not a valid {col_type} for '{column}'")
+        return str(value)
+    
+    @classmethod
+    def compile(
+        cls,
+        semantic: Dict[str, Any],
+        profiles: List[Dict[str, Any]],
+        metric: str,
+        dimensions: Optional[List[str]] = None,
+        time_dimension: Optional[str] = None,
+        time_grain: Optional[str] = None,
+        filters: Optional[List[Dict[str, Any]]] = None,
+        order: str = 'keys',
+        limit: int = QUERY_MAX_ROWS
+    ) -> Dict[str, Any]:
+        """
+        Validate a query against the semantic layer and build its plan
+        
+        - metric: a semantic metric column; its `aggregation` is used
+        - dimensions: semantic dimension columns to group by
+        - time_dimension / time_grain: group by a date truncated to the grain;
+          either may be given alone (first time dimension, DEFAULT_TIME_GRAIN)
+        - filters: {'column', 'op', 'value'} on any profiled column; range
+          ops only on numeric and date columns, 'in' / 'not_in' take a list
+        
+        Raises QueryError for anything the layer cannot answer.
+        """
+        metrics = {m['column']: m for m in semantic.get('metrics', [])}
+        dimension_names = {d['column'] for d in semantic.get('dimensions', [])}
+        time_names = [t['column'] for t in semantic.get('time_dimensions', [])]
+        types = {p['column_name']: p['detected_type'] for p in profiles}
+        
+        if metric not in metrics:
+            raise QueryError(f"Unknown metric '{metric}'")
+        aggregation = metrics[metric].get('aggregation', 'sum')
+        if aggregation not in AGGREGATIONS:
+            raise QueryError(f"Unsupported aggregation '{aggregation}' for metric '{metric}'")
+        
+        dimensions = list(dict.fromkeys(dimensions or []))
+        unknown = [d for d in dimensions if d not in dimension_names]
+        if unknown:
+            raise QueryError(f"Unknown dimensions: {unknown}")
+        
+        if time_dimension is not None or time_grain is not None:
+            if time_dimension is None:
+                if not time_names:
+                    raise QueryError("Dataset has no time dimension")
+                time_dimension = time_names[0]
+            elif time_dimension not in time_names:
+                raise QueryError(f"Unknown time dimension '{time_dimension}'")
+            time_grain = time_grain or DEFAULT_TIME_GRAIN
+            if time_grain not in TIME_GRAINS:
+                raise QueryError(f"Unknown time grain '{time_grain}' (expected one of {', '.join(TIME_GRAINS)})")
+        
+        compiled_filters = []
+        for f in filters or []:
+            column, op, value = f.get('column'), f.get('op', 'eq'), f.get('value')
+            if column not in types:
+                raise QueryError(f"Unknown filter column '{column}'")
+            if op not in FILTER_OPS:
+                raise QueryError(f"Unknown filter op '{op}' (expected one of {', '.join(FILTER_OPS)})")
+            col_type = types[column]
+            if op in RANGE_OPS and col_type not in ('numeric', 'date'):
+                raise QueryError(f"Filter op '{op}' needs a numeric or date column, '{column}' is {col_type}")
+            
+            if op in ('in', 'not_in'):
+                if not isinstance(value, list):
+                    raise QueryError(f"Filter op '{op}' takes a list of values")
+                value = [cls._filter_value(v, col_type, column) for v in value]
+            else:
+                value = cls._filter_value(value, col_type, column)
+            compiled_filters.append({'column': column, 'op': op, 'value': value, 'type': col_type})
+        
+        if order not in QUERY_ORDERS:
+            raise QueryError(f"Unknown order '{order}' (expected one of {', '.join(QUERY_ORDERS)})")
+        
+        date_formats = {
+            p['column_name']: p.get('statistics', {}).get('date_formats')
+            for p in profiles
+            if p['detected_type'] == 'date' and p.get('statistics', {}).get('date_formats')
+        }
+        
+        return {
+            'metric': metric,
+            'business_name': metrics[metric].get('business_name', metric),
+            'aggregation': aggregation,
+            'dimensions': dimensions,
+            'time_dimension': time_dimension,
+            'time_grain': time_grain if time_dimension is not None else None,
+            'filters': compiled_filters,
+            'order': order,
+            'limit': min(limit, QUERY_MAX_ROWS),
+            'date_formats': date_formats
+        }
+    
+    @staticmethod
+    def scan(plan: Dict[str, Any], columns: TypedColumns) -> Dict[str, Any]:
+        """
+        Answer a plan from the raw rows
+        
+        Returns {'result': frame of group keys + 'value' ordered by key,
+        'rows_scanned', 'rows_matched', 'source'}.
+        """
+        values = columns.numeric(plan['metric'])
+        rows_scanned = len(values)
+        
+        positions = matching_rows(plan, columns)
+        values = take(values, positions)
+        keys = group_keys(plan, columns, positions)
+        
+        reduction = AGGREGATIONS[plan['aggregation']]
+        if keys:
+            result = values.groupby(keys, observed=True, sort=True, dropna=False).agg(reduction)
+            result = result.rename('value').reset_index()
+        else:
+            result = pd.DataFrame({'value': [values.agg(reduction)]})
+        
+        return {'result': result, 'rows_scanned': rows_scanned, 'rows_matched': len(values), 'source': 'scan'}
+    
+    @classmethod
+    def execute(
+        cls,
+        plan: Dict[str, Any],
+        columns: Optional[TypedColumns] = None,
+        cube=None,
+        backend=None
+    ) -> Dict[str, Any]:
+        """
+        Run a compiled plan
+        
+        Answered from `cube` (a RollupCube) when one of its rollups covers
+        the plan, otherwise scanned by `backend` (an ExecutionBackend, see
+        app.engines.backends) or, without one, over `columns`; 'source'
+        tells which.
+        
+        Groups are ordered by their keys (time ascending) unless the plan
+        orders by value; rows with a missing dimension or date form their
+        own group (key None). At most plan['limit'] rows are returned,
+        with 'truncated' set when there were more.
+        """
+        answer = cube.answer(plan) if cube is not None else None
+        if answer is None:
+            answer = backend.scan(plan) if backend is not None else cls.scan(plan, columns)
+        
+        result = answer['result']
+        if plan['order'] != 'keys' and len(result.columns) > 1:
+            result = result.sort_values('value', ascending=plan['order'] == 'value_asc', kind='stable')
+        
+        group_count = len(result)
+        result = result.head(plan['limit'])
+        rows = [
+            {name: _cell(value) for name, value in zip(result.columns, record)}
+            for record in result.itertuples(index=False, name=None)
+        ]
+        
+        return {
+            'metric': {
+                'column': plan['metric'],
+                'business_name': plan['business_name'],
+                'aggregation': plan['aggregation']
+            },
+            'dimensions': plan['dimensions'],
+            'time_dimension': (
+                {'column': plan['time_dimension'], 'grain': plan['time_grain']}
+                if plan['time_dimension'] is not None else None
+            ),
+            'rows': rows,
+            'row_count': group_count,
+            'truncated': group_count > len(rows),
+            'rows_scanned': answer['rows_scanned'],
+            'rows_matched': answer['rows_matched'],
+            'source': answer['source']
+        }
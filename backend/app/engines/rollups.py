@@ -0,0 +1,385 @@
+"""
+ROLLUP CUBE
+
+Dashboards ask the same few questions over and over: a metric by one
+dimension by month. Once an upload's semantic layer is known, every
+metric is pre-aggregated over each rollup:
+
+    (dimension subsets of up to ROLLUP_MAX_DIMENSIONS) x (no time | each time dimension by day)
+
+Each group keeps additive statistics per metric:
+
+    {metric}.sum  {metric}.count  {metric}.min  {metric}.max  {metric}.m2   and   _rows
+
+m2 is the sum of squared deviations from the group mean (more robust than a
+raw sum of squares, and still mergeable). A plan is answered by merging the
+groups it selects: coarser grains, fewer dimensions and filters on rollup
+keys all reduce to the same merge, and sum / count / min / max / avg
+(sum / count) / std (m2 / (count - 1)) follow from the merged statistics.
+Cubes over separate row sets merge the same way (appends).
+
+Rollups are built finest first; each coarser one is merged from the
+smallest rollup already built that has its keys, so only the finest ones
+read the raw rows. A rollup with more than ROLLUP_MAX_GROUPS groups is not
+kept (it would not be much cheaper than a scan).
+
+Stored next to the dataset version as Arrow files plus a manifest:
+
+    {version}.rollups/manifest.json
+    {version}.rollups/r{n}.arrow
+"""
+
+import json
+import os
+import shutil
+import uuid
+from functools import partial
+from itertools import combinations
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from analytics.columns import TypedColumns
+from app.engines.query_engine import group_keys, matching_rows, take
+
+# Uploads smaller than this are scanned fast enough without rollups
+ROLLUP_MIN_ROWS = int(os.getenv("ROLLUP_MIN_ROWS", "100000"))
+
+# Most dimensions combined in one rollup, and most groups a rollup may keep
+ROLLUP_MAX_DIMENSIONS = int(os.getenv("ROLLUP_MAX_DIMENSIONS", "1"))
+ROLLUP_MAX_GROUPS = int(os.getenv("ROLLUP_MAX_GROUPS", "100000"))
+
+# Time dimensions are stored by day; every coarser grain merges from it
+ROLLUP_GRAIN = 'day'
+
+# Per-metric statistics, and the rows behind each group
+STATISTICS = ('sum', 'count', 'min', 'max', 'm2')
+ROWS_COLUMN = '_rows'
+
+
+def _stat(metric: str, statistic: str) -> str:
+    return f"{metric}.{statistic}"
+
+
+def _read_column(path: str, name: str) -> pd.Series:
+    """One column of a stored rollup"""
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all().column(name).to_pandas().rename(name)
+
+
+def _key_names(rollup: Dict[str, Any]) -> List[str]:
+    time = rollup['time_dimension']
+    return rollup['dimensions'] + ([time] if time is not None else [])
+
+
+def _contains(parent: Dict[str, Any], rollup: Dict[str, Any]) -> bool:
+    """Whether `rollup` can be merged from `parent`'s groups"""
+    if rollup['time_dimension'] is not None and rollup['time_dimension'] != parent['time_dimension']:
+        return False
+    return set(rollup['dimensions']) <= set(parent['dimensions'])
+
+
+def _by(keys: List[pd.Series], rows: int) -> List[Any]:
+    """Group-by keys; no keys means one group of everything"""
+    return keys or [np.zeros(rows, dtype=np.int8)]
+
+
+def aggregate(values: pd.DataFrame, keys: List[pd.Series]) -> pd.DataFrame:
+    """Statistics of raw metric values (one column per metric) per group of `keys`"""
+    grouped = values.groupby(_by(keys, len(values)), observed=True, sort=True, dropna=False)
+    count = grouped.count()
+    parts = {
+        'sum': grouped.sum(),
+        'count': count,
+        'min': grouped.min(),
+        'max': grouped.max(),
+        'm2': (grouped.var(ddof=0) * count).fillna(0.0)
+    }
+    
+    frame = pd.DataFrame({
+        _stat(metric, statistic): parts[statistic][metric]
+        for metric in values.columns
+        for statistic in STATISTICS
+    })
+    frame[ROWS_COLUMN] = grouped.size()
+    return frame.reset_index(drop=not keys)
+
+
+def merge_groups(stats: pd.DataFrame, keys: List[pd.Series], metrics: List[str]) -> pd.DataFrame:
+    """
+    Merge stored statistics of the groups that share the same `keys`
+    
+    Sums, counts and rows add up, minima and maxima carry over, and m2
+    combines by Chan's formula: sum(m2_i) + sum(n_i * (mean_i - mean)^2).
+    """
+    by = _by(keys, len(stats))
+    grouped = stats.groupby(by, observed=True, sort=True, dropna=False)
+    how = {ROWS_COLUMN: 'sum'}
+    for metric in metrics:
+        how.update({
+            _stat(metric, 'sum'): 'sum',
+            _stat(metric, 'count'): 'sum',
+            _stat(metric, 'min'): 'min',
+            _stat(metric, 'max'): 'max'
+        })
+    merged = grouped.agg(how)
+    
+    # Merged groups come out in ngroup order, so each row finds its group's mean by code
+    codes = grouped.ngroup().to_numpy()
+    for metric in metrics:
+        sums, counts = stats[_stat(metric, 'sum')], stats[_stat(metric, 'count')]
+        means = (merged[_stat(metric, 'sum')] / merged[_stat(metric, 'count')].where(merged[_stat(metric, 'count')] > 0)).to_numpy()
+        spread = counts * (sums / counts.where(counts > 0) - means[codes]) ** 2
+        weights = (spread.fillna(0.0) + stats[_stat(metric, 'm2')]).to_numpy(dtype='float64')
+        merged[_stat(metric, 'm2')] = np.bincount(codes, weights=weights, minlength=len(merged))
+    
+    return merged[list(stats.columns)].reset_index(drop=not keys)
+
+
+def finish(aggregation: str, stats: pd.DataFrame, metric: str) -> pd.Series:
+    """A metric's semantic aggregation from its merged statistics"""
+    sums, counts = stats[_stat(metric, 'sum')], stats[_stat(metric, 'count')]
+    if aggregation == 'sum':
+        return sums
+    if aggregation == 'count':
+        return counts
+    if aggregation in ('min', 'max'):
+        return stats[_stat(metric, aggregation)]
+    if aggregation == 'avg':
+        return sums / counts.where(counts > 0)
+    # std with ddof=1, as pandas
+    return np.sqrt(stats[_stat(metric, 'm2')] / (counts - 1).where(counts > 1))
+
+
+class RollupCube:
+    """
+    Pre-aggregated metric statistics of one dataset version
+    
+    `rollups` are dicts {'name', 'dimensions', 'time_dimension',
+    'date_only', 'groups'}; built cubes also hold each rollup's
+    statistics under 'frame' until saved, loaded cubes read them
+    from `directory` on use.
+    """
+    
+    def __init__(self, metrics: List[str], rollups: List[Dict[str, Any]], directory: Optional[str] = None):
+        self.metrics = metrics
+        self.rollups = rollups
+        self.directory = directory
+    
+    @staticmethod
+    def plan(semantic: Dict[str, Any], max_dimensions: int = ROLLUP_MAX_DIMENSIONS) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Metrics and rollup keys for a semantic layer, finest rollups first"""
+        metrics = [m['column'] for m in semantic.get('metrics', [])]
+        dimensions = [d['column'] for d in semantic.get('dimensions', [])]
+        times = [t['column'] for t in semantic.get('time_dimensions', [])]
+        
+        specs = [
+            {'dimensions': list(dims), 'time_dimension': time}
+            for size in range(min(max_dimensions, len(dimensions)), -1, -1)
+            for dims in combinations(dimensions, size)
+            for time in times + [None]
+        ]
+        specs.sort(key=lambda spec: len(_key_names(spec)), reverse=True)
+        return metrics, specs
+    
+    @classmethod
+    def build(
+        cls,
+        columns: TypedColumns,
+        metrics: List[str],
+        specs: List[Dict[str, Any]],
+        max_groups: int = ROLLUP_MAX_GROUPS
+    ) -> 'RollupCube':
+        """
+        Aggregate `metrics` over each rollup in `specs` (finest first, see plan())
+        
+        Rollups with more than `max_groups` groups are left out.
+        """
+        values = pd.DataFrame({metric: take(columns.numeric(metric), None) for metric in metrics})
+        
+        # Times already at midnight answer any date filter exactly
+        date_only = {}
+        for time in {spec['time_dimension'] for spec in specs} - {None}:
+            dates = columns.dates(time)
+            days = columns.truncated_dates(time, ROLLUP_GRAIN)
+            date_only[time] = bool(((dates == days) | dates.isna()).all())
+        
+        rollups = []
+        for spec in specs:
+            parents = [r for r in rollups if _contains(r, spec)]
+            if parents:
+                parent = min(parents, key=lambda r: r['groups'])
+                stats = parent['frame']
+                keys = [stats[name] for name in _key_names(spec)]
+                frame = merge_groups(stats.drop(columns=_key_names(parent)), keys, metrics)
+            else:
+                keys = [take(columns.column(d), None) for d in spec['dimensions']]
+                if spec['time_dimension'] is not None:
+                    keys.append(take(columns.truncated_dates(spec['time_dimension'], ROLLUP_GRAIN), None))
+                frame = aggregate(values, keys)
+            
+            if len(frame) > max_groups:
+                continue
+            rollups.append({
+                **spec,
+                'name': f"r{len(rollups)}",
+                'date_only': date_only.get(spec['time_dimension'], True),
+                'groups': len(frame),
+                'frame': frame
+            })
+        
+        return cls(metrics, rollups)
+    
+    def frame(self, rollup: Dict[str, Any]) -> pd.DataFrame:
+        """All statistics of one rollup"""
+        if 'frame' in rollup:
+            return rollup['frame']
+        path = os.path.join(self.directory, f"{rollup['name']}.arrow")
+        return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all().to_pandas()
+    
+    def merge(self, other: 'RollupCube', max_groups: int = ROLLUP_MAX_GROUPS) -> 'RollupCube':
+        """
+        Cube of both cubes' rows (e.g. a dataset and its appended rows)
+        
+        Keeps the metrics and rollups the two have in common.
+        """
+        metrics = [m for m in self.metrics if m in other.metrics]
+        others = {(tuple(r['dimensions']), r['time_dimension']): r for r in other.rollups}
+        
+        rollups = []
+        for rollup in self.rollups:
+            match = others.get((tuple(rollup['dimensions']), rollup['time_dimension']))
+            if match is None:
+                continue
+            names = _key_names(rollup)
+            stats_columns = [_stat(m, s) for m in metrics for s in STATISTICS] + [ROWS_COLUMN]
+            stacked = pd.concat(
+                [self.frame(rollup)[names + stats_columns], other.frame(match)[names + stats_columns]],
+                ignore_index=True
+            )
+            frame = merge_groups(stacked[stats_columns], [stacked[name] for name in names], metrics)
+            if len(frame) > max_groups:
+                continue
+            rollups.append({
+                'dimensions': rollup['dimensions'],
+                'time_dimension': rollup['time_dimension'],
+                'name': f"r{len(rollups)}",
+                'date_only': rollup['date_only'] and match['date_only'],
+                'groups': len(frame),
+                'frame': frame
+            })
+        
+        return RollupCube(metrics, rollups)
+    
+    def save(self, directory: str):
+        """
+        Write the cube as Arrow files plus a manifest
+        
+        Written to a temporary directory and moved into place, so readers
+        never see half a cube. A dataset version's cube is written once;
+        an existing one is left as it is.
+        """
+        if os.path.exists(directory):
+            return
+        tmp_dir = f"{directory}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(tmp_dir)
+        
+        try:
+            for rollup in self.rollups:
+                frame = self.frame(rollup)
+                object_cols = [col for col in frame.columns if frame[col].dtype == object]
+                if object_cols:
+                    frame = frame.astype({col: 'string' for col in object_cols})
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                with pa.OSFile(os.path.join(tmp_dir, f"{rollup['name']}.arrow"), 'wb') as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+            
+            with open(os.path.join(tmp_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+                json.dump({
+                    'metrics': self.metrics,
+                    'rollups': [{k: v for k, v in r.items() if k != 'frame'} for r in self.rollups]
+                }, f)
+            os.replace(tmp_dir, directory)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.exists(directory):
+                raise
+    
+    @classmethod
+    def load(cls, directory: str) -> Optional['RollupCube']:
+        """A saved cube, or None if the dataset version has none"""
+        try:
+            with open(os.path.join(directory, 'manifest.json'), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return cls(manifest['metrics'], manifest['rollups'], directory)
+    
+    @staticmethod
+    def _covers_filter(rollup: Dict[str, Any], f: Dict[str, Any]) -> bool:
+        if f['column'] in rollup['dimensions']:
+            return True
+        if f['column'] != rollup['time_dimension']:
+            return False
+        if rollup['date_only']:
+            return True
+        # Day groups only split exactly at midnight: value >= day / value < day
+        return f['op'] in ('gte', 'lt') and f['value'] == f['value'].normalize()
+    
+    def covering(self, plan: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The smallest rollup that answers a plan exactly, if any"""
+        if plan['metric'] not in self.metrics:
+            return None
+        
+        best = None
+        for rollup in self.rollups:
+            if plan['time_dimension'] is not None and plan['time_dimension'] != rollup['time_dimension']:
+                continue
+            if not set(plan['dimensions']) <= set(rollup['dimensions']):
+                continue
+            if not all(self._covers_filter(rollup, f) for f in plan['filters']):
+                continue
+            if best is None or rollup['groups'] < best['groups']:
+                best = rollup
+        return best
+    
+    def answer(self, plan: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Answer a compiled query plan from the smallest covering rollup
+        
+        Returns the same shape as SemanticQueryEngine.scan() with
+        'source': 'rollup', or None when no rollup covers the plan.
+        """
+        rollup = self.covering(plan)
+        if rollup is None:
+            return None
+        
+        if 'frame' in rollup:
+            columns = TypedColumns(rollup['frame'])
+        else:
+            # Stored rollups are immutable, so their path keys the column cache
+            path = os.path.join(self.directory, f"{rollup['name']}.arrow")
+            columns = TypedColumns(key=path, loader=partial(_read_column, path))
+        
+        metric = plan['metric']
+        names = [_stat(metric, s) for s in STATISTICS] + [ROWS_COLUMN]
+        positions = matching_rows(plan, columns)
+        keys = group_keys(plan, columns, positions)
+        stats = pd.DataFrame({name: take(columns.column(name), positions) for name in names})
+        
+        if not keys and len(stats) == 0:
+            # Nothing matched: one empty group, as a scan of no rows gives
+            stats = pd.DataFrame({name: [np.nan if name.endswith(('.min', '.max')) else 0] for name in names})
+        
+        merged = merge_groups(stats, keys, [metric])
+        result = merged.drop(columns=names)
+        result['value'] = finish(plan['aggregation'], merged, metric)
+        
+        return {
+            'result': result,
+            'rows_scanned': rollup['groups'],
+            'rows_matched': int(stats[ROWS_COLUMN].sum()),
+            'source': 'rollup'
+        }
@@ -16,6 +16,9 @@ import numpy as np
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
+from analytics.dates import default_time_grain
+from analytics.sketches import distinct_count
+
 class SemanticLayerEngine:
     """Detects metrics, dimensions, time fields automatically"""
     
@@ -122,6 +125,9 @@ class SemanticLayerEngine:
         - Should be low cardinality (<50 unique values)
         - Match dimension keywords
         - NOT numeric (unless it's a code)
+        
+        unique_count may be a HyperLogLog estimate on large columns;
+        at these bounds its error is a handful of values.
         """
         col_lower = column_name.lower()
         
@@ -143,6 +149,24 @@ class SemanticLayerEngine:
         
         return False
     
+    @staticmethod
+    def column_cardinality(profile: Dict[str, Any], df: Optional[pd.DataFrame] = None) -> int:
+        """
+        Distinct values of a profiled column
+        
+        Read from the profile statistics (exact, or a HyperLogLog estimate on
+        large columns); estimated from `df` by the same rule when missing.
+        """
+        stats = profile.get('statistics', {})
+        if 'unique_count' in stats:
+            return stats['unique_count']
+        
+        col_name = profile['column_name']
+        if df is not None and col_name in df.columns:
+            return distinct_count(df[col_name])[0]
+        
+        return 0
+    
     @staticmethod
     def is_likely_time_dimension(column_name: str, data_type: str) -> bool:
         """
@@ -166,13 +190,16 @@ class SemanticLayerEngine:
     @classmethod
     def generate_semantics(
         cls,
-        df: pd.DataFrame,
+        df: Optional[pd.DataFrame],
         profiles: List[Dict[str, Any]],
         dataset_row_count: int
     ) -> Dict[str, Any]:
         """
         Main method: Generate complete semantic model
         
+        Works from the column profiles alone, so `df` may be None
+        when the upload was streamed and never held in memory.
+        
         returns:
         {
             'metrics': [
@@ -197,7 +224,9 @@ class SemanticLayerEngine:
                 {
                     'column': 'order_date',
                     'business_name': 'Order Date',
-                    'hierarchy': ['year', 'month', 'day']
+                    'hierarchy': ['year', 'month', 'day'],
+                    'date_format': '%Y-%m-%d',
+                    'time_granularity': 'month'
                 }
             ]
         }
@@ -209,14 +238,20 @@ class SemanticLayerEngine:
         for profile in profiles:
             col_name = profile['column_name']
             data_type = profile['detected_type']
-            unique_count = profile['unique_count']
+            unique_count = cls.column_cardinality(profile, df)
             
             # Try time dimension first (highest priority)
             if cls.is_likely_time_dimension(col_name, data_type):
+                # Largest format cluster, so later parses skip format guessing
+                stats = profile.get('statistics', {})
+                date_formats = stats.get('date_formats') or [None]
                 time_dimensions.append({
                     'column': col_name,
                     'business_name': cls.humanize_name(col_name),
-                    'hierarchy': ['year', 'month', 'day']
+                    'hierarchy': ['year', 'month', 'day'],
+                    'date_format': date_formats[0],
+                    # Default drill level, from the profiled date range
+                    'time_granularity': default_time_grain(stats.get('earliest'), stats.get('latest'))
                 })
             
             # Then try metric
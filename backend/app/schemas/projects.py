@@ -49,11 +49,64 @@ class DatasetStatus(str, Enum):
     ERROR = "error"
 
 
+class UploadSessionCreateRequest(BaseModel):
+    """Start a resumable (chunked) upload"""
+    filename: str = Field(..., min_length=1, max_length=255)
+    total_size: Optional[int] = Field(None, ge=0)  # bytes; verified on finalize
+    sheet: Optional[str] = None  # Excel sheet to load
+    
+    class Config:
+        example = {
+            "filename": "transactions_2024.csv",
+            "total_size": 734003200
+        }
+
+
+class DuplicateScanRequest(BaseModel):
+    """Scan a stored dataset for duplicate (and near-duplicate) rows"""
+    key_columns: Optional[List[str]] = None  # compare only these columns
+    near_duplicates: bool = False  # also match text-heavy rows by MinHash similarity
+    threshold: float = Field(0.8, gt=0, le=1)  # similarity for near-duplicates
+    
+    class Config:
+        example = {
+            "key_columns": ["customer_id", "order_date"],
+            "near_duplicates": False
+        }
+
+
+class QueryFilter(BaseModel):
+    """One condition of a semantic query"""
+    column: str
+    op: str = "eq"  # eq, ne, in, not_in, gt, gte, lt, lte
+    value: Any = None  # a list for in / not_in
+
+
+class SemanticQueryRequest(BaseModel):
+    """Aggregate a metric by dimensions and/or a time grain"""
+    metric: str  # metric column; aggregated with its semantic aggregation
+    dimensions: List[str] = []
+    time_dimension: Optional[str] = None  # defaults to the first time dimension
+    time_grain: Optional[str] = None  # day, week, month, quarter, year
+    filters: List[QueryFilter] = []
+    order: str = "keys"  # keys, value_desc, value_asc
+    limit: int = Field(1000, ge=1)
+    
+    class Config:
+        example = {
+            "metric": "sales",
+            "dimensions": ["region"],
+            "time_grain": "month",
+            "filters": [{"column": "region", "op": "in", "value": ["North", "East"]}]
+        }
+
+
 class ColumnProfile(BaseModel):
     """Column-level profile (part of dataset profile response)"""
     column_name: str
     detected_type: str
     type_confidence: float
+    type_detection: Optional[Dict[str, Any]] = None  # method, sample_size, margin
     statistics: Dict[str, Any]
     issues: List[Dict[str, Any]]
 
@@ -123,6 +176,7 @@ class SemanticTimeDimensionResponse(BaseModel):
     column: str
     business_name: str
     hierarchy: List[str]  # [year, month, day]
+    time_granularity: str = "month"  # default drill level: day, week or month
 
 
 class SemanticLayerResponse(BaseModel):
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+CSV Loader Benchmark
+
+Compares single-core DataLoader.load_csv against the
+multi-core DataLoader.load_csv_parallel on a synthetic CSV.
+
+Usage:
+python benchmark_loader.py --rows 2000000 --workers 16
+
+The synthetic file mixes ints, floats, low-cardinality text,
+dates and quoted fields with embedded commas/newlines so the
+quote-aware splitter is exercised.
+"""
+
+import argparse
+import io
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from analytics.loader import DataLoader
+
+
+def make_csv(rows: int, seed: int = 0) -> bytes:
+    """Build a synthetic sales export"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'order_id': np.arange(rows),
+        'sales': rng.normal(1000, 250, rows).round(2),
+        'quantity': rng.integers(1, 20, rows),
+        'region': rng.choice(['North', 'South', 'East', 'West'], rows),
+        'order_date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, rows), unit='D'),
+        'note': np.where(rng.random(rows) < 0.01, 'urgent, "call back"\nASAP', 'ok')
+    })
+    return df.to_csv(index=False).encode('utf-8')
+
+
+def best_of(fn, repeat: int) -> float:
+    """Fastest wall-clock time of `repeat` runs"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel CSV parsing")
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    content = make_csv(args.rows)
+    print(f"CSV: {args.rows:,} rows, {len(content) / 1024 / 1024:.1f}MB, {args.workers} workers")
+    
+    single = best_of(lambda: pd.read_csv(io.BytesIO(content)), args.repeat)
+    parallel = best_of(lambda: DataLoader.load_csv_parallel(content, args.workers), args.repeat)
+    
+    # Results must be identical, not just fast
+    pd.testing.assert_frame_equal(
+        pd.read_csv(io.BytesIO(content)),
+        DataLoader.load_csv_parallel(content, args.workers)
+    )
+    
+    print(f"single-core : {single:.2f}s")
+    print(f"parallel    : {parallel:.2f}s")
+    print(f"speedup     : {single / parallel:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
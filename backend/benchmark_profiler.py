@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Profiler Benchmark
+
+Compares the per-column reference path
+(detect_column_type + detect_issues + calculate_statistics)
+against the fused DataProfiler.profile_column kernel, with
+full-scan and sampled type detection, then serial against
+process-pool profile_dataset.
+
+Usage:
+python benchmark_profiler.py --rows 2000000 --columns 200 --workers 16
+
+The synthetic frame cycles through numeric, numeric-with-nulls,
+categorical, text, date-string and mixed columns.
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.engines.profiler import DataProfiler
+
+
+def make_frame(rows: int, columns: int, seed: int = 0) -> pd.DataFrame:
+    """Build a wide synthetic frame"""
+    rng = np.random.default_rng(seed)
+    kinds = [
+        lambda: rng.normal(1000, 250, rows).round(2),
+        lambda: np.where(rng.random(rows) < 0.1, np.nan, rng.integers(0, 500, rows)),
+        lambda: rng.choice(['North', 'South', 'East', 'West'], rows),
+        lambda: np.char.add('id-', rng.integers(0, rows, rows).astype(str)),
+        lambda: (pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, rows), unit='D')).astype(str),
+        lambda: np.where(rng.random(rows) < 0.98, rng.integers(0, 9, rows).astype(str), 'n/a'),
+    ]
+    return pd.DataFrame({f'col_{i}': kinds[i % len(kinds)]() for i in range(columns)})
+
+
+def reference_profile(series: pd.Series):
+    """The original three-call path (full-scan type detection)"""
+    col_type, confidence = DataProfiler.detect_column_type(series, series.name, sample=False)
+    issues = DataProfiler.detect_issues(series, col_type)
+    stats = DataProfiler.calculate_statistics(series, col_type)
+    return col_type, round(confidence, 2), issues, stats
+
+
+def fused_profile(series: pd.Series, sample: bool):
+    profile = DataProfiler.profile_column(series, sample=sample)
+    return profile['detected_type'], profile['type_confidence'], profile['issues'], profile['statistics']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fused profiling kernel")
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--columns', type=int, default=24)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    
+    df = make_frame(args.rows, args.columns)
+    print(f"Frame: {args.rows:,} rows x {args.columns} columns")
+    
+    start = time.perf_counter()
+    reference = [reference_profile(df[col]) for col in df.columns]
+    reference_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    fused = [fused_profile(df[col], sample=False) for col in df.columns]
+    fused_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    sampled = [fused_profile(df[col], sample=True) for col in df.columns]
+    sampled_time = time.perf_counter() - start
+    
+    # Output must be identical, not just fast
+    assert repr(reference) == repr(fused), "fused kernel output differs"
+    
+    # Sampling may only move confidences within their bound, never the type
+    changed = [col for col, a, b in zip(df.columns, reference, sampled) if a[0] != b[0]]
+    
+    print(f"reference       : {reference_time:.2f}s")
+    print(f"fused           : {fused_time:.2f}s ({reference_time / fused_time:.2f}x)")
+    print(f"fused + sampled : {sampled_time:.2f}s ({reference_time / sampled_time:.2f}x)")
+    print(f"type changes    : {changed or 'none'}")
+    
+    start = time.perf_counter()
+    serial = DataProfiler.profile_dataset(df, workers=1)
+    serial_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    parallel = DataProfiler.profile_dataset(df, workers=args.workers)
+    parallel_time = time.perf_counter() - start
+    
+    for profile in (serial, parallel):
+        profile.pop('profile_timestamp')
+    assert repr(serial) == repr(parallel), "parallel profile differs"
+    
+    print(f"profile_dataset : {serial_time:.2f}s serial, {parallel_time:.2f}s on {args.workers} workers "
+          f"({serial_time / parallel_time:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
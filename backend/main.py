@@ -15,7 +15,16 @@ POST   /api/projects             - Create project
 GET    /api/projects             - List projects
 GET    /api/projects/{id}        - Get project
 DELETE /api/projects/{id}        - Delete project
-POST   /api/datasets/upload/{id} - Upload CSV/Excel
+POST   /api/datasets/sheets      - List Excel sheets
+POST   /api/datasets/upload/{id} - Upload CSV/Excel (?sheet= for Excel), processed in the background
+POST   /api/datasets/uploads/{id} - Start resumable upload
+PUT    /api/datasets/uploads/{upload_id}/chunks/{n} - Upload one chunk
+POST   /api/datasets/uploads/{upload_id}/finalize - Queue processing of uploaded chunks
+GET    /api/datasets/jobs/{job_id} - Poll upload job progress and result
+GET    /api/datasets/jobs/{job_id}/events - Subscribe to job progress (SSE)
+POST   /api/datasets/{id}/append - Append rows (profiles only the new rows)
+POST   /api/datasets/{id}/duplicates - Scan for duplicate / near-duplicate rows (background job)
+POST   /api/datasets/{id}/query - Aggregate a metric by dimensions / time grain
 GET    /api/datasets/{id}        - Get dataset with profiling
 """
 
@@ -25,6 +34,8 @@ from sqlalchemy.exc import SQLAlchemyError
 import logging
 
 from app.core.database import init_db
+from app.core.jobs import job_queue
+from app.core.upload_sessions import upload_sessions
 from app.api import auth, projects, datasets
 
 # Configure logging
@@ -63,6 +74,16 @@ async def startup():
     except Exception as e:
         logger.warning(f"⚠️ Database initialization failed (continuing without DB): {e}")
         logger.warning("The API will work with in-memory storage until database is available")
+    
+    # Uploads abandoned before the last restart; their jobs died with it
+    removed = upload_sessions.sweep(include_finalized=True)
+    if removed:
+        logger.info(f"Removed {removed} expired upload sessions")
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop the upload job workers (queued jobs are cancelled and their datasets released)"""
+    job_queue.shutdown()
 
 # Health check
 @app.get("/health")
@@ -0,0 +1,97 @@
+"""
+Execution backends: every backend answers a grid of plans like a scan of the in-memory frame
+"""
+import itertools
+import math
+
+import pytest
+
+from analytics.columns import TypedColumns
+from app.core.dataset_store import DatasetStore
+from app.engines.backends import BACKENDS, ExecutionBackend, create_backend
+from app.engines.profiler import DataProfiler
+from app.engines.query_engine import AGGREGATIONS, SemanticQueryEngine
+from app.engines.semantic_engine import SemanticLayerEngine
+from benchmark_backends import make_frame
+
+FILTERS = [
+    [],
+    [{'column': 'region', 'op': 'in', 'value': ['North', 'East']}],
+    [{'column': 'region', 'op': 'ne', 'value': 'West'}],
+    [{'column': 'channel', 'op': 'not_in', 'value': ['web']}],
+    [{'column': 'quantity', 'op': 'gte', 'value': 10}, {'column': 'sales', 'op': 'lt', 'value': 1100}],
+    [{'column': 'order_date', 'op': 'gte', 'value': '2023-06-01'}, {'column': 'order_date', 'op': 'lt', 'value': '2024-02-15'}],
+    [{'column': 'region', 'op': 'eq', 'value': 'Nowhere'}]
+]
+
+# (metric, dimensions, time grain): every grain and dimension set, both metric types
+SHAPES = [
+    ('sales', [], None),
+    ('quantity', ['region'], None),
+    ('sales', ['region', 'channel'], 'day'),
+    ('quantity', [], 'week'),
+    ('sales', ['region'], 'month'),
+    ('quantity', ['region', 'channel'], 'quarter'),
+    ('sales', ['channel'], 'year')
+]
+
+
+def same(a, b) -> bool:
+    """Result cells equal, floats up to summation order"""
+    if isinstance(a, float) or isinstance(b, float):
+        if a is None or b is None:
+            return a is None and b is None
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+    return a == b
+
+
+@pytest.fixture(scope='module')
+def dataset(tmp_path_factory):
+    df = make_frame(3_000)
+    store = DatasetStore(str(tmp_path_factory.mktemp('backends')))
+    path = store.write_frame(df, 1)
+    profile = DataProfiler.profile_dataset(df)
+    semantic = SemanticLayerEngine.generate_semantics(None, profile['columns'], len(df))
+    date_formats = {p['column_name']: p['statistics']['date_formats'] for p in profile['columns'] if p['detected_type'] == 'date'}
+    # The reference: the in-memory frame, dates parsed once for the whole grid
+    columns = TypedColumns(df, date_formats=date_formats)
+    return {'columns': columns, 'store': store, 'path': path, 'profiles': profile['columns'], 'semantic': semantic}
+
+
+@pytest.fixture(params=list(BACKENDS))
+def backend(request, dataset):
+    if request.param == 'duckdb':
+        pytest.importorskip('duckdb')
+    return create_backend(dataset['path'], dataset['store'], request.param)
+
+
+def test_unknown_backend_is_rejected(dataset):
+    with pytest.raises(ValueError):
+        create_backend(dataset['path'], dataset['store'], 'spark')
+    with pytest.raises(TypeError):
+        ExecutionBackend(dataset['path'], dataset['store'])
+
+
+@pytest.mark.parametrize('aggregation', list(AGGREGATIONS))
+def test_backend_matches_frame_scan(backend, dataset, aggregation):
+    mismatches = []
+    for (metric, dimensions, grain), filters in itertools.product(SHAPES, FILTERS):
+        plan = SemanticQueryEngine.compile(
+            dataset['semantic'], dataset['profiles'], metric, dimensions=dimensions, time_grain=grain, filters=filters
+        )
+        plan['aggregation'] = aggregation
+        expected = SemanticQueryEngine.execute(plan, dataset['columns'])
+        result = SemanticQueryEngine.execute(plan, backend=backend)
+        
+        if (
+            result['rows_scanned'] != expected['rows_scanned']
+            or result['rows_matched'] != expected['rows_matched']
+            or len(result['rows']) != len(expected['rows'])
+            or any(
+                row.keys() != want.keys() or not all(same(row[k], want[k]) for k in row)
+                for row, want in zip(result['rows'], expected['rows'])
+            )
+        ):
+            mismatches.append((metric, dimensions, grain, filters))
+    
+    assert not mismatches
@@ -0,0 +1,100 @@
+"""
+Date formats: cluster inference, vectorized parsing and grain truncation
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.dates import TIME_GRAINS, default_time_grain, infer_date_formats, parse_dates, truncate_dates
+
+
+def _days(n: int, seed: int = 0) -> pd.DatetimeIndex:
+    rng = np.random.default_rng(seed)
+    return pd.Timestamp('2022-01-01') + pd.to_timedelta(rng.integers(0, 1_000, n), unit='D')
+
+
+def _mixed(n: int, shares: dict, seed: int = 0):
+    """Dates written in several formats, shuffled; returns (text, timestamps)"""
+    rng = np.random.default_rng(seed)
+    days = _days(n, seed)
+    formats = rng.choice(list(shares), n, p=list(shares.values()))
+    text = [day.strftime(fmt) for day, fmt in zip(days, formats)]
+    return pd.Series(text), pd.Series(days)
+
+
+def test_infer_clusters_largest_first():
+    text, _ = _mixed(20_000, {'%d/%m/%Y': 0.7, '%Y-%m-%d': 0.3})
+    
+    assert infer_date_formats(text) == ['%d/%m/%Y', '%Y-%m-%d']
+
+
+def test_infer_finds_a_rare_format_beyond_the_probe():
+    text, _ = _mixed(20_000, {'%Y-%m-%d': 0.97, '%d %b %Y': 0.03}, seed=1)
+    
+    assert infer_date_formats(text) == ['%Y-%m-%d', '%d %b %Y']
+
+
+def test_infer_breaks_ties_month_first():
+    # Every day <= 12 reads both ways; pandas reads month first too
+    text = pd.Series([f'{m:02d}/{d:02d}/2024' for m in range(1, 13) for d in range(1, 13)])
+    
+    assert infer_date_formats(text)[0] == '%m/%d/%Y'
+
+
+@pytest.mark.parametrize('values', [
+    pd.Series(['North', 'South', None] * 100),
+    pd.Series(['12.5', '7', 'abc'] * 100),
+    pd.Series(np.arange(300)),
+    pd.Series([None, None], dtype=object)
+])
+def test_infer_rejects_non_dates(values):
+    assert infer_date_formats(values) == []
+
+
+def test_parse_dates_with_clusters():
+    text, days = _mixed(10_000, {'%d/%m/%Y': 0.5, '%Y-%m-%d': 0.3, '%d %b %Y': 0.2}, seed=2)
+    text[::100] = 'n/a'
+    text[1::100] = None
+    
+    parsed = parse_dates(text)
+    expected = days.where(text.notna() & (text != 'n/a'))
+    assert parsed.equals(expected)
+
+
+def test_parse_dates_raises_on_unparsed_values():
+    with pytest.raises(ValueError):
+        parse_dates(pd.Series(['2024-01-05', 'soon']), formats=['%Y-%m-%d'], errors='raise')
+    with pytest.raises(ValueError):
+        parse_dates(pd.Series(['soon', 'later']), errors='raise')
+
+
+def test_parse_dates_normalises_offsets_to_utc():
+    parsed = parse_dates(pd.Series(['2024-03-01T10:00:00+02:00', '2024-03-01T10:00:00Z']), formats=['ISO8601'])
+    
+    assert parsed.tolist() == [pd.Timestamp('2024-03-01 08:00'), pd.Timestamp('2024-03-01 10:00')]
+
+
+@pytest.mark.parametrize('grain, period', [('day', 'D'), ('week', 'W-SUN'), ('month', 'M'), ('quarter', 'Q'), ('year', 'Y')])
+def test_truncate_dates_matches_periods(grain, period):
+    stamps = pd.Series(_days(5_000, seed=3) + pd.to_timedelta(np.arange(5_000) % 86_400, unit='s'))
+    stamps[::97] = pd.NaT
+    
+    truncated = truncate_dates(stamps, grain)
+    expected = stamps.dt.to_period(period).dt.start_time
+    assert truncated.equals(expected)
+
+
+def test_truncate_dates_rejects_unknown_grain():
+    assert 'hour' not in TIME_GRAINS
+    with pytest.raises(ValueError):
+        truncate_dates(pd.Series(pd.to_datetime(['2024-01-01'])), 'hour')
+
+
+@pytest.mark.parametrize('earliest, latest, grain', [
+    ('2020-01-01', '2024-01-01', 'month'),
+    ('2024-01-01', '2024-06-01', 'week'),
+    ('2024-01-01', '2024-01-20', 'day'),
+    (None, '2024-01-01', 'month')
+])
+def test_default_time_grain(earliest, latest, grain):
+    assert default_time_grain(earliest, latest) == grain
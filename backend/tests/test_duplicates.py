@@ -0,0 +1,112 @@
+"""
+Duplicate rows: exact row hashes, key subsets, MinHash near-duplicates, chunking
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.engines import duplicates
+from app.engines.duplicates import DUPLICATE_EXAMPLES, DuplicateRowDetector
+
+
+def _orders(n: int, seed: int = 0) -> pd.DataFrame:
+    """Orders with about a tenth of the rows repeated"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'customer': rng.integers(0, 5_000, n),
+        'region': rng.choice(['North', 'South', 'East', None], n),
+        'amount': rng.integers(1, 100, n) * 0.5
+    })
+    copies = rng.integers(0, n, n // 10)
+    return pd.concat([df, df.iloc[copies]], ignore_index=True).sample(frac=1, random_state=seed, ignore_index=True)
+
+
+def _duplicate_issue(issues):
+    return next(issue for issue in issues if issue['type'] == 'duplicate_rows')
+
+
+def test_exact_duplicates_match_pandas():
+    df = _orders(20_000)
+    issue = _duplicate_issue(DuplicateRowDetector.detect(df))
+    expected = df.duplicated()
+    
+    assert issue['count'] == expected.sum()
+    assert issue['examples'] == np.flatnonzero(expected)[:DUPLICATE_EXAMPLES].tolist()
+    assert 'approximate' not in issue
+
+
+def test_key_columns_compare_only_the_subset():
+    df = _orders(20_000)
+    issue = _duplicate_issue(DuplicateRowDetector.detect(df, key_columns=['customer', 'region']))
+    
+    assert issue['count'] == df.duplicated(subset=['customer', 'region']).sum()
+    assert issue['columns'] == ['customer', 'region']
+    assert 'customer, region' in issue['message']
+
+
+@pytest.mark.parametrize('chunk_rows', [1_000, 7_777, 100_000])
+def test_chunked_equals_one_pass(chunk_rows):
+    df = _orders(20_000, seed=1)
+    
+    assert DuplicateRowDetector.detect(df, chunk_rows=chunk_rows) == DuplicateRowDetector.detect(df, chunk_rows=len(df))
+
+
+def test_integer_and_float_chunks_hash_alike():
+    ints = pd.DataFrame({'id': [1, 2, 3], 'name': ['a', 'b', 'c']})
+    floats = ints.astype({'id': 'float64'})
+    detector = DuplicateRowDetector()
+    detector.update(ints)
+    detector.update(floats)
+    
+    assert detector.duplicate_issue()['count'] == 3
+    assert detector.duplicate_issue()['examples'] == [3, 4, 5]
+
+
+def test_unique_rows_have_no_issues():
+    df = pd.DataFrame({'id': np.arange(10_000), 'name': [f'customer {i}' for i in range(10_000)]})
+    
+    assert DuplicateRowDetector.detect(df, near_duplicates=True) == []
+
+
+def test_large_inputs_switch_to_an_estimate(monkeypatch):
+    monkeypatch.setattr(duplicates, 'DISTINCT_APPROX_MIN_ROWS', 50_000)
+    df = _orders(150_000, seed=2)
+    issue = _duplicate_issue(DuplicateRowDetector.detect(df, chunk_rows=20_000))
+    expected = int(df.duplicated().sum())
+    
+    assert issue['approximate'] is True
+    assert abs(issue['count'] - expected) <= 0.02 * len(df)
+
+
+def _reviews(n: int, seed: int = 0) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f'word{i}' for i in range(2_000)])
+    return pd.Series([' '.join(rng.choice(vocabulary, 20, replace=False)) for _ in range(n)])
+
+
+def test_near_duplicates_found_and_exact_copies_left_out():
+    text = _reviews(2_000)
+    edited = text.iloc[:50].str.replace(r'^\w+', 'changed', regex=True)
+    df = pd.DataFrame({'review': pd.concat([text, edited, text.iloc[100:110]], ignore_index=True)})
+    
+    issues = DuplicateRowDetector.detect(df, near_duplicates=True)
+    near = next(issue for issue in issues if issue['type'] == 'near_duplicate_rows')
+    
+    # One word of twenty changed: Jaccard 19/21, both rows of each pair count
+    assert abs(near['count'] - 100) <= 10
+    assert near['examples'][0] == 0
+    assert 'approximate' not in near
+    assert _duplicate_issue(issues)['count'] == 10
+
+
+def test_near_duplicate_sample_scales_counts():
+    text = _reviews(4_000, seed=1)
+    edited = text.iloc[:400].str.replace(r'^\w+', 'changed', regex=True)
+    df = pd.DataFrame({'review': pd.concat([text, edited], ignore_index=True)})
+    
+    issues = DuplicateRowDetector.detect(df, chunk_rows=1_000, near_duplicates=True, sample_rows=2_000)
+    near = issues[0]
+    
+    assert near['type'] == 'near_duplicate_rows'
+    assert near['approximate'] is True and near['sample_size'] == 2_000
+    assert abs(near['count'] - 800) <= 200
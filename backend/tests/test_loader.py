@@ -0,0 +1,77 @@
+"""
+CSV loading: quote-aware range splitting and the parallel parse
+"""
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.loader import DataLoader, split_csv_ranges
+
+
+def _csv(rows: int, seed: int = 0) -> bytes:
+    """CSV with quoted fields holding newlines, commas and escaped quotes"""
+    rng = np.random.default_rng(seed)
+    notes = np.array(['plain', 'has, comma', 'two\nlines', 'say ""hi""\nthen go', ''])
+    lines = ['id,amount,note,code']
+    for i in range(rows):
+        note = notes[rng.integers(0, len(notes))]
+        lines.append(f'{i},{rng.normal(100, 30):.2f},"{note}",{rng.integers(0, 1000)}')
+    return ('\n'.join(lines) + '\n').encode()
+
+
+@pytest.mark.parametrize('parts', [1, 2, 7, 50])
+def test_split_ranges_cover_the_body_at_record_boundaries(parts):
+    content = _csv(2_000)
+    header_end, ranges = split_csv_ranges(content, parts)
+    
+    assert content[:header_end] == b'id,amount,note,code\n'
+    assert ranges[0][0] == header_end and ranges[-1][1] == len(content)
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    assert len(ranges) <= parts + 1
+    
+    # Each range parses on its own to exactly its slice of the rows
+    expected = pd.read_csv(io.BytesIO(content))
+    parsed = [pd.read_csv(io.BytesIO(content[:header_end] + content[start:end])) for start, end in ranges]
+    assert pd.concat(parsed, ignore_index=True).equals(expected)
+
+
+def test_split_ranges_without_trailing_newline():
+    content = b'a,b\n1,"x\ny"\n2,z\n3,"w"'
+    header_end, ranges = split_csv_ranges(content, 3)
+    
+    assert ranges[-1][1] == len(content)
+    bodies = [content[start:end] for start, end in ranges]
+    assert b''.join(bodies) == content[header_end:]
+    assert all(body.count(b'"') % 2 == 0 for body in bodies)
+
+
+def test_split_more_parts_than_rows():
+    content = b'a\n1\n2\n'
+    header_end, ranges = split_csv_ranges(content, 10)
+    
+    assert [content[start:end] for start, end in ranges] == [b'1\n', b'2\n']
+
+
+def test_parallel_load_equals_single_parse():
+    content = _csv(20_000, seed=1)
+    
+    parallel = DataLoader.load_csv_parallel(content, workers=4)
+    assert parallel.equals(pd.read_csv(io.BytesIO(content)))
+
+
+def test_parallel_load_reconciles_dtypes_across_ranges():
+    # 'code' is numeric in the first half and text in the second;
+    # 'amount' is integer in the first half and float in the second
+    rows = ['code,amount']
+    rows += [f'{i:05d},{i}' for i in range(5_000)]
+    rows += [f'X{i},{i}.5' for i in range(5_000)]
+    content = ('\n'.join(rows) + '\n').encode()
+    
+    parallel = DataLoader.load_csv_parallel(content, workers=4)
+    single = pd.read_csv(io.BytesIO(content))
+    
+    assert parallel.equals(single)
+    assert parallel['code'].iloc[0] == '00000'
+    assert parallel['amount'].dtype == 'float64'
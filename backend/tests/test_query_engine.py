@@ -0,0 +1,145 @@
+"""
+Semantic queries: plan validation and grouped answers against plain pandas
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.columns import TypedColumns
+from app.engines.query_engine import QueryError, SemanticQueryEngine
+
+SEMANTIC = {
+    'metrics': [
+        {'column': 'sales', 'aggregation': 'sum', 'business_name': 'Revenue'},
+        {'column': 'price', 'aggregation': 'avg'},
+        {'column': 'notes', 'aggregation': 'median'}
+    ],
+    'dimensions': [{'column': 'region'}, {'column': 'channel'}],
+    'time_dimensions': [{'column': 'order_date'}]
+}
+
+PROFILES = [
+    {'column_name': 'sales', 'detected_type': 'numeric'},
+    {'column_name': 'price', 'detected_type': 'numeric'},
+    {'column_name': 'region', 'detected_type': 'categorical'},
+    {'column_name': 'channel', 'detected_type': 'categorical'},
+    {'column_name': 'notes', 'detected_type': 'text'},
+    {'column_name': 'order_date', 'detected_type': 'date', 'statistics': {'date_formats': ['%d/%m/%Y']}}
+]
+
+
+@pytest.fixture(scope='module')
+def frame():
+    rng = np.random.default_rng(0)
+    n = 5_000
+    days = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 400, n), unit='D')
+    return pd.DataFrame({
+        'sales': np.where(rng.random(n) < 0.05, np.nan, rng.normal(100, 20, n).round(2)),
+        'price': rng.integers(1, 50, n),
+        'region': np.where(rng.random(n) < 0.03, None, rng.choice(['North', 'South', 'East'], n)),
+        'channel': rng.choice(['web', 'store'], n),
+        'notes': 'n/a',
+        'order_date': np.where(rng.random(n) < 0.02, 'unknown', days.strftime('%d/%m/%Y'))
+    })
+
+
+def _run(frame, **query):
+    plan = SemanticQueryEngine.compile(SEMANTIC, PROFILES, **query)
+    return plan, SemanticQueryEngine.execute(plan, TypedColumns(frame, date_formats=plan['date_formats']))
+
+
+def test_compile_resolves_defaults():
+    plan = SemanticQueryEngine.compile(SEMANTIC, PROFILES, 'sales', dimensions=['region', 'region'], time_grain='week')
+    
+    assert plan['aggregation'] == 'sum' and plan['business_name'] == 'Revenue'
+    assert plan['dimensions'] == ['region']
+    assert (plan['time_dimension'], plan['time_grain']) == ('order_date', 'week')
+    assert plan['date_formats'] == {'order_date': ['%d/%m/%Y']}
+    assert SemanticQueryEngine.compile(SEMANTIC, PROFILES, 'sales', time_dimension='order_date')['time_grain'] == 'month'
+
+
+@pytest.mark.parametrize('query', [
+    {'metric': 'region'},
+    {'metric': 'notes'},
+    {'metric': 'sales', 'dimensions': ['notes']},
+    {'metric': 'sales', 'time_dimension': 'region'},
+    {'metric': 'sales', 'time_grain': 'hour'},
+    {'metric': 'sales', 'filters': [{'column': 'missing', 'value': 1}]},
+    {'metric': 'sales', 'filters': [{'column': 'region', 'op': 'like', 'value': 'N'}]},
+    {'metric': 'sales', 'filters': [{'column': 'region', 'op': 'gt', 'value': 'N'}]},
+    {'metric': 'sales', 'filters': [{'column': 'region', 'op': 'in', 'value': 'North'}]},
+    {'metric': 'sales', 'filters': [{'column': 'price', 'op': 'gt', 'value': 'cheap'}]},
+    {'metric': 'sales', 'filters': [{'column': 'order_date', 'op': 'gte', 'value': 'someday'}]},
+    {'metric': 'sales', 'order': 'random'}
+])
+def test_compile_rejects_what_the_layer_cannot_answer(query):
+    with pytest.raises(QueryError):
+        SemanticQueryEngine.compile(SEMANTIC, PROFILES, **query)
+
+
+def test_total_without_groups(frame):
+    _, result = _run(frame, metric='price')
+    
+    assert result['rows'] == [{'value': pytest.approx(frame['price'].mean())}]
+    assert result['rows_scanned'] == result['rows_matched'] == len(frame)
+    assert result['source'] == 'scan'
+
+
+def test_grouped_by_dimensions_and_month(frame):
+    _, result = _run(frame, metric='sales', dimensions=['region', 'channel'], time_grain='month')
+    
+    dated = pd.to_datetime(frame['order_date'], format='%d/%m/%Y', errors='coerce')
+    expected = frame['sales'].groupby(
+        [frame['region'], frame['channel'], dated.dt.to_period('M').dt.start_time], dropna=False, sort=True
+    ).sum()
+    got = {(r['region'], r['channel'], r['order_date']): r['value'] for r in result['rows']}
+    want = {
+        (None if pd.isna(region) else region, channel, None if pd.isna(month) else month.isoformat()): value
+        for (region, channel, month), value in expected.items()
+    }
+    
+    assert got == pytest.approx(want)
+    assert result['time_dimension'] == {'column': 'order_date', 'grain': 'month'}
+    # Keys ascending, missing keys last
+    assert [r['region'] for r in result['rows']][-1] is None
+    assert result['rows'][0]['order_date'] == '2023-01-01T00:00:00'
+
+
+def test_filters_combine(frame):
+    filters = [
+        {'column': 'region', 'op': 'in', 'value': ['North', 'East']},
+        {'column': 'price', 'op': 'gte', 'value': 10},
+        {'column': 'order_date', 'op': 'lt', 'value': '2023-07-01'},
+        {'column': 'channel', 'op': 'ne', 'value': 'web'}
+    ]
+    _, result = _run(frame, metric='sales', dimensions=['region'], filters=filters)
+    
+    dated = pd.to_datetime(frame['order_date'], format='%d/%m/%Y', errors='coerce')
+    mask = (
+        frame['region'].isin(['North', 'East']) & (frame['price'] >= 10)
+        & (dated < '2023-07-01') & (frame['channel'] != 'web')
+    )
+    expected = frame[mask].groupby('region')['sales'].sum()
+    
+    assert result['rows_matched'] == mask.sum()
+    assert {r['region']: r['value'] for r in result['rows']} == pytest.approx(expected.to_dict())
+
+
+def test_null_values_never_pass_filters(frame):
+    _, result = _run(frame, metric='price', filters=[{'column': 'region', 'op': 'not_in', 'value': ['North']}])
+    
+    assert result['rows_matched'] == (frame['region'].notna() & (frame['region'] != 'North')).sum()
+
+
+def test_order_by_value_and_limit(frame):
+    _, result = _run(frame, metric='sales', dimensions=['region'], order='value_desc', limit=2)
+    
+    totals = frame.groupby('region', dropna=False)['sales'].sum().sort_values(ascending=False)
+    assert [r['value'] for r in result['rows']] == pytest.approx(totals.iloc[:2].tolist())
+    assert result['row_count'] == len(totals) and result['truncated'] is True
+
+
+def test_empty_match(frame):
+    _, result = _run(frame, metric='sales', dimensions=['region'], filters=[{'column': 'region', 'value': 'Nowhere'}])
+    
+    assert result['rows'] == [] and result['rows_matched'] == 0 and result['truncated'] is False
@@ -0,0 +1,151 @@
+"""
+Rollup cube: answers of covered plans equal a scan of the raw rows
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.columns import TypedColumns
+from app.engines.profiler import DataProfiler
+from app.engines.query_engine import AGGREGATIONS, SemanticQueryEngine
+from app.engines.rollups import RollupCube
+from app.engines.semantic_engine import SemanticLayerEngine
+
+
+def _sales(n: int, seed: int = 0, times: bool = False) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    stamps = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 730, n), unit='D')
+    if times:
+        stamps += pd.to_timedelta(rng.integers(0, 24, n), unit='h')
+    return pd.DataFrame({
+        'sales': np.where(rng.random(n) < 0.05, np.nan, rng.normal(1000, 200, n).round(2)),
+        'quantity': rng.integers(0, 50, n),
+        'region': np.where(rng.random(n) < 0.02, None, rng.choice(['North', 'South', 'East', 'West'], n)),
+        'channel': rng.choice(['web', 'store', 'phone'], n),
+        'order_date': stamps.strftime('%d/%m/%Y %H:%M' if times else '%d/%m/%Y')
+    })
+
+
+def _layer(df: pd.DataFrame):
+    profiles = DataProfiler.profile_dataset(df)['columns']
+    semantic = SemanticLayerEngine.generate_semantics(None, profiles, len(df))
+    formats = {p['column_name']: p['statistics']['date_formats'] for p in profiles if p['detected_type'] == 'date'}
+    return profiles, semantic, formats
+
+
+def _cube(df: pd.DataFrame, semantic, formats, **kwargs) -> RollupCube:
+    return RollupCube.build(TypedColumns(df, date_formats=formats), *RollupCube.plan(semantic), **kwargs)
+
+
+def _assert_same_answer(cube: RollupCube, plan, columns: TypedColumns):
+    rolled = SemanticQueryEngine.execute(plan, cube=cube)
+    scanned = SemanticQueryEngine.execute(plan, columns)
+    
+    assert rolled['source'] == 'rollup'
+    assert rolled['rows_matched'] == scanned['rows_matched']
+    assert len(rolled['rows']) == len(scanned['rows'])
+    for got, want in zip(rolled['rows'], scanned['rows']):
+        assert got.keys() == want.keys()
+        assert {k: v for k, v in got.items() if k != 'value'} == {k: v for k, v in want.items() if k != 'value'}
+        assert got['value'] == pytest.approx(want['value'], rel=1e-9, abs=1e-9, nan_ok=True)
+
+
+COVERED_FILTERS = [
+    [],
+    [{'column': 'region', 'op': 'in', 'value': ['North', 'East']}],
+    [{'column': 'order_date', 'op': 'gte', 'value': '2023-06-01'}, {'column': 'order_date', 'op': 'lt', 'value': '2024-02-15'}],
+    [{'column': 'channel', 'op': 'eq', 'value': 'Nowhere'}]
+]
+
+
+@pytest.fixture(scope='module')
+def sales():
+    df = _sales(20_000)
+    profiles, semantic, formats = _layer(df)
+    columns = TypedColumns(df, date_formats=formats)
+    return {'df': df, 'profiles': profiles, 'semantic': semantic, 'formats': formats, 'columns': columns}
+
+
+@pytest.fixture(scope='module')
+def saved_cube(sales, tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp('rollups') / 'cube')
+    _cube(sales['df'], sales['semantic'], sales['formats']).save(directory)
+    return RollupCube.load(directory)
+
+
+def test_plan_lists_finest_rollups_first(sales):
+    metrics, specs = RollupCube.plan(sales['semantic'])
+    
+    assert set(metrics) == {'sales', 'quantity'}
+    assert specs[0] == {'dimensions': ['region'], 'time_dimension': 'order_date'}
+    assert specs[-1] == {'dimensions': [], 'time_dimension': None}
+    assert len(specs) == 6
+
+
+@pytest.mark.parametrize('aggregation', list(AGGREGATIONS))
+def test_saved_cube_answers_like_a_scan(sales, saved_cube, aggregation):
+    for metric, dimensions, grain, filters in itertools.product(
+        ['sales', 'quantity'], [[], ['region'], ['channel']], [None, 'day', 'week', 'year'], COVERED_FILTERS
+    ):
+        if len(set(dimensions) | {f['column'] for f in filters} - {'order_date'}) > 1:
+            continue  # needs a two-dimension rollup
+        plan = SemanticQueryEngine.compile(
+            sales['semantic'], sales['profiles'], metric, dimensions=dimensions, time_grain=grain, filters=filters
+        )
+        plan['aggregation'] = aggregation
+        _assert_same_answer(saved_cube, plan, sales['columns'])
+
+
+@pytest.mark.parametrize('query', [
+    {'dimensions': ['region', 'channel']},
+    {'filters': [{'column': 'quantity', 'op': 'gt', 'value': 3}]},
+    {'dimensions': ['region'], 'filters': [{'column': 'channel', 'op': 'eq', 'value': 'web'}]}
+])
+def test_uncovered_plans_fall_back_to_a_scan(sales, saved_cube, query):
+    plan = SemanticQueryEngine.compile(sales['semantic'], sales['profiles'], 'sales', **query)
+    
+    assert saved_cube.answer(plan) is None
+    result = SemanticQueryEngine.execute(plan, sales['columns'], cube=saved_cube)
+    assert result['source'] == 'scan'
+
+
+def test_times_of_day_only_split_at_midnight():
+    df = _sales(20_000, seed=1, times=True)
+    profiles, semantic, formats = _layer(df)
+    cube = _cube(df, semantic, formats)
+    columns = TypedColumns(df, date_formats=formats)
+    
+    assert not any(r['date_only'] for r in cube.rollups if r['time_dimension'] is not None)
+    midnight = SemanticQueryEngine.compile(
+        semantic, profiles, 'sales', time_grain='month', filters=[{'column': 'order_date', 'op': 'gte', 'value': '2023-06-01'}]
+    )
+    _assert_same_answer(cube, midnight, columns)
+    noon = SemanticQueryEngine.compile(
+        semantic, profiles, 'sales', filters=[{'column': 'order_date', 'op': 'gte', 'value': '2023-06-01 12:00'}]
+    )
+    assert cube.answer(noon) is None
+
+
+def test_merged_cubes_answer_like_a_scan_of_both(sales):
+    extra = _sales(5_000, seed=2)
+    cube = _cube(sales['df'], sales['semantic'], sales['formats']).merge(
+        _cube(extra, sales['semantic'], sales['formats'])
+    )
+    both = pd.concat([sales['df'], extra], ignore_index=True)
+    columns = TypedColumns(both, date_formats=sales['formats'])
+    
+    for aggregation, grain in itertools.product(AGGREGATIONS, [None, 'month']):
+        plan = SemanticQueryEngine.compile(sales['semantic'], sales['profiles'], 'sales', dimensions=['region'], time_grain=grain)
+        plan['aggregation'] = aggregation
+        _assert_same_answer(cube, plan, columns)
+
+
+def test_rollups_over_max_groups_are_left_out(sales):
+    cube = _cube(sales['df'], sales['semantic'], sales['formats'], max_groups=1_000)
+    
+    assert all(r['groups'] <= 1_000 for r in cube.rollups)
+    assert {(tuple(r['dimensions']), r['time_dimension']) for r in cube.rollups} == {
+        ((), None), (('region',), None), (('channel',), None), ((), 'order_date')
+    }
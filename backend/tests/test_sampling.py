@@ -0,0 +1,120 @@
+"""
+Sampled type detection: stratified samples, confidence bounds, distinct estimates
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.sampling import estimate_distinct, sample_ratio, stratified_positions, wilson_interval
+from app.engines.profiler import DataProfiler
+
+
+def _numbers_as_text(n: int, seed: int = 0) -> pd.Series:
+    return pd.Series(np.random.default_rng(seed).normal(50, 10, n).round(3).astype(str))
+
+
+def test_stratified_positions_take_one_per_stratum():
+    positions = stratified_positions(100_000, 1_000, np.random.default_rng(0))
+    
+    assert len(np.unique(positions)) == 1_000
+    assert np.array_equal(np.sort(positions) // 100, np.arange(1_000))
+    # Shuffled: the first tenth already spreads over the whole range
+    assert np.ptp(positions[:100]) > 50_000
+
+
+def test_stratified_positions_whole_range_when_small():
+    positions = stratified_positions(50, 200, np.random.default_rng(0))
+    
+    assert np.array_equal(np.sort(positions), np.arange(50))
+
+
+@pytest.mark.parametrize('successes, trials', [(0, 100), (37, 100), (100, 100), (990, 1_000)])
+def test_wilson_interval_brackets_the_ratio(successes, trials):
+    low, high = wilson_interval(successes, trials)
+    more_low, more_high = wilson_interval(successes * 10, trials * 10)
+    
+    assert 0.0 <= low <= successes / trials + 1e-12
+    assert successes / trials <= high + 1e-12 and high <= 1.0
+    # Ten times the trials, a tighter interval
+    assert more_high - more_low < high - low
+
+
+def test_sample_ratio_stops_early_when_decisive():
+    values = pd.Series(np.arange(200_000))
+    result = sample_ratio(values, lambda v: v >= 0, 0.95, np.random.default_rng(0))
+    
+    assert result['above'] is True
+    assert result['ratio'] == 1.0
+    assert result['sample_size'] == 256
+
+
+def test_sample_ratio_is_exact_on_small_columns():
+    values = pd.Series(np.arange(1_000))
+    result = sample_ratio(values, lambda v: v < 960, 0.95, np.random.default_rng(0))
+    
+    assert result == {'above': True, 'ratio': 0.96, 'margin': 0.0, 'sample_size': 1_000}
+
+
+def test_sample_ratio_leaves_close_calls_undecided():
+    values = pd.Series(np.arange(100_000))
+    result = sample_ratio(values, lambda v: v % 100 < 95, 0.95, np.random.default_rng(0))
+    
+    assert result['above'] is None
+    assert result['sample_size'] == 16_384
+    assert abs(result['ratio'] - 0.95) <= result['margin']
+
+
+def test_classify_numeric_text_from_a_sample():
+    result = DataProfiler.classify_column(_numbers_as_text(200_000))
+    
+    assert result['type'] == 'numeric'
+    assert result['method'] == 'sample'
+    assert result['sample_size'] < 200_000
+    assert result['confidence'] == 1.0
+
+
+def test_classify_tolerates_a_little_junk():
+    values = _numbers_as_text(100_000)
+    values[::50] = 'n/a'
+    result = DataProfiler.classify_column(values)
+    
+    assert result['type'] == 'numeric'
+    assert abs(result['confidence'] - 0.98) <= result['margin'] + 0.01
+
+
+def test_classify_sees_a_block_of_text_at_the_end():
+    # Sorted files put their outliers together; stratification still samples them
+    values = pd.concat([_numbers_as_text(90_000), pd.Series([f'note {i % 500}' for i in range(10_000)])])
+    sampled = DataProfiler.classify_column(values.reset_index(drop=True))
+    full = DataProfiler.classify_column(values.reset_index(drop=True), sample=False)
+    
+    assert full['type'] == 'text' and full['method'] == 'full'
+    assert sampled['type'] == full['type']
+    assert sampled['sample_size'] < len(values)
+
+
+def test_classify_dates_and_categories():
+    days = pd.Timestamp('2024-01-01') + pd.to_timedelta(np.arange(50_000) % 365, unit='D')
+    dates = DataProfiler.classify_column(pd.Series(days.strftime('%d/%m/%Y')))
+    regions = DataProfiler.classify_column(pd.Series(['North', 'South', 'East', 'West'] * 5_000))
+    
+    assert dates['type'] == 'date' and dates['date_formats'] == ['%d/%m/%Y']
+    assert regions['type'] == 'categorical' and regions['confidence'] == 1.0
+
+
+def test_classify_small_columns_in_full():
+    result = DataProfiler.classify_column(pd.Series(['1', '2', 'x', None]))
+    
+    assert result['method'] == 'full'
+    assert result['sample_size'] == 3
+
+
+def test_estimate_distinct():
+    rng = np.random.default_rng(0)
+    keys = pd.Series(np.arange(1_000_000))
+    few = pd.Series(rng.integers(0, 20, 1_000_000))
+    sample = stratified_positions(1_000_000, 10_000, rng)
+    
+    assert estimate_distinct(keys.iloc[sample], 1_000_000) == 1_000_000
+    assert estimate_distinct(few.iloc[sample], 1_000_000) == 20
+    assert estimate_distinct(few.iloc[:500], 500) == few.iloc[:500].nunique()
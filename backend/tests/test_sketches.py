@@ -0,0 +1,237 @@
+"""
+Probabilistic sketches: error bounds, merging and persisted state
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.sketches import HyperLogLog, QuantileSketch, TopKSketch, distinct_count, duplicate_count
+
+
+def _ids(n: int, offset: int = 0) -> pd.Series:
+    return pd.Series([f"id-{i}" for i in range(offset, offset + n)])
+
+
+@pytest.mark.parametrize('n', [50, 5_000, 300_000])
+def test_hyperloglog_within_error_bound(n):
+    sketch = HyperLogLog(error=0.01)
+    sketch.update(_ids(n))
+    
+    assert sketch.relative_error <= 0.01
+    assert abs(sketch.count() - n) <= max(4 * sketch.relative_error * n, 2)
+
+
+def test_hyperloglog_ignores_repeats_and_nulls():
+    once = HyperLogLog()
+    once.update(_ids(20_000))
+    repeated = HyperLogLog()
+    repeated.update(pd.concat([_ids(20_000), _ids(20_000), pd.Series([None] * 100)]))
+    
+    assert np.array_equal(once.registers, repeated.registers)
+
+
+def test_hyperloglog_hashes_equal_numbers_alike():
+    ints = HyperLogLog()
+    ints.update(pd.Series([1, 2, 3, 0]))
+    floats = HyperLogLog()
+    floats.update(pd.Series([1.0, 2.0, 3.0, -0.0]))
+    
+    assert np.array_equal(ints.registers, floats.registers)
+
+
+def test_hyperloglog_merge_equals_single_pass():
+    values = _ids(100_000)
+    whole = HyperLogLog()
+    whole.update(values)
+    
+    merged = HyperLogLog()
+    for start in range(0, len(values), 30_000):
+        part = HyperLogLog()
+        part.update(values.iloc[start:start + 30_000])
+        merged.merge(part)
+    
+    assert np.array_equal(merged.registers, whole.registers)
+    assert merged.count() == whole.count()
+
+
+def test_hyperloglog_merge_counts_overlap_once():
+    left, right = HyperLogLog(), HyperLogLog()
+    left.update(_ids(60_000))
+    right.update(_ids(60_000, offset=30_000))
+    left.merge(right)
+    
+    assert abs(left.count() - 90_000) <= 4 * left.relative_error * 90_000
+
+
+def test_hyperloglog_rejects_other_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(precision=10).merge(HyperLogLog(precision=12))
+
+
+def test_hyperloglog_state_round_trip():
+    sketch = HyperLogLog()
+    sketch.update(_ids(10_000))
+    restored = HyperLogLog.from_dict(sketch.to_dict())
+    
+    assert restored.precision == sketch.precision
+    assert np.array_equal(restored.registers, sketch.registers)
+
+
+def test_distinct_count_modes():
+    values = pd.concat([_ids(1_000), _ids(1_000), pd.Series([None])])
+    
+    assert distinct_count(values) == (1_000, False)
+    count, approximate = distinct_count(values, approximate=True)
+    assert approximate and abs(count - 1_000) <= 40
+
+
+def test_duplicate_count_tolerates_estimation_error():
+    # An all-unique column whose estimate came out slightly low
+    assert duplicate_count(1_000_000, 995_000, approximate=True) == 0
+    assert duplicate_count(1_000_000, 995_000, approximate=False) == 5_000
+    assert duplicate_count(1_000_000, 500_000, approximate=True) == 500_000
+
+
+def _rank_error(values: np.ndarray, value: float, q: float) -> float:
+    """Distance between q and the rank range `value` holds in sorted `values`"""
+    low = np.searchsorted(values, value, side='left') / len(values)
+    high = np.searchsorted(values, value, side='right') / len(values)
+    return max(low - q, q - high, 0.0)
+
+
+def test_quantile_sketch_exact_below_limit():
+    values = np.random.default_rng(1).lognormal(3, 1, 20_000)
+    sketch = QuantileSketch.from_values(np.append(values, np.nan))
+    
+    assert sketch.exact and sketch.count == len(values)
+    assert sketch.median() == np.median(values)
+    assert np.allclose(sketch.quantiles([0.1, 0.25, 0.75, 0.9]), np.quantile(values, [0.1, 0.25, 0.75, 0.9]))
+    q1, q3 = np.quantile(values, [0.25, 0.75])
+    assert sketch.count_below(q1) == int((values < q1).sum())
+    assert sketch.count_above(q3) == int((values > q3).sum())
+    counts, _ = np.histogram(values, bins=10)
+    assert [b['count'] for b in sketch.histogram(10)] == counts.tolist()
+
+
+def test_quantile_sketch_rank_error_bound():
+    values = np.random.default_rng(2).normal(0, 1, 400_000)
+    sketch = QuantileSketch(k=200, exact_limit=1_000)
+    for chunk in np.array_split(values, 8):
+        sketch.update(chunk)
+    ordered = np.sort(values)
+    qs = [0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+    
+    assert not sketch.exact
+    assert sketch.count == len(values)
+    assert (sketch.min, sketch.max) == (values.min(), values.max())
+    assert sum(len(level) for level in sketch.levels) < 2_000
+    for q, value in zip(qs, sketch.quantiles(qs)):
+        assert _rank_error(ordered, value, q) <= 0.02
+    
+    below = sketch.count_below(0.0)
+    assert abs(below - (values < 0).sum()) <= 0.02 * len(values)
+    histogram = sketch.histogram(10)
+    counts, _ = np.histogram(values, bins=10, range=(values.min(), values.max()))
+    assert sum(b['count'] for b in histogram) == pytest.approx(len(values), rel=1e-6)
+    assert np.abs(np.array([b['count'] for b in histogram]) - counts).max() <= 0.02 * len(values)
+
+
+def test_quantile_sketch_merge_equals_single_pass_while_exact():
+    values = np.random.default_rng(3).exponential(5, 30_000)
+    whole = QuantileSketch.from_values(values)
+    merged = QuantileSketch()
+    for chunk in np.array_split(values, 3):
+        merged.merge(QuantileSketch.from_values(chunk))
+    
+    assert merged.exact
+    assert merged.quantiles([0.1, 0.5, 0.9]) == whole.quantiles([0.1, 0.5, 0.9])
+    assert merged.histogram(10) == whole.histogram(10)
+
+
+def test_quantile_sketch_merged_keeps_error_bound():
+    rng = np.random.default_rng(4)
+    parts = [rng.normal(loc, 1, 100_000) for loc in (0, 5, 10)]
+    merged = QuantileSketch(exact_limit=1_000)
+    for part in parts:
+        merged.merge(QuantileSketch.from_values(part, exact_limit=1_000))
+    ordered = np.sort(np.concatenate(parts))
+    qs = [0.05, 1 / 3, 0.5, 2 / 3, 0.95]
+    
+    assert merged.count == len(ordered)
+    for q, value in zip(qs, merged.quantiles(qs)):
+        assert _rank_error(ordered, value, q) <= 0.02
+
+
+def test_quantile_sketch_state_round_trip():
+    sketch = QuantileSketch.from_values(np.arange(50_000, dtype='float64'), exact_limit=1_000)
+    restored = QuantileSketch.from_dict(sketch.to_dict())
+    
+    assert restored.quantiles([0.25, 0.5, 0.75]) == sketch.quantiles([0.25, 0.5, 0.75])
+    assert (restored.count, restored.min, restored.max, restored.exact) == (50_000, 0.0, 49_999.0, False)
+
+
+def _zipf_values(n: int, seed: int) -> pd.Series:
+    return pd.Series(np.random.default_rng(seed).zipf(1.3, n) % 5_000).astype(str)
+
+
+def _assert_space_saving_bounds(sketch: TopKSketch, true_counts: pd.Series):
+    tracked = sketch.counts.index
+    assert len(tracked) <= sketch.capacity
+    assert sketch.total == true_counts.sum()
+    assert sketch.floor <= sketch.total / sketch.capacity
+    
+    true_tracked = true_counts.reindex(tracked, fill_value=0)
+    assert (sketch.counts - sketch.errors <= true_tracked).all()
+    assert (true_tracked <= sketch.counts).all()
+    assert (true_counts.drop(tracked, errors='ignore') <= sketch.floor).all()
+
+
+def test_top_k_exact_within_capacity():
+    values = pd.Series(['b', 'a', 'b', None, 'c', 'b', 'a'])
+    sketch = TopKSketch.from_values(values, capacity=10)
+    
+    assert sketch.exact
+    assert sketch.top(2) == [{'value': 'b', 'count': 3, 'error': 0}, {'value': 'a', 'count': 2, 'error': 0}]
+    assert sketch.counts.sort_index().to_dict() == values.value_counts().sort_index().to_dict()
+
+
+def test_top_k_error_bounds():
+    values = _zipf_values(600_000, seed=5)
+    true_counts = values.value_counts()
+    sketch = TopKSketch.from_values(values, capacity=100)
+    
+    assert not sketch.exact
+    _assert_space_saving_bounds(sketch, true_counts)
+    # Everything more frequent than the floor is tracked, so the true top 10 are reported
+    assert {entry['value'] for entry in sketch.top(10)} == set(true_counts.index[:10])
+
+
+def test_top_k_merge_keeps_bounds():
+    parts = [_zipf_values(200_000, seed) for seed in (6, 7, 8)]
+    true_counts = pd.concat(parts).value_counts()
+    merged = TopKSketch(capacity=100)
+    for part in parts:
+        merged.merge(TopKSketch.from_values(part, capacity=100))
+    
+    _assert_space_saving_bounds(merged, true_counts)
+    assert {entry['value'] for entry in merged.top(5)} == set(true_counts.index[:5])
+
+
+def test_top_k_merge_equals_single_pass_while_exact():
+    values = pd.Series(np.random.default_rng(9).integers(0, 300, 50_000)).astype(str)
+    whole = TopKSketch.from_values(values, capacity=1_000)
+    merged = TopKSketch(capacity=1_000)
+    for start in range(0, len(values), 12_500):
+        merged.merge(TopKSketch.from_values(values.iloc[start:start + 12_500], capacity=1_000))
+    
+    assert merged.exact
+    assert merged.counts.sort_index().equals(whole.counts.sort_index())
+    assert [e['count'] for e in merged.top(20)] == [e['count'] for e in whole.top(20)]
+
+
+def test_top_k_state_round_trip():
+    sketch = TopKSketch.from_values(_zipf_values(100_000, seed=10), capacity=50)
+    restored = TopKSketch.from_dict(sketch.to_dict())
+    
+    assert restored.top(20) == sketch.top(20)
+    assert (restored.floor, restored.total, restored.capacity) == (sketch.floor, sketch.total, 50)
@@ -0,0 +1,81 @@
+"""
+Resumable upload sessions: chunk storage, finalize claims and the idle sweep
+"""
+import asyncio
+import os
+import time
+
+import pytest
+
+from app.core.upload_sessions import SessionFinalizedError, UploadSessionStore
+
+
+async def _body(*pieces: bytes):
+    for piece in pieces:
+        yield piece
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadSessionStore(str(tmp_path))
+
+
+def test_chunks_read_back_in_order(store):
+    upload_id = store.create(1, 1, 'data.csv')['upload_id']
+    asyncio.run(store.write_chunk(upload_id, 1, _body(b'b' * 10, b'c' * 5)))
+    asyncio.run(store.write_chunk(upload_id, 0, _body(b'a' * 3)))
+    
+    assert store.received_chunks(upload_id) == {0: 3, 1: 15}
+    assert store.missing_chunks(upload_id) == []
+    with store.open_stream(upload_id) as stream:
+        assert stream.read() == b'aaa' + b'b' * 10 + b'c' * 5
+
+
+def test_finalize_is_claimed_once(store):
+    upload_id = store.create(1, 1, 'data.csv')['upload_id']
+    store.finalize(upload_id)
+    
+    assert store.is_finalized(upload_id)
+    with pytest.raises(SessionFinalizedError):
+        store.finalize(upload_id)
+    
+    store.reopen(upload_id)
+    store.finalize(upload_id)
+
+
+def test_chunks_refused_after_finalize(store):
+    upload_id = store.create(1, 1, 'data.csv')['upload_id']
+    asyncio.run(store.write_chunk(upload_id, 0, _body(b'old')))
+    store.finalize(upload_id)
+    
+    with pytest.raises(SessionFinalizedError):
+        asyncio.run(store.write_chunk(upload_id, 0, _body(b'new')))
+    with store.open_stream(upload_id) as stream:
+        assert stream.read() == b'old'
+
+
+def test_chunk_in_flight_when_finalized_is_dropped(store):
+    upload_id = store.create(1, 1, 'data.csv')['upload_id']
+    
+    async def body():
+        yield b'half'
+        store.finalize(upload_id)
+        yield b'rest'
+    
+    with pytest.raises(SessionFinalizedError):
+        asyncio.run(store.write_chunk(upload_id, 0, body()))
+    assert store.received_chunks(upload_id) == {}
+    assert sorted(os.listdir(os.path.join(store.root, upload_id))) == ['finalized', 'session.json']
+
+
+def test_sweep_leaves_finalized_sessions_to_their_job(store):
+    idle, queued, active = (store.create(1, 1, 'data.csv')['upload_id'] for _ in range(3))
+    store.finalize(queued)
+    old = time.time() - 7200
+    for upload_id in (idle, queued):
+        os.utime(os.path.join(store.root, upload_id, 'session.json'), (old, old))
+    
+    assert store.sweep(ttl_seconds=3600) == 1
+    assert sorted(os.listdir(store.root)) == sorted([queued, active])
+    assert store.sweep(ttl_seconds=3600, include_finalized=True) == 1
+    assert os.listdir(store.root) == [active]
@@ -0,0 +1,80 @@
+"""
+Upload pipeline: byte-identical re-uploads reuse stored results without parsing
+"""
+import io
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.api import datasets
+from app.core.dataset_store import ContentIndex, DatasetStore
+
+
+class FakeDB:
+    """Just enough of a Session for process_upload"""
+    
+    def __init__(self):
+        self.added = []
+    
+    def add(self, record):
+        self.added.append(record)
+    
+    def commit(self):
+        pass
+    
+    def refresh(self, record):
+        pass
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(datasets, 'dataset_store', DatasetStore(str(tmp_path)))
+    monkeypatch.setattr(datasets, 'content_index', ContentIndex(str(tmp_path)))
+    monkeypatch.setattr(datasets, 'DatasetProfile', types.SimpleNamespace)
+    monkeypatch.setattr(datasets, 'record_row_issues', lambda db, dataset_id, issues: None)
+
+
+def _orders_csv(n: int = 2_000) -> bytes:
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'amount': rng.integers(1, 500, n),
+        'region': rng.choice(['North', 'South', 'East'], n),
+        'order_date': (pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 300, n), unit='D')).strftime('%Y-%m-%d')
+    })
+    return df.to_csv(index=False).encode('utf-8')
+
+
+def _upload(content: bytes, dataset_id: int):
+    dataset = types.SimpleNamespace(id=dataset_id, filename='orders.csv')
+    upload = types.SimpleNamespace(file=io.BytesIO(content), filename='orders.csv')
+    return datasets.process_upload(FakeDB(), dataset, upload)
+
+
+def _never(*args, **kwargs):
+    raise AssertionError('a repeated upload was parsed again')
+
+
+def test_repeated_csv_upload_skips_parsing_and_profiling(store, monkeypatch):
+    content = _orders_csv()
+    first = _upload(content, 1)
+    
+    monkeypatch.setattr(datasets, 'ChunkedProfiler', _never)
+    monkeypatch.setattr(datasets, 'stream_profile_upload', _never)
+    monkeypatch.setattr(datasets.dataset_store, 'open_writer', _never)
+    repeat = _upload(content, 2)
+    
+    assert first['deduplicated'] is False and repeat['deduplicated'] is True
+    assert repeat['content_hash'] == first['content_hash']
+    assert repeat['profile'] == first['profile']
+    assert repeat['row_count'] == 2_000
+
+
+def test_changed_csv_upload_is_parsed(store):
+    _upload(_orders_csv(), 1)
+    
+    changed = _upload(_orders_csv() + b'7,North,2024-02-01\n', 2)
+    
+    assert changed['deduplicated'] is False
+    assert changed['row_count'] == 2_001